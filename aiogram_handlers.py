@@ -7,16 +7,23 @@ from telethon import TelegramClient
 from telethon.errors import SessionPasswordNeededError, PhoneNumberInvalidError, ApiIdInvalidError
 from telethon.tl.functions.auth import SendCodeRequest
 from config import ADMIN_ID
-from db import load_profiles, save_profile, remove_profile, load_groups, get_profile_setting, update_profile_setting
+from db_async import (
+    load_profiles, save_profile, remove_profile, load_groups, count_groups, has_group, get_profile_setting,
+    update_profile_setting,
+)
 from states import SettingsForm, ProfileForm, MainForm
-from telethon_utils import auto_reply_handler, response_reply_handler, load_existing_groups
+from telethon_utils import (
+    load_existing_groups, group_peer_fields, remember_identity, register_handlers, backoff_remaining,
+    effective_messages_per_minute, max_messages_per_minute, GLOBAL_SLEEP, MIN_DELAY_BETWEEN_MSG,
+)
 from constants import MESSAGES, MAIN_MENU_BUTTONS, PROFILE_MENU_BUTTONS, DELETE_CONFIRM_BUTTONS
 from keyboards import get_main_keyboard, get_profile_keyboard, get_profile_selection_keyboard, get_delete_confirm_keyboard
 from telethon.errors import SessionPasswordNeededError, PhoneNumberInvalidError, ApiIdInvalidError
-from telethon import events
 from telethon_utils import load_existing_groups
-from db import save_profile, remove_profile,save_group
+from db_async import save_profile, remove_profile,save_group
 from telethon.tl.functions.channels import JoinChannelRequest
+import scheduler
+import metrics
 
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -123,17 +130,18 @@ async def process_code(message: types.Message, state: FSMContext):
     api_id = data.get('api_id')
     api_hash = data.get('api_hash')
     session_name = data.get('session_name')
-    profile_id = save_profile(api_id, api_hash, phone, session_name)
+    profile_id = await save_profile(api_id, api_hash, phone, session_name)
     if profile_id is None:
         await client.disconnect()
         await message.answer("❌ Profil saqlanmadi. Ma'lumotlar bazasi bilan muammo yuz berdi.")
         await state.clear()
         return
     client.profile_id = profile_id
-    client.add_event_handler(auto_reply_handler, events.NewMessage(incoming=True))
-    client.add_event_handler(response_reply_handler, events.NewMessage(incoming=True, pattern=r'(?i)@[\w\d_]+'))
+    remember_identity(client, await client.get_me())
+    await register_handlers(client)
     await load_existing_groups(client, profile_id)
     clients.append(client)
+    scheduler.notify_clients_changed()
     await message.answer(MESSAGES["PROFILE_ADDED"].format(phone=phone))
     await state.set_state(MainForm.main_menu)
     await message.answer(MESSAGES["BACK_TO_MAIN"], reply_markup=get_main_keyboard())
@@ -150,25 +158,67 @@ async def process_password(message: types.Message, state: FSMContext):
     api_hash = data.get('api_hash')
     password = message.text.strip()
     await client.sign_in(password=password)
-    profile_id = save_profile(api_id, api_hash, phone, session_name)
+    profile_id = await save_profile(api_id, api_hash, phone, session_name)
     if profile_id is None:
         await client.disconnect()
         await message.answer("❌ Profil saqlanmadi. Ma'lumotlar bazasi bilan muammo yuz berdi.")
         await state.clear()
         return
     client.profile_id = profile_id
-    client.add_event_handler(auto_reply_handler, events.NewMessage(incoming=True))
-    client.add_event_handler(response_reply_handler, events.NewMessage(incoming=True, pattern=r'(?i)@[\w\d_]+'))
+    remember_identity(client, await client.get_me())
+    await register_handlers(client)
     await load_existing_groups(client, profile_id)
     clients.append(client)
+    scheduler.notify_clients_changed()
     await message.answer(MESSAGES["PROFILE_ADDED"].format(phone=phone))
     await state.set_state(MainForm.main_menu)
     await message.answer(MESSAGES["BACK_TO_MAIN"], reply_markup=get_main_keyboard())
 
+def _format_seconds(seconds) -> str:
+    if seconds is None:
+        return "—"
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60} daqiqa"
+    return f"{seconds // 3600} soat {seconds % 3600 // 60} daqiqa"
+
+def format_profile_stats(profile: dict) -> str:
+    """Bitta profil statistikasi — faqat xotiradagi agregat va jadvaldan, DB o'qilmaydi."""
+    profile_id = profile['id']
+    summary = metrics.SEND_STATS.summary(profile_id)
+    connected = any(c.profile_id == profile_id for c in clients)
+    next_due = scheduler.scheduler.next_due(profile_id) if scheduler.scheduler else None
+    backoff = backoff_remaining(profile_id)
+    return MESSAGES["STATS_PROFILE"].format(
+        phone=profile['phone'],
+        status="" if connected else " (ulanmagan)",
+        sent_hour=summary["sent_hour"],
+        sent_day=summary["sent_day"],
+        success="—" if summary["success_ratio"] is None else f"{summary['success_ratio']:.0%} ({summary['failed_day']} ta xato)",
+        latency="—" if summary["avg_latency"] is None else f"{summary['avg_latency'] * 1000:.0f} ms",
+        backoff=_format_seconds(backoff) if backoff else "yo‘q",
+        next_cycle="hozir" if next_due == 0 else _format_seconds(next_due),
+    )
+
+@dp.message(Command("stats"))
+@dp.message(MainForm.main_menu, F.text == MAIN_MENU_BUTTONS["STATS"])
+@admin_only
+async def show_stats(message: types.Message, state: FSMContext):
+    profiles = await load_profiles()
+    if not profiles:
+        await message.answer(MESSAGES["NO_PROFILES"])
+        return
+    text = MESSAGES["STATS_HEADER"] + "".join(format_profile_stats(p) for p in profiles)
+    # Telegram xabar chegarasi 4096 belgi
+    for start in range(0, len(text), 4000):
+        await message.answer(text[start:start + 4000])
+
 @dp.message(MainForm.main_menu, F.text == MAIN_MENU_BUTTONS["LIST_PROFILES"])
 @admin_only
 async def show_profiles(message: types.Message, state: FSMContext):
-    profiles = load_profiles()
+    profiles = await load_profiles()
     if not profiles:
         await message.answer(MESSAGES["NO_PROFILES"])
         return
@@ -178,7 +228,7 @@ async def show_profiles(message: types.Message, state: FSMContext):
 @dp.message(MainForm.profile_menu, F.text.regexp(r'\+998\d{9}'))
 @admin_only
 async def select_profile(message: types.Message, state: FSMContext):
-    profiles = load_profiles()
+    profiles = await load_profiles()
     phone = message.text.strip()
     selected = next((p for p in profiles if p['phone'] == phone), None)
     if not selected:
@@ -219,7 +269,8 @@ async def process_delete_profile(message: types.Message, state: FSMContext):
             clients.remove(client)
         except Exception as e:
             logger.error(f"Profilni o'chirishda ulanishni uzishda xato: {e}")
-    remove_profile(profile_id)
+    await remove_profile(profile_id)
+    metrics.SEND_STATS.forget(profile_id)
     await message.answer(MESSAGES["PROFILE_DELETED"].format(phone=phone))
     await state.set_state(MainForm.main_menu)
     await message.answer(MESSAGES["BACK_TO_MAIN"], reply_markup=get_main_keyboard())
@@ -257,19 +308,18 @@ async def add_groups(message: types.Message, state: FSMContext):
         await message.answer("❌ Tanlangan profil uchun ulanish topilmadi.")
         return
     links = [line.strip() for line in message.text.splitlines() if "https://t.me/" in line]
-    groups = load_groups(profile_id)
     added = 0
     for link in links:
-        if link not in groups:
+        if not await has_group(profile_id, link):
             try:
                 entity = await client.get_entity(link)
                 await client(JoinChannelRequest(entity))
-                save_group(link, profile_id)
-                await client.send_message(entity, get_profile_setting(profile_id, "message_text"))
+                await save_group(link, profile_id, **group_peer_fields(entity))
+                await client.send_message(entity, await get_profile_setting(profile_id, "message_text"))
                 added += 1
             except Exception as e:
                 logger.error(f"Guruh qo‘shishda xato: {link} - {e}")
-    await message.answer(MESSAGES["GROUPS_ADDED"].format(count=added, total=len(load_groups(profile_id))))
+    await message.answer(MESSAGES["GROUPS_ADDED"].format(count=added, total=await count_groups(profile_id)))
     await message.answer("📱 Profil menyusiga qaytdingiz.", reply_markup=get_profile_keyboard())
 
 @dp.message(MainForm.profile_menu, F.text == PROFILE_MENU_BUTTONS["LIST_GROUPS"])
@@ -282,7 +332,7 @@ async def show_groups(message: types.Message, state: FSMContext):
         await state.set_state(MainForm.main_menu)
         await message.answer(MESSAGES["BACK_TO_MAIN"], reply_markup=get_main_keyboard())
         return
-    groups = load_groups(profile_id)
+    groups = await load_groups(profile_id)
     if not groups:
         await message.answer(MESSAGES["NO_GROUPS"])
     else:
@@ -301,24 +351,29 @@ async def profile_info(message: types.Message, state: FSMContext):
         await state.set_state(MainForm.main_menu)
         await message.answer(MESSAGES["BACK_TO_MAIN"], reply_markup=get_main_keyboard())
         return
-    profiles = load_profiles()
+    profiles = await load_profiles()
     selected = next((p for p in profiles if p['id'] == profile_id), None)
     if not selected:
         await message.answer(MESSAGES["PROFILE_NOT_FOUND"].format(phone=phone))
         return
-    groups_count = len(load_groups(profile_id))
+    groups_count = await count_groups(profile_id)
+    messages_per_minute = await get_profile_setting(profile_id, 'messages_per_minute')
+    send_interval = await get_profile_setting(profile_id, 'send_interval')
+    pacing_text = messages_per_minute or 'standart (~1.4)'
+    if messages_per_minute and effective_messages_per_minute(messages_per_minute) != int(messages_per_minute):
+        pacing_text = f"{messages_per_minute} (amalda {effective_messages_per_minute(messages_per_minute)})"
     info = (
         f"📱 Profil: {phone}\n"
         f"🔢 API ID: {selected['api_id']}\n"
         f"📊 Guruhlar soni: {groups_count}\n"
-        f"🔄 Avto javob: {'Faol' if bool(int(get_profile_setting(profile_id, 'auto_reply_enabled'))) else 'O‘chirilgan'}\n"
-        f"📝 Avto javob matni: {get_profile_setting(profile_id, 'auto_reply_text')}\n"
-        f"🔄 Guruh avto javobi: {'Faol' if bool(int(get_profile_setting(profile_id, 'response_reply_enabled'))) else 'O‘chirilgan'}\n"
-        f"📝 Guruh avto javob matni: {get_profile_setting(profile_id, 'response_reply_text')}\n"
-        f"✉ Yuboriladigan xabar: {get_profile_setting(profile_id, 'message_text')}\n"
-        f"⏱ 1 daqiqada guruhlar: {get_profile_setting(profile_id, 'messages_per_minute')}\n"
-        f"⏰ Yuborish oralig'i: {int(get_profile_setting(profile_id, 'send_interval')) // 60} daqiqa\n"
-        f"🚀 Avtomatik yuborish: {'Faol' if bool(int(get_profile_setting(profile_id, 'auto_send_enabled'))) else 'O‘chirilgan'}"
+        f"🔄 Avto javob: {'Faol' if bool(int(await get_profile_setting(profile_id, 'auto_reply_enabled'))) else 'O‘chirilgan'}\n"
+        f"📝 Avto javob matni: {await get_profile_setting(profile_id, 'auto_reply_text')}\n"
+        f"🔄 Guruh avto javobi: {'Faol' if bool(int(await get_profile_setting(profile_id, 'response_reply_enabled'))) else 'O‘chirilgan'}\n"
+        f"📝 Guruh avto javob matni: {await get_profile_setting(profile_id, 'response_reply_text')}\n"
+        f"✉ Yuboriladigan xabar: {await get_profile_setting(profile_id, 'message_text')}\n"
+        f"⏱ 1 daqiqada guruhlar: {pacing_text}\n"
+        f"⏰ Yuborish oralig'i: {int(send_interval or GLOBAL_SLEEP) // 60} daqiqa\n"
+        f"🚀 Avtomatik yuborish: {'Faol' if bool(int(await get_profile_setting(profile_id, 'auto_send_enabled'))) else 'O‘chirilgan'}"
     )
     await message.answer(info, reply_markup=get_profile_keyboard())
 
@@ -349,7 +404,7 @@ async def process_auto_reply_text(message: types.Message, state: FSMContext):
     if not text:
         await message.answer(MESSAGES["INVALID_TEXT"])
         return
-    update_profile_setting(profile_id, "auto_reply_text", text)
+    await update_profile_setting(profile_id, "auto_reply_text", text)
     await message.answer(MESSAGES["TEXT_UPDATED"].format(type="Avto javob matni", text=text))
     await state.set_state(MainForm.profile_menu)
     await message.answer("📱 Profil menyusiga qaytdingiz.", reply_markup=get_profile_keyboard())
@@ -364,9 +419,12 @@ async def toggle_auto_reply(message: types.Message, state: FSMContext):
         await state.set_state(MainForm.main_menu)
         await message.answer(MESSAGES["BACK_TO_MAIN"], reply_markup=get_main_keyboard())
         return
-    auto_reply_enabled = bool(int(get_profile_setting(profile_id, "auto_reply_enabled") or 0))
+    auto_reply_enabled = bool(int(await get_profile_setting(profile_id, "auto_reply_enabled") or 0))
     auto_reply_enabled = not auto_reply_enabled
-    update_profile_setting(profile_id, "auto_reply_enabled", "1" if auto_reply_enabled else "0")
+    await update_profile_setting(profile_id, "auto_reply_enabled", "1" if auto_reply_enabled else "0")
+    client = next((c for c in clients if c.profile_id == profile_id), None)
+    if client:
+        await register_handlers(client)
     status = "yoqildi" if auto_reply_enabled else "o‘chirildi"
     await message.answer(MESSAGES["AUTO_REPLY_TOGGLED"].format(status=status), reply_markup=get_profile_keyboard())
 
@@ -397,7 +455,7 @@ async def process_response_reply_text(message: types.Message, state: FSMContext)
     if not text:
         await message.answer(MESSAGES["INVALID_TEXT"])
         return
-    update_profile_setting(profile_id, "response_reply_text", text)
+    await update_profile_setting(profile_id, "response_reply_text", text)
     await message.answer(MESSAGES["TEXT_UPDATED"].format(type="Guruh avto javob matni", text=text))
     await state.set_state(MainForm.profile_menu)
     await message.answer("📱 Profil menyusiga qaytdingiz.", reply_markup=get_profile_keyboard())
@@ -412,9 +470,12 @@ async def toggle_response_reply(message: types.Message, state: FSMContext):
         await state.set_state(MainForm.main_menu)
         await message.answer(MESSAGES["BACK_TO_MAIN"], reply_markup=get_main_keyboard())
         return
-    response_reply_enabled = bool(int(get_profile_setting(profile_id, "response_reply_enabled") or 0))
+    response_reply_enabled = bool(int(await get_profile_setting(profile_id, "response_reply_enabled") or 0))
     response_reply_enabled = not response_reply_enabled
-    update_profile_setting(profile_id, "response_reply_enabled", "1" if response_reply_enabled else "0")
+    await update_profile_setting(profile_id, "response_reply_enabled", "1" if response_reply_enabled else "0")
+    client = next((c for c in clients if c.profile_id == profile_id), None)
+    if client:
+        await register_handlers(client)
     status = "yoqildi" if response_reply_enabled else "o‘chirildi"
     await message.answer(MESSAGES["RESPONSE_REPLY_TOGGLED"].format(status=status), reply_markup=get_profile_keyboard())
 
@@ -445,7 +506,7 @@ async def process_message_text(message: types.Message, state: FSMContext):
     if not text:
         await message.answer(MESSAGES["INVALID_TEXT"])
         return
-    update_profile_setting(profile_id, "message_text", text)
+    await update_profile_setting(profile_id, "message_text", text)
     await message.answer(MESSAGES["TEXT_UPDATED"].format(type="Yuboriladigan xabar", text=text))
     await state.set_state(MainForm.profile_menu)
     await message.answer("📱 Profil menyusiga qaytdingiz.", reply_markup=get_profile_keyboard())
@@ -460,12 +521,86 @@ async def toggle_auto_send(message: types.Message, state: FSMContext):
         await state.set_state(MainForm.main_menu)
         await message.answer(MESSAGES["BACK_TO_MAIN"], reply_markup=get_main_keyboard())
         return
-    auto_send_enabled = bool(int(get_profile_setting(profile_id, "auto_send_enabled") or 0))
+    auto_send_enabled = bool(int(await get_profile_setting(profile_id, "auto_send_enabled") or 0))
     auto_send_enabled = not auto_send_enabled
-    update_profile_setting(profile_id, "auto_send_enabled", "1" if auto_send_enabled else "0")
+    await update_profile_setting(profile_id, "auto_send_enabled", "1" if auto_send_enabled else "0")
+    if auto_send_enabled and scheduler.scheduler is not None:
+        scheduler.scheduler.run_now(profile_id)
     status = "yoqildi" if auto_send_enabled else "o‘chirildi"
     await message.answer(MESSAGES["AUTO_SEND_TOGGLED"].format(status=status), reply_markup=get_profile_keyboard())
 
+@dp.message(MainForm.profile_menu, F.text == PROFILE_MENU_BUTTONS["MESSAGES_PER_MINUTE"])
+@admin_only
+async def change_messages_per_minute(message: types.Message, state: FSMContext):
+    data = await state.get_data()
+    profile_id = data.get('current_profile_id')
+    if not profile_id:
+        await message.answer("❌ Profil tanlanmagan. Iltimos, avval profil tanlang.")
+        await state.set_state(MainForm.main_menu)
+        await message.answer(MESSAGES["BACK_TO_MAIN"], reply_markup=get_main_keyboard())
+        return
+    current = await get_profile_setting(profile_id, "messages_per_minute") or "standart (~1.4)"
+    await state.set_state(SettingsForm.waiting_for_messages_per_minute)
+    await message.answer(f"⏱ 1 daqiqada nechta xabar yuborilsin? (hozir: {current}; eng ko‘pi "
+                         f"{max_messages_per_minute()} — xabarlar orasida kamida {MIN_DELAY_BETWEEN_MSG:.0f}s kutiladi)")
+
+@dp.message(SettingsForm.waiting_for_messages_per_minute)
+@admin_only
+async def process_messages_per_minute(message: types.Message, state: FSMContext):
+    data = await state.get_data()
+    profile_id = data.get('current_profile_id')
+    if not profile_id:
+        await message.answer("❌ Profil tanlanmagan. Iltimos, avval profil tanlang.")
+        await state.set_state(MainForm.main_menu)
+        await message.answer(MESSAGES["BACK_TO_MAIN"], reply_markup=get_main_keyboard())
+        return
+    text = (message.text or "").strip()
+    if not text.isdigit() or int(text) < 1:
+        await message.answer(MESSAGES["INVALID_NUMBER"])
+        return
+    value = effective_messages_per_minute(text)
+    await update_profile_setting(profile_id, "messages_per_minute", value)
+    if value != int(text):
+        await message.answer(MESSAGES["PACING_CLAMPED"].format(requested=text, value=value,
+                                                               min_delay=MIN_DELAY_BETWEEN_MSG))
+    else:
+        await message.answer(MESSAGES["PACING_UPDATED"].format(type="Daqiqadagi xabarlar", value=value))
+    await state.set_state(MainForm.profile_menu)
+    await message.answer("📱 Profil menyusiga qaytdingiz.", reply_markup=get_profile_keyboard())
+
+@dp.message(MainForm.profile_menu, F.text == PROFILE_MENU_BUTTONS["SEND_INTERVAL"])
+@admin_only
+async def change_send_interval(message: types.Message, state: FSMContext):
+    data = await state.get_data()
+    profile_id = data.get('current_profile_id')
+    if not profile_id:
+        await message.answer("❌ Profil tanlanmagan. Iltimos, avval profil tanlang.")
+        await state.set_state(MainForm.main_menu)
+        await message.answer(MESSAGES["BACK_TO_MAIN"], reply_markup=get_main_keyboard())
+        return
+    current = int(await get_profile_setting(profile_id, "send_interval") or GLOBAL_SLEEP) // 60
+    await state.set_state(SettingsForm.waiting_for_send_interval)
+    await message.answer(f"⏰ Aylanmalar orasida necha daqiqa kutilsin? (hozir: {current})")
+
+@dp.message(SettingsForm.waiting_for_send_interval)
+@admin_only
+async def process_send_interval(message: types.Message, state: FSMContext):
+    data = await state.get_data()
+    profile_id = data.get('current_profile_id')
+    if not profile_id:
+        await message.answer("❌ Profil tanlanmagan. Iltimos, avval profil tanlang.")
+        await state.set_state(MainForm.main_menu)
+        await message.answer(MESSAGES["BACK_TO_MAIN"], reply_markup=get_main_keyboard())
+        return
+    text = (message.text or "").strip()
+    if not text.isdigit() or int(text) < 1:
+        await message.answer(MESSAGES["INVALID_NUMBER"])
+        return
+    await update_profile_setting(profile_id, "send_interval", int(text) * 60)
+    await message.answer(MESSAGES["PACING_UPDATED"].format(type="Yuborish oralig‘i", value=f"{text} daqiqa"))
+    await state.set_state(MainForm.profile_menu)
+    await message.answer("📱 Profil menyusiga qaytdingiz.", reply_markup=get_profile_keyboard())
+
 @dp.message(MainForm.profile_menu, F.text == PROFILE_MENU_BUTTONS["BACK_TO_MAIN"])
 @admin_only
 async def back_to_main_menu(message: types.Message, state: FSMContext):
@@ -0,0 +1,141 @@
+"""db.py uchun benchmark: har chaqiruvda yangi ulanish (eski usul) va ulanishlar havzasi.
+
+Ishga tushirish (loyiha ildizidan):
+    python -m benchmarks.bench_db
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+
+import db
+import db_async
+
+
+def _legacy_get_profile_setting(profile_id, key):
+    # Eski db.py dagi kabi: har chaqiruvda connect/close
+    conn = sqlite3.connect(db.DB_NAME, timeout=10, check_same_thread=False)
+    try:
+        c = conn.cursor()
+        c.execute(f"SELECT {key} FROM profiles WHERE id = ?", (profile_id,))
+        result = c.fetchone()
+        return result[0] if result else None
+    finally:
+        conn.close()
+
+
+def _legacy_load_groups(profile_id):
+    conn = sqlite3.connect(db.DB_NAME, timeout=10, check_same_thread=False)
+    try:
+        c = conn.cursor()
+        c.execute("SELECT link FROM groups WHERE profile_id = ?", (profile_id,))
+        return [row[0] for row in c.fetchall()]
+    finally:
+        conn.close()
+
+
+def _legacy_save_group(link, profile_id):
+    conn = sqlite3.connect(db.DB_NAME, timeout=10, check_same_thread=False)
+    try:
+        c = conn.cursor()
+        c.execute("INSERT OR IGNORE INTO groups (link, profile_id) VALUES (?, ?)", (link, profile_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _rate(func, calls):
+    start = time.perf_counter()
+    for i in range(calls):
+        func(i)
+    elapsed = time.perf_counter() - start
+    return calls / elapsed if elapsed else float("inf")
+
+
+def bulk_import(dialogs=10000):
+    """10k dialogli sintetik akkaunt: har biri alohida save_group va bitta save_groups."""
+    links = [f"https://t.me/c/{1000000000 + i}" for i in range(dialogs)]
+    start = time.perf_counter()
+    for link in links:
+        db.save_group(link, 900001)
+    per_row = time.perf_counter() - start
+    start = time.perf_counter()
+    added = db.save_groups(links, 900002)
+    bulk = time.perf_counter() - start
+    start = time.perf_counter()
+    again = db.save_groups(links, 900002)
+    repeat = time.perf_counter() - start
+    print(f"\n{dialogs} ta dialog importi: save_group tsikli {per_row:.2f}s, "
+          f"save_groups {bulk:.2f}s ({added} yangi), qayta ishga tushish {repeat:.2f}s ({again} yangi)")
+
+
+def run(calls=2000, profiles=20, groups_per_profile=50, dialogs=10000):
+    with tempfile.TemporaryDirectory(prefix="bench_db_") as tmpdir:
+        db.close_connections()
+        db.DB_NAME = os.path.join(tmpdir, "bench.db")
+        db.init_db()
+        try:
+            profile_ids = [db.save_profile(1000 + i, "hash", f"+99890000{i:04d}", f"session_{i}")
+                           for i in range(profiles)]
+            for pid in profile_ids:
+                for g in range(groups_per_profile):
+                    db.save_group(f"https://t.me/bench_{pid}_{g}", pid)
+
+            cases = [
+                ("get_profile_setting",
+                 lambda i: _legacy_get_profile_setting(profile_ids[i % profiles], "message_text"),
+                 lambda i: db.get_profile_setting(profile_ids[i % profiles], "message_text")),
+                ("load_groups",
+                 lambda i: _legacy_load_groups(profile_ids[i % profiles]),
+                 lambda i: db.load_groups(profile_ids[i % profiles])),
+                ("save_group",
+                 lambda i: _legacy_save_group(f"https://t.me/legacy_{i}", profile_ids[i % profiles]),
+                 lambda i: db.save_group(f"https://t.me/pooled_{i}", profile_ids[i % profiles])),
+            ]
+            print(f"{'funksiya':<22}{'eski (chaqiruv/s)':>20}{'havza (chaqiruv/s)':>22}{'tezlanish':>12}")
+            for name, legacy, pooled in cases:
+                before = _rate(legacy, calls)
+                after = _rate(pooled, calls)
+                print(f"{name:<22}{before:>20.0f}{after:>22.0f}{after / before:>11.1f}x")
+            bulk_import(dialogs)
+            asyncio.run(loop_lag_while_locked())
+        finally:
+            db.close_connections()
+
+
+async def loop_lag_while_locked(hold=1.0, tick=0.01):
+    """Yozuvchi qulfi band bo‘lganda ham event loop javob berishini tekshiradi."""
+    max_lag = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal max_lag
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(tick)
+            max_lag = max(max_lag, time.perf_counter() - start - tick)
+
+    db._db_lock.acquire()
+    loop = asyncio.get_running_loop()
+    loop.call_later(hold, db._db_lock.release)
+    ticker_task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await db_async.save_group("https://t.me/lag_check", 1)
+    waited = time.perf_counter() - start
+    done.set()
+    await ticker_task
+    print(f"\nqulf {hold:.1f}s band: save_group {waited:.2f}s kutdi, event loop maks. kechikishi {max_lag * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--profiles", type=int, default=20)
+    parser.add_argument("--groups", type=int, default=50)
+    parser.add_argument("--dialogs", type=int, default=10000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    run(args.calls, args.profiles, args.groups, args.dialogs)
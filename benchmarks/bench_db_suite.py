@@ -0,0 +1,254 @@
+"""db.py ma'lumotlar qatlami uchun microbenchmark to‘plami (JSON hisobot bilan).
+
+Sintetik baza (standart: 100 profil × 1000 guruh = 100k qator, entity keshi,
+send_log jurnali) yaratiladi va db.py ning ma'lumot funksiyalari (profillar,
+guruhlar, entity keshi, send_log, backoff, migrate_db — oxirgi versiyadagi bazada)
+hamda kesh/havza qatlamlari alohida o‘lchanadi: ops/s, p50/p99 kechikish, tracemalloc bo‘yicha
+Python xotira cho‘qqisi (alohida qisqa o‘tishda) va jarayonning maks. RSS i. Natija JSON ga yoziladi; --compare bilan avvalgi
+versiya hisobotiga solishtiriladi.
+
+Ishga tushirish (loyiha ildizidan):
+    python -m benchmarks.bench_db_suite
+    python -m benchmarks.bench_db_suite --profiles 100 --groups 1000 --json new.json --compare old.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import sqlite3
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import db
+import db_async
+from benchmarks.stats import percentile
+
+
+def _summary(name, timings, elapsed, rows, peak):
+    timings = sorted(timings)
+    iterations = len(timings)
+    return {
+        "name": name,
+        "iterations": iterations,
+        "ops_per_sec": iterations / elapsed if elapsed else float("inf"),
+        "rows_per_sec": iterations * rows / elapsed if elapsed else float("inf"),
+        "p50_us": percentile(timings, 0.50) / 1000,
+        "p99_us": percentile(timings, 0.99) / 1000,
+        "mean_us": sum(timings) / iterations / 1000,
+        "py_peak_kib": peak / 1024,
+    }
+
+
+MEMORY_PASS = 20   # xotira cho'qqisi alohida, shuncha chaqiruvda o'lchanadi (tracemalloc vaqtni buzmasligi uchun)
+
+
+def measure(name, func, iterations, rows=1):
+    """func(i) ni iterations marta chaqiradi. rows — bitta chaqiruvda qayta ishlanadigan qatorlar."""
+    timings = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter_ns()
+        func(i)
+        timings.append(time.perf_counter_ns() - t0)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    for i in range(min(iterations, MEMORY_PASS)):
+        func(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return _summary(name, timings, elapsed, rows, peak)
+
+
+def measure_async(name, func, iterations, rows=1):
+    """Korutina func(i) ni event loop ichida ketma-ket kutadi (db-worker oqimi orqali)."""
+    async def body(count):
+        timings = []
+        for i in range(count):
+            t0 = time.perf_counter_ns()
+            await func(i)
+            timings.append(time.perf_counter_ns() - t0)
+        return timings
+
+    start = time.perf_counter()
+    timings = asyncio.run(body(iterations))
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    asyncio.run(body(min(iterations, MEMORY_PASS)))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return _summary(name, timings, elapsed, rows, peak)
+
+
+def generate(profiles, groups_per_profile, log_rows, seed=1):
+    """Sintetik ma'lumot: profillar, guruhlar (peer bilan), entity keshi va send_log."""
+    rnd = random.Random(seed)
+    profile_ids = [db.save_profile(1000 + i, "hash", f"+99890{i:07d}", f"session_{i}") for i in range(profiles)]
+    links = {}
+    for pid in profile_ids:
+        groups = [{"link": f"https://t.me/g_{pid}_{g}", "peer_id": 1_000_000_000 + pid * 100_000 + g,
+                   "access_hash": rnd.getrandbits(62), "title": f"Guruh {g}", "peer_type": "megagroup"}
+                  for g in range(groups_per_profile)]
+        db.save_groups(groups, pid)
+        links[pid] = [g["link"] for g in groups]
+        for g in groups[: groups_per_profile // 10]:
+            db.save_entity(pid, g["link"], "channel", g["peer_id"], g["access_hash"])
+    now = int(time.time())
+    batch = []
+    for i in range(log_rows):
+        batch.append((now - rnd.randrange(7 * 86400), rnd.choice(profile_ids), rnd.randrange(1, profiles * groups_per_profile),
+                      0 if rnd.random() < 0.9 else rnd.randrange(1, 7), rnd.randrange(50, 500), None))
+        if len(batch) == 10000:
+            db.save_send_log(batch)
+            batch = []
+    db.save_send_log(batch)
+    return profile_ids, links
+
+
+def run_suite(args):
+    results = []
+    rnd = random.Random(2)
+    profile_ids, links = generate(args.profiles, args.groups, args.log_rows)
+    pick = lambda i: profile_ids[i % len(profile_ids)]
+    link_of = lambda i: links[pick(i)][i % args.groups]
+    n = args.iterations
+
+    # --- profil sozlamalari (write-through kesh) ---
+    results.append(measure("get_profile_setting (kesh)", lambda i: db.get_profile_setting(pick(i), "message_text"), n * 10))
+    results.append(measure("get_profile_settings (kesh)", lambda i: db.get_profile_settings(pick(i)), n * 10))
+
+    def cold_settings(i):
+        db.invalidate_profile_settings(pick(i))
+        db.get_profile_settings(pick(i))
+    results.append(measure("get_profile_settings (sovuq)", cold_settings, n))
+    results.append(measure("update_profile_setting", lambda i: db.update_profile_setting(pick(i), "message_text", f"matn {i}"), n))
+    results.append(measure("load_profiles", lambda i: db.load_profiles(), max(1, n // 10), rows=len(profile_ids)))
+    # o'chiriladigan profillar (guruhlari bilan) — o'lchovdan oldin yaratiladi
+    doomed = [db.save_profile(9000 + i, "hash", f"+99891{i:07d}", f"doomed_{i}") for i in range(max(1, n // 10))]
+    for pid in doomed:
+        db.save_groups([f"https://t.me/doomed_{pid}_{g}" for g in range(10)], pid)
+    results.append(measure("remove_profile (10 guruh bilan)", lambda i: db.remove_profile(doomed[i % len(doomed)]),
+                           len(doomed), rows=10))
+    results.append(measure("migrate_db (oxirgi versiya)", lambda i: db.migrate_db(), n // 10 or 1))
+
+    # --- guruhlar ---
+    results.append(measure("load_groups", lambda i: db.load_groups(pick(i)), n, rows=args.groups))
+    results.append(measure("load_group_peers", lambda i: db.load_group_peers(pick(i)), n, rows=args.groups))
+
+    def cold_groups(i):
+        db.invalidate_groups(pick(i))
+        db.load_group_peers(pick(i))
+    results.append(measure("load_group_peers (sovuq reyestr)", cold_groups, max(1, n // 10), rows=args.groups))
+    results.append(measure("count_groups", lambda i: db.count_groups(pick(i)), n * 10))
+    results.append(measure("has_group", lambda i: db.has_group(pick(i), link_of(i)), n * 10))
+    results.append(measure("save_group (yangi)", lambda i: db.save_group(f"https://t.me/new_{i}", pick(i)), n))
+    results.append(measure("save_group (mavjud)", lambda i: db.save_group(link_of(i), pick(i)), n))
+    bulk = [f"https://t.me/bulk_{i}" for i in range(args.groups)]
+    results.append(measure(f"save_groups ({args.groups} ta, yangi)",
+                           lambda i: db.save_groups([f"{link}_{i}" for link in bulk], pick(i)), 5, rows=args.groups))
+    results.append(measure(f"save_groups ({args.groups} ta, mavjud)",
+                           lambda i: db.save_groups(links[pick(i)], pick(i)), 5, rows=args.groups))
+    results.append(measure("update_group_peer", lambda i: db.update_group_peer(link_of(i), pick(i), 42 + i, 7, "t", "megagroup"), n))
+    results.append(measure("update_group_health", lambda i: db.update_group_health(rnd.randrange(1, args.profiles * args.groups), 1, 0, None), n))
+    results.append(measure("remove_duplicate_groups", lambda i: db.remove_duplicate_groups(), 5, rows=args.profiles * args.groups))
+    results.append(measure("remove_group", lambda i: db.remove_group(f"https://t.me/new_{i}", pick(i)), n))
+
+    # --- entity keshi ---
+    results.append(measure("load_entity (bor)", lambda i: db.load_entity(pick(i), links[pick(i)][i % (args.groups // 10 or 1)]), n))
+    results.append(measure("load_entity (yo‘q)", lambda i: db.load_entity(pick(i), f"https://t.me/none_{i}"), n))
+    results.append(measure("save_entity", lambda i: db.save_entity(pick(i), link_of(i), "channel", i, i), n))
+    results.append(measure("remove_entity", lambda i: db.remove_entity(pick(i), link_of(i)), n))
+    entity_ttl_ago = int(time.time()) - 7 * 86400
+    results.append(measure("prune_entity_cache (eskirgani yo‘q)", lambda i: db.prune_entity_cache(entity_ttl_ago), n // 10 or 1))
+    results.append(measure("prune_entity_cache (hammasi eskirgan)", lambda i: db.prune_entity_cache(time.time() + 1), 3))
+
+    # --- send_log va backoff ---
+    now = int(time.time())
+    log_batch = [(now, pick(i), i, 0, 120, None) for i in range(500)]
+    results.append(measure("save_send_log (500 ta)", lambda i: db.save_send_log(log_batch), 20, rows=500))
+    results.append(measure("load_send_log_minutes (24 soat)", lambda i: db.load_send_log_minutes(now - 86400), 3))
+    results.append(measure("load_recent_sends (1 soat)", lambda i: db.load_recent_sends(now - 3600), 10))
+    results.append(measure("load_flood_deadlines (24 soat)", lambda i: db.load_flood_deadlines(now - 86400), 10))
+    results.append(measure("load_group_send_stats (24 soat)", lambda i: db.load_group_send_stats(pick(i), now - 86400), 10))
+    results.append(measure("save_backoff", lambda i: db.save_backoff(pick(i), now + 600, i % 50), n))
+    results.append(measure("load_backoffs", lambda i: db.load_backoffs(), n // 10 or 1))
+    results.append(measure("clear_backoff", lambda i: db.clear_backoff(pick(i), i % 50), n))
+    results.append(measure("prune_send_log (6 kundan eski)", lambda i: db.prune_send_log(now - 6 * 86400 + i * 3600), 3))
+
+    # --- db_async: executor orqali bir xil chaqiruvlar ---
+    results.append(measure_async("db_async.get_profile_setting (kesh)", lambda i: db_async.get_profile_setting(pick(i), "message_text"), n * 10))
+    results.append(measure_async("db_async.load_group_peers", lambda i: db_async.load_group_peers(pick(i)), n, rows=args.groups))
+    results.append(measure_async("db_async.update_group_health", lambda i: db_async.update_group_health(rnd.randrange(1, args.profiles * args.groups), 0, 0, None), n))
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def print_results(results, baseline=None):
+    base = {r["name"]: r for r in (baseline or {}).get("results", [])}
+    header = f"{'funksiya':<38}{'ops/s':>12}{'p50 µs':>10}{'p99 µs':>10}{'xotira KiB':>12}"
+    print(header + ("   oldingiga nisbatan" if base else ""))
+    for r in results:
+        line = f"{r['name']:<38}{r['ops_per_sec']:>12.0f}{r['p50_us']:>10.1f}{r['p99_us']:>10.1f}{r['py_peak_kib']:>12.0f}"
+        if r["name"] in base and base[r["name"]]["ops_per_sec"]:
+            line += f"   {r['ops_per_sec'] / base[r['name']]['ops_per_sec']:.2f}x"
+        print(line)
+
+
+def main(args):
+    with tempfile.TemporaryDirectory(prefix="bench_db_suite_") as tmpdir:
+        db.close_connections()
+        db.DB_NAME = os.path.join(tmpdir, "bench.db")
+        db.invalidate_profile_settings()
+        db.invalidate_groups()
+        db.init_db()
+        try:
+            started = time.perf_counter()
+            results = run_suite(args)
+            report = {
+                "revision": _git_revision(),
+                "schema_version": db.get_schema_version(),
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "config": vars(args),
+                "db_size_mib": os.path.getsize(db.DB_NAME) / 2 ** 20,
+                "max_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                "seconds": time.perf_counter() - started,
+                "results": results,
+            }
+        finally:
+            db.close_connections()
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print(f"{args.profiles} profil × {args.groups} guruh, send_log {args.log_rows} qator, "
+          f"DB {report['db_size_mib']:.1f} MiB, maks RSS {report['max_rss_mib']:.0f} MiB\n")
+    print_results(results, baseline)
+    with open(args.json, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nJSON hisobot: {args.json}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=100)
+    parser.add_argument("--groups", type=int, default=1000, help="har profilga")
+    parser.add_argument("--log-rows", type=int, default=200000, help="send_log dagi sintetik qatorlar")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--json", default="bench_db_report.json")
+    parser.add_argument("--compare", help="avvalgi JSON hisobot (solishtirish uchun)")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    main(args)
@@ -0,0 +1,232 @@
+"""Kiruvchi xabarlar bo‘roni: avto javob handlerlarini sintetik NewMessage oqimi bilan o‘lchaydi.
+
+Haqiqiy register_handlers() / remember_identity() soxta klientga (FakeTelegramClient)
+handlerlarni ulaydi. Sintetik UpdateNewMessage (shaxsiy) va UpdateNewChannelMessage
+(guruh, eslatmali yoki eslatmasiz) berilgan tezlikda (--rate xabar/s) yaratiladi va
+Telethon'ning _dispatch_update() tartibida tarqatiladi: event build → filtr → handler,
+har update alohida taskda (sequential_updates=False dagidek).
+
+O‘lchanadi:
+  * qabul yo‘li kechikishi (update kelishi → barcha handlerlar tugashi), tur bo‘yicha p50/p99;
+  * handler kechikishi (auto_reply, response_reply) p50/p99;
+  * event loop kechikishi (lag) — kichik intervalli "ticker" task orqali;
+  * bitta eventga DB chaqiruvlari: db-worker orqali so‘rovlar (db_async.run_db) va
+    SQLite'da bajarilgan SQL buyruqlari (set_trace_callback).
+
+Ishga tushirish (loyiha ildizidan):
+    python -m benchmarks.bench_incoming --rate 500 --duration 10
+    python -m benchmarks.bench_incoming --rate 2000 --private-share 0.5 --mention-share 0.1 --cold-settings
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import tempfile
+from collections import Counter, defaultdict
+
+from telethon.tl.types import MessageEntityMentionName
+
+import db
+import metrics
+import telethon_utils
+from benchmarks.stats import percentile
+from benchmarks.fake_telegram import make_clients, setup_db
+from tests.support import group_message_update, private_message_update
+
+USER_ID_BASE = 700_000_000   # sintetik yozuvchilar (shaxsiy chat va guruh a'zolari)
+KINDS = ("private", "group", "mention")
+
+
+async def make_storm_clients(args):
+    clients = await make_clients(args.profiles, {
+        "auto_reply_enabled": 1, "response_reply_enabled": 1,
+        "auto_reply_text": "Salom! Bu avtomatik javob.", "response_reply_text": "Avto javob guruhda.",
+    }, load_groups=False, groups=args.groups, latency=(args.latency_min, args.latency_max))
+    for client in clients:
+        telethon_utils.remember_identity(client, await client.get_me())
+        await telethon_utils.register_handlers(client)
+        client.channel_list = list(client.channels.values())
+    return clients
+
+
+def build_update(client, kind, seq, rnd, args):
+    """Telegram yuboradigan ko‘rinishdagi update (entity'lari bilan)."""
+    sender_id = USER_ID_BASE + rnd.randrange(args.users)
+    if kind == "private":
+        return private_message_update(sender_id, f"Salom, savol bor {seq}", seq)
+
+    channel = rnd.choice(client.channel_list)
+    entities = None
+    if kind == "mention" and seq % 2:
+        # matnli eslatma (username'siz): MessageEntityMentionName
+        text = f"Aka, savol {seq}"
+        entities = [MessageEntityMentionName(offset=0, length=3, user_id=client._self_id)]
+    elif kind == "mention":
+        text = f"@{client.identity.username} savol {seq}"
+    else:
+        text = f"Oddiy guruh xabari {seq} @someone_else"
+    return group_message_update(channel, sender_id, text, seq, entities=entities, mentioned=kind == "mention")
+
+
+class StormStats:
+    def __init__(self):
+        self.receive = defaultdict(list)    # tur -> update kelishidan handlerlar tugashigacha (s)
+        self.handlers = defaultdict(list)   # handler nomi -> davomiylik (s)
+        self.kinds = Counter()
+        self.lag = []
+
+
+async def dispatch(client, update, kind, due, stats: StormStats, args):
+    """Update ni client.dispatch() orqali handlerlarga beradi va qabul yo‘li vaqtini yozadi."""
+    if args.cold_settings:
+        db.invalidate_profile_settings(client.profile_id)
+    await client.dispatch(update, timings=stats.handlers)
+    stats.receive[kind].append(asyncio.get_running_loop().time() - due)
+
+
+async def watch_lag(interval, samples):
+    """Event loop kechikishi: sleep(interval) qancha kech uyg‘onganini yozadi."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - started - interval))
+
+
+def _count_sql(counter):
+    """Havzadagi barcha ulanishlarda bajarilgan SQL buyruqlarini sanaydi."""
+    def trace(_statement):
+        counter["sql"] += 1
+    with db._connections_lock:
+        for conn in db._connections:
+            conn.set_trace_callback(trace)
+
+
+def _db_calls():
+    return {labels[0]: value["count"] for labels, value in metrics.DB_QUERY.snapshot().items()}
+
+
+async def storm(clients, args) -> dict:
+    loop = asyncio.get_running_loop()
+    rnd = random.Random(args.seed)
+    stats = StormStats()
+    watcher = asyncio.create_task(watch_lag(args.lag_interval, stats.lag))
+
+    # isitish: ulanishlar ochiladi va sozlamalar keshga tushadi
+    for client in clients:
+        await telethon_utils.get_profile_settings(client.profile_id)
+    sql = Counter()
+    _count_sql(sql)
+    db_before = _db_calls()
+    cache_before = db.settings_cache_stats()
+
+    total = int(args.rate * args.duration)
+    tasks = set()
+    started = loop.time()
+    for seq in range(1, total + 1):
+        due = started + (seq - 1) / args.rate
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        roll = rnd.random()
+        kind = "private" if roll < args.private_share else \
+            "mention" if roll < args.private_share + args.mention_share else "group"
+        client = clients[seq % len(clients)]
+        stats.kinds[kind] += 1
+        task = asyncio.create_task(dispatch(client, build_update(client, kind, seq, rnd, args), kind, due, stats, args))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - started
+    watcher.cancel()
+    await asyncio.gather(watcher, return_exceptions=True)
+
+    db_after = _db_calls()
+    db_ops = {op: db_after[op] - db_before.get(op, 0) for op in db_after if db_after[op] != db_before.get(op, 0)}
+    cache_after = db.settings_cache_stats()
+    replies = Counter()
+    errors = Counter()
+    for client in clients:
+        replies.update(client.stats)
+        errors.update(client.handler_errors)
+
+    def summary(values):
+        values = sorted(values)
+        return {"count": len(values), "p50_ms": percentile(values, 0.50) * 1000,
+                "p99_ms": percentile(values, 0.99) * 1000, "max_ms": (values[-1] if values else 0.0) * 1000}
+
+    return {
+        "config": vars(args),
+        "events": total,
+        "elapsed": elapsed,
+        "events_per_sec": total / elapsed if elapsed else 0.0,
+        "kinds": dict(stats.kinds),
+        "receive": {kind: summary(stats.receive[kind]) for kind in KINDS if stats.receive[kind]},
+        "handlers": {name: summary(values) for name, values in stats.handlers.items()},
+        "loop_lag": summary(stats.lag),
+        "db_calls": db_ops,
+        "db_calls_per_event": sum(db_ops.values()) / total if total else 0.0,
+        "sql_per_event": sql["sql"] / total if total else 0.0,
+        "settings_cache_misses": cache_after.get("misses", 0) - cache_before.get("misses", 0),
+        "replies": {"private": replies["private_sent"], "group": replies["sent"]},
+        "auto_reply": {key: sum(telethon_utils.auto_reply_stats(c.profile_id)[key] for c in clients)
+                       for key in ("replied", "suppressed")},
+        "errors": dict(errors),
+    }
+
+
+def print_report(report):
+    print(f"\n{report['events']} event ({', '.join(f'{k} {v}' for k, v in report['kinds'].items())}), "
+          f"{report['elapsed']:.1f}s — {report['events_per_sec']:.0f} event/s")
+    header = f"{'soni':>8}{'p50 ms':>10}{'p99 ms':>10}{'maks ms':>10}"
+    for title, rows in (("qabul yo‘li", report["receive"]), ("handler", report["handlers"])):
+        print(f"\n{title:<26}{header}")
+        for name, row in rows.items():
+            print(f"{name:<26}{row['count']:>8}{row['p50_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}")
+    lag = report["loop_lag"]
+    print(f"\nevent loop kechikishi: p50 {lag['p50_ms']:.2f} ms, p99 {lag['p99_ms']:.2f} ms, maks {lag['max_ms']:.2f} ms")
+    print(f"DB: eventga {report['db_calls_per_event']:.3f} db-worker chaqiruvi, {report['sql_per_event']:.3f} SQL buyruq; "
+          f"sozlamalar keshi miss: {report['settings_cache_misses']}")
+    for op, count in sorted(report["db_calls"].items(), key=lambda item: -item[1]):
+        print(f"  {op:<28}{count:>8}")
+    print(f"javoblar: shaxsiy {report['replies']['private']}, guruh {report['replies']['group']}; "
+          f"avto javob cooldown tufayli o‘tkazildi: {report['auto_reply']['suppressed']}")
+    if report["errors"]:
+        print(f"handler xatolari: {report['errors']}")
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory(prefix="bench_incoming_") as tmpdir:
+        setup_db(tmpdir)
+        try:
+            clients = await make_storm_clients(args)
+            report = await storm(clients, args)
+        finally:
+            db.close_connections()
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nJSON hisobot: {args.json}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=1)
+    parser.add_argument("--groups", type=int, default=100, help="xabar keladigan guruhlar (profilga)")
+    parser.add_argument("--users", type=int, default=5000, help="turli yozuvchilar soni")
+    parser.add_argument("--rate", type=float, default=500, help="xabar/s (barcha profillarga jami)")
+    parser.add_argument("--duration", type=float, default=10, help="sekund")
+    parser.add_argument("--private-share", type=float, default=0.2, help="shaxsiy xabarlar ulushi")
+    parser.add_argument("--mention-share", type=float, default=0.05, help="akkaunt eslatilgan guruh xabarlari ulushi")
+    parser.add_argument("--latency-min", type=float, default=0.02, help="javob yuborish kechikishi (s)")
+    parser.add_argument("--latency-max", type=float, default=0.1)
+    parser.add_argument("--cold-settings", action="store_true",
+                        help="har eventdan oldin sozlamalar keshini tozalash (kesh missi narxi)")
+    parser.add_argument("--lag-interval", type=float, default=0.005, help="loop kechikishini o‘lchash oralig‘i (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="hisobotni shu faylga yozish")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    asyncio.run(main(args))
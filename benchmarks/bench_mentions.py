@@ -0,0 +1,78 @@
+"""Guruh xabarlari oqimida response_reply_handler necha marta chaqirilishini o‘lchaydi.
+
+Eski builder (har qanday @username regex) va yangi mention_event() filtri
+bir xil sintetik xabarlar ustida solishtiriladi.
+
+Ishga tushirish (loyiha ildizidan):
+    python -m benchmarks.bench_mentions --messages 10000
+"""
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+from telethon import events
+from telethon.tl.types import Message, MessageEntityMentionName, PeerChannel, PeerUser
+
+from telethon_utils import mention_event, remember_identity
+
+OWN_ID = 777000
+OWN_USERNAME = "MyShopBot_uz"
+OTHER_USERNAMES = ["admin", "someone_else", "myshopbot_uz_fan", "channel_news", "durov"]
+
+
+class _Client:
+    """Filtrlar uchun yetarli bo‘lgan minimal klient."""
+    _self_id = OWN_ID
+    profile_id = 1
+
+    def add_event_handler(self, callback, event=None):
+        pass
+
+
+def synthetic_messages(count, seed=1, any_mention=0.3, own_mention=0.005, text_mention=0.002):
+    rnd = random.Random(seed)
+    messages = []
+    for i in range(count):
+        roll = rnd.random()
+        entities = None
+        if roll < own_mention:
+            text = f"salom @{OWN_USERNAME.lower()} narxi qancha?"
+        elif roll < own_mention + text_mention:
+            text = "Sardor, qarab qo‘ying"
+            entities = [MessageEntityMentionName(offset=0, length=6, user_id=OWN_ID)]
+        elif roll < own_mention + text_mention + any_mention:
+            text = f"@{rnd.choice(OTHER_USERNAMES)} bugun uchrashamizmi?"
+        else:
+            text = f"oddiy guruh xabari #{i}"
+        messages.append(Message(id=i + 1, peer_id=PeerChannel(1000 + i % 50), date=None, message=text,
+                                out=False, from_id=PeerUser(5000 + i), entities=entities))
+    return messages
+
+
+def run(count):
+    client = _Client()
+    remember_identity(client, SimpleNamespace(id=OWN_ID, username=OWN_USERNAME))
+    builders = {
+        "eski (@[\\w\\d_]+ pattern)": events.NewMessage(incoming=True, pattern=r'(?i)@[\w\d_]+'),
+        "yangi (mention_event)": mention_event(client),
+    }
+    messages = synthetic_messages(count)
+    print(f"{count} ta sintetik guruh xabari")
+    for name, builder in builders.items():
+        builder.resolved = True
+        passed = 0
+        start = time.perf_counter()
+        for msg in messages:
+            event = events.NewMessage.Event(msg)
+            if builder.filter(event):
+                passed += 1
+        elapsed = time.perf_counter() - start
+        print(f"  {name:<28} handler chaqiruvlari: {passed:>6}   filtr vaqti: {elapsed * 1e6 / count:.1f} µs/xabar")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=10000)
+    args = parser.parse_args()
+    run(args.messages)
@@ -0,0 +1,138 @@
+"""Yuborish kodini (send_profile_messages, SendScheduler) soxta Telegram ustida o‘lchaydi.
+
+Haqiqiy telethon_utils / scheduler kodi ishlaydi, faqat TelegramClient
+o‘rniga tests.support.FakeTelegramClient beriladi. Guruhlar
+load_existing_groups() orqali (get_dialogs dan) bazaga yoziladi.
+
+Standart holatda profillar productiondagidek sozlanmagan tezlik bilan
+(real vaqtda) yuboradi; --stress pacing cheklovlarini olib tashlab, kodning
+o‘z xarajatini o‘lchaydi. Sutkalik tezlikni ko‘rish uchun benchmarks.simulate.
+
+Ishga tushirish (loyiha ildizidan):
+    python -m benchmarks.bench_send --stress --profiles 5 --groups 1000
+    python -m benchmarks.bench_send --stress --duration 60 --flood-per-minute 20 --forbidden 0.05 --slow-mode 0.1
+    python -m benchmarks.bench_send --duration 600 --profiles 5 --groups 50
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import tempfile
+import time
+from collections import Counter
+
+import db
+import metrics
+import scheduler
+import telethon_utils
+from benchmarks.fake_telegram import client_options, make_clients, setup_db
+
+# --stress: tezlik cheklovlari amalda o'chadi, faqat kodning o'z xarajati qoladi
+STRESS_MESSAGES_PER_MINUTE = 6000
+STRESS_SEND_INTERVAL = 5
+STRESS_MIN_DELAY = 0.001
+
+
+async def one_cycle(clients):
+    """Har profil uchun bitta send_profile_messages aylanmasi, parallel."""
+    durations = {}
+
+    async def timed(client):
+        start = time.perf_counter()
+        await telethon_utils.send_profile_messages(client)
+        durations[client.profile_id] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(c) for c in clients))
+    return time.perf_counter() - start, durations
+
+
+async def run_scheduler(clients, duration):
+    """Haqiqiy SendScheduler ni `duration` sekund ishlatadi."""
+    scheduler.scheduler = scheduler.SendScheduler(clients)
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(scheduler.scheduler.run(), duration)
+    except asyncio.TimeoutError:
+        pass
+    # Bekor qilingan aylanmalar tugashini kutamiz — hisobotdan oldin CYCLE_DURATION ga yozib ulgursin
+    running = list(scheduler.scheduler._running.values())
+    for task in running:
+        task.cancel()
+    await asyncio.gather(*running, return_exceptions=True)
+    return time.perf_counter() - start
+
+
+def report(clients, elapsed, durations=None):
+    totals = Counter()
+    for client in clients:
+        totals.update(client.stats)
+    sent = totals["sent"]
+    print(f"\n{len(clients)} profil × {len(clients[0].channels)} guruh, {elapsed:.1f}s")
+    print(f"  yuborildi: {sent}   ({sent / elapsed:.1f} xabar/s, profilga {sent / elapsed * 60 / len(clients):.1f} xabar/daqiqa)")
+    print(f"  xatolar: flood {totals['flood']}, yozish taqiqlangan {totals['forbidden']}, slow mode {totals['slow_mode']}")
+    print(f"  tarmoq so‘rovlari: {totals['requests']} (get_entity {totals['get_entity']})")
+    if durations:
+        values = sorted(durations.values())
+        print(f"  aylanma vaqti: p50 {statistics.median(values):.1f}s, maks {values[-1]:.1f}s")
+    cycles = metrics.CYCLE_DURATION.snapshot()
+    if cycles:
+        count = sum(v["count"] for v in cycles.values())
+        print(f"  rejalashtiruvchi aylanmalari: {count}, o‘rtacha {sum(v['sum'] for v in cycles.values()) / count:.1f}s")
+    latency = metrics.SEND_LATENCY.snapshot()
+    if latency:
+        count = sum(v["count"] for v in latency.values())
+        print(f"  send_message o‘rtacha kechikishi: {sum(v['sum'] for v in latency.values()) / count * 1000:.1f} ms")
+    skipped = sum(1 for key in telethon_utils._group_backoff if telethon_utils.group_backoff_remaining(*key))
+    print(f"  backoffdagi guruhlar: {skipped}, backoffdagi profillar: "
+          f"{sum(1 for c in clients if telethon_utils.backoff_remaining(c.profile_id))}")
+
+
+async def main(args):
+    if args.stress:
+        args.messages_per_minute = args.messages_per_minute or STRESS_MESSAGES_PER_MINUTE
+        args.send_interval = args.send_interval or STRESS_SEND_INTERVAL
+        args.min_delay = STRESS_MIN_DELAY if args.min_delay is None else args.min_delay
+    if args.min_delay is not None:
+        telethon_utils.MIN_DELAY_BETWEEN_MSG = args.min_delay
+    telethon_utils.BATCH_SIZE = args.batch_size
+    with tempfile.TemporaryDirectory(prefix="bench_send_") as tmpdir:
+        setup_db(tmpdir)
+        try:
+            clients = await make_clients(args.profiles, {
+                "auto_send_enabled": 1, "messages_per_minute": args.messages_per_minute,
+                "send_interval": args.send_interval,
+            }, **client_options(args))
+            if args.duration:
+                elapsed = await run_scheduler(clients, args.duration)
+                report(clients, elapsed)
+            else:
+                elapsed, durations = await one_cycle(clients)
+                report(clients, elapsed, durations)
+        finally:
+            db.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=5)
+    parser.add_argument("--groups", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=0,
+                        help="0 — har profil uchun bitta aylanma; aks holda SendScheduler shuncha sekund ishlaydi")
+    parser.add_argument("--stress", action="store_true",
+                        help="pacing cheklovlarisiz: kodning o‘z xarajatini o‘lchash uchun")
+    parser.add_argument("--messages-per-minute", type=int, default=None,
+                        help="berilmasa — sozlanmagan profil (standart tezlik), productiondagidek")
+    parser.add_argument("--send-interval", type=int, default=None, help="sekund; berilmasa — GLOBAL_SLEEP")
+    parser.add_argument("--min-delay", type=float, default=None, help="telethon_utils.MIN_DELAY_BETWEEN_MSG")
+    parser.add_argument("--batch-size", type=int, default=telethon_utils.BATCH_SIZE)
+    parser.add_argument("--latency-min", type=float, default=0.001)
+    parser.add_argument("--latency-max", type=float, default=0.005)
+    parser.add_argument("--flood-per-minute", type=int, default=None)
+    parser.add_argument("--flood-seconds", type=int, default=30)
+    parser.add_argument("--forbidden", type=float, default=0.0, help="yozish taqiqlangan guruhlar ulushi")
+    parser.add_argument("--slow-mode", type=float, default=0.0, help="slow mode yoqilgan guruhlar ulushi")
+    parser.add_argument("--slow-mode-seconds", type=int, default=60)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    asyncio.run(main(args))
@@ -0,0 +1,47 @@
+"""Benchmark va simulyatsiyalar uchun umumiy tayyorgarlik: toza baza, profillar va soxta klientlar.
+
+Soxta TelegramClient (tests.support.FakeTelegramClient) testlar bilan umumiy;
+bu yerda faqat benchmark skriptlari ishlatadigan yordamchilar.
+"""
+import os
+
+import db
+import telethon_utils
+from tests.support import FakeTelegramClient
+
+
+def setup_db(directory: str, name: str = "bench.db"):
+    """directory ichida toza SQLite baza ochadi (db.DB_NAME) va keshlarni tozalaydi."""
+    db.close_connections()
+    db.DB_NAME = os.path.join(directory, name)
+    db.invalidate_profile_settings()
+    db.invalidate_groups()
+    db.init_db()
+
+
+def client_options(args) -> dict:
+    """bench_send / simulate ning umumiy CLI flaglaridan FakeTelegramClient parametrlari."""
+    return dict(groups=args.groups, latency=(args.latency_min, args.latency_max),
+                flood_per_minute=args.flood_per_minute, flood_seconds=args.flood_seconds,
+                forbidden_share=args.forbidden, slow_mode_share=args.slow_mode,
+                slow_mode_seconds=args.slow_mode_seconds)
+
+
+async def make_clients(profiles: int, settings: dict, load_groups: bool = True, **options) -> list:
+    """profiles ta profil yaratadi va har biriga FakeTelegramClient(**options) qaytaradi.
+
+    settings dagi None qiymatlar yozilmaydi — profil o'sha sozlamani bot orqali
+    hech o'zgartirmagandek (standart tezlik bilan) ishlaydi. load_groups bo'lsa,
+    guruhlar load_existing_groups() orqali (get_dialogs dan) bazaga yoziladi.
+    """
+    clients = []
+    for i in range(profiles):
+        profile_id = db.save_profile(1000 + i, "hash", f"+99890000{i:04d}", f"session_{i}")
+        for key, value in settings.items():
+            if value is not None:
+                db.update_profile_setting(profile_id, key, value)
+        client = FakeTelegramClient(profile_id, **options)
+        if load_groups:
+            await telethon_utils.load_existing_groups(client, profile_id)
+        clients.append(client)
+    return clients
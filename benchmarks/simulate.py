@@ -0,0 +1,140 @@
+"""Virtual soatli simulyatsiya: haqiqiy SendScheduler + soxta Telegram, bir sutka bir necha soniyada.
+
+Event loop vaqti (loop.time) virtual (tests.support.VirtualClockLoop): loopda
+bajariladigan ish qolmaganda soat darhol keyingi taymergacha suriladi, shuning
+uchun asyncio.sleep(900) bir zumda "o‘tadi". DB chaqiruvlari (db-worker oqimi)
+tugaguncha soat to‘xtab turadi, ya'ni tartib haqiqiy ishga tushirishdagidek saqlanadi.
+
+telethon_utils backoff muddatlarini datetime.now() bilan hisoblaydi; simulyatsiyada
+u ham virtual soatga bog‘lanadi (VirtualDatetime).
+
+Ishga tushirish (loyiha ildizidan):
+    python -m benchmarks.simulate --profiles 50 --groups 1000 --hours 24
+    python -m benchmarks.simulate --messages-per-minute 20 --flood-per-minute 15 --json report.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import tempfile
+import time
+
+import db
+import metrics
+import scheduler
+import send_log
+import telethon_utils
+from benchmarks.fake_telegram import client_options, make_clients, setup_db
+from tests.support import VirtualClockLoop, VirtualDatetime
+
+
+async def simulate(args) -> dict:
+    clients = await make_clients(args.profiles, {
+        "auto_send_enabled": 1, "messages_per_minute": args.messages_per_minute, "send_interval": args.send_interval,
+    }, **client_options(args))
+    duration = args.hours * 3600
+    flusher = asyncio.create_task(send_log.run_send_log())
+    scheduler.scheduler = scheduler.SendScheduler(clients)
+    try:
+        await asyncio.wait_for(scheduler.scheduler.run(), duration)
+    except asyncio.TimeoutError:
+        pass
+    # Tugagan aylanmalar soni — simulyatsiya oxirida hali ketayotganlari bekor qilinishidan oldin
+    completed = metrics.CYCLE_DURATION.snapshot()
+    in_flight = set(scheduler.scheduler._running)
+    running = list(scheduler.scheduler._running.values())
+    for task in running:
+        task.cancel()
+    await asyncio.gather(*running, return_exceptions=True)
+    flusher.cancel()
+    await asyncio.gather(flusher, return_exceptions=True)
+
+    # Bekor qilingan aylanma ham davomiyligini (shu paytgacha ketgan vaqtni) yozadi,
+    # shuning uchun band vaqt oxirigacha yuborib turgan profil uchun ham to'g'ri
+    cycles = metrics.CYCLE_DURATION.snapshot()
+    lag = metrics.SCHEDULER_LAG.snapshot()
+    minutes = duration / 60
+    profiles = []
+    for client in clients:
+        busy = cycles.get((client.profile_id,), {}).get("sum", 0.0)
+        profiles.append({
+            "profile_id": client.profile_id,
+            "sent": client.stats["sent"],
+            "messages_per_minute": client.stats["sent"] / minutes,
+            "cycles": completed.get((client.profile_id,), {}).get("count", 0),
+            "in_flight": client.profile_id in in_flight,
+            "idle_share": min(1.0, max(0.0, 1 - busy / duration)),
+            "flood_incidents": client.stats["flood"],
+            "forbidden": client.stats["forbidden"],
+            "slow_mode": client.stats["slow_mode"],
+            "scheduler_lag_avg": lag.get((client.profile_id,), {}).get("avg", 0.0),
+        })
+    return {
+        "config": vars(args),
+        "simulated_seconds": duration,
+        "total_sent": sum(p["sent"] for p in profiles),
+        "flood_incidents": sum(p["flood_incidents"] for p in profiles),
+        "profiles": profiles,
+    }
+
+
+def print_report(report, wall, show=10):
+    profiles = report["profiles"]
+    rates = sorted(p["messages_per_minute"] for p in profiles)
+    idle = sorted(p["idle_share"] for p in profiles)
+    print(f"\n{len(profiles)} profil, {report['simulated_seconds'] / 3600:.1f} soat simulyatsiya — {wall:.1f}s haqiqiy vaqt")
+    print(f"  jami yuborildi: {report['total_sent']}, flood hodisalari: {report['flood_incidents']}")
+    print(f"  xabar/daqiqa profilga: min {rates[0]:.2f}, p50 {statistics.median(rates):.2f}, maks {rates[-1]:.2f}")
+    print(f"  bo‘sh vaqt ulushi: min {idle[0]:.0%}, p50 {statistics.median(idle):.0%}, maks {idle[-1]:.0%}")
+    print(f"\n{'profil':>8}{'yuborildi':>11}{'xabar/min':>11}{'aylanma':>9}{'bo‘sh':>8}{'flood':>7}{'taqiq':>7}{'slow':>6}")
+    for p in profiles[:show]:
+        cycles = f"{p['cycles']}+1" if p["in_flight"] else str(p["cycles"])
+        print(f"{p['profile_id']:>8}{p['sent']:>11}{p['messages_per_minute']:>11.2f}{cycles:>9}"
+              f"{p['idle_share']:>8.0%}{p['flood_incidents']:>7}{p['forbidden']:>7}{p['slow_mode']:>6}")
+
+
+def main(args):
+    real_datetime = telethon_utils.datetime
+    telethon_utils.datetime = VirtualDatetime
+    with tempfile.TemporaryDirectory(prefix="simulate_") as tmpdir:
+        setup_db(tmpdir, "simulate.db")
+        loop = VirtualClockLoop()
+        asyncio.set_event_loop(loop)
+        wall = time.perf_counter()
+        try:
+            report = loop.run_until_complete(simulate(args))
+        finally:
+            telethon_utils.datetime = real_datetime
+            asyncio.set_event_loop(None)
+            loop.close()
+            db.close_connections()
+    wall = time.perf_counter() - wall
+    print_report(report, wall, args.show)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(dict(report, wall_seconds=wall), f, indent=2)
+        print(f"\nJSON hisobot: {args.json}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=50)
+    parser.add_argument("--groups", type=int, default=1000)
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--messages-per-minute", type=int, default=None,
+                        help="berilmasa — sozlanmagan profil (standart tezlik), productiondagidek")
+    parser.add_argument("--send-interval", type=int, default=None,
+                        help="sekund; berilmasa — GLOBAL_SLEEP")
+    parser.add_argument("--latency-min", type=float, default=0.05)
+    parser.add_argument("--latency-max", type=float, default=0.3)
+    parser.add_argument("--flood-per-minute", type=int, default=None)
+    parser.add_argument("--flood-seconds", type=int, default=300)
+    parser.add_argument("--forbidden", type=float, default=0.02)
+    parser.add_argument("--slow-mode", type=float, default=0.05)
+    parser.add_argument("--slow-mode-seconds", type=int, default=300)
+    parser.add_argument("--show", type=int, default=10, help="jadvalda ko‘rsatiladigan profillar soni")
+    parser.add_argument("--json", help="hisobotni shu faylga yozish")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    main(args)
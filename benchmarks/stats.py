@@ -0,0 +1,9 @@
+"""Benchmark skriptlari uchun umumiy statistika yordamchilari."""
+
+
+def percentile(sorted_values, share):
+    """Saralangan ro'yxatdan share (0..1) ulushdagi qiymat (bo'sh ro'yxat uchun 0.0)."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(share * (len(sorted_values) - 1))))
+    return sorted_values[index]
@@ -0,0 +1,62 @@
+from collections import OrderedDict
+from rate_limiter import monotonic
+
+
+class TTLCache:
+    """Chegaralangan LRU kesh, har bir yozuv `ttl` sekunddan keyin eskiradi.
+
+    Kesh to‘lsa eng uzoq ishlatilmagan yozuv chiqarib yuboriladi. get/set/pop
+    O(1). hits/misses hisoblagichlari samaradorlikni kuzatish uchun.
+    """
+
+    def __init__(self, maxsize: int, ttl: float = None, clock=monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, count=False) is not None
+
+    def get(self, key, default=None, count=True):
+        item = self._data.get(key)
+        if item is not None:
+            expires_at, value = item
+            if expires_at is None or expires_at > self._clock():
+                self._data.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return value
+            del self._data[key]
+        if count:
+            self.misses += 1
+        return default
+
+    def set(self, key, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = self._clock() + ttl if ttl is not None else None
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
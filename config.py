@@ -6,4 +6,12 @@ load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_ID = os.getenv("ADMIN_ID")
 
-DB_FILE = "userbot_settings.db"
\ No newline at end of file
+DB_FILE = "userbot_settings.db"
+
+# Ishga tushishda profillarni ulash: bir vaqtda nechta va har biriga qancha vaqt (sekund)
+PROFILE_CONNECT_CONCURRENCY = int(os.getenv("PROFILE_CONNECT_CONCURRENCY", 5))
+PROFILE_CONNECT_TIMEOUT = int(os.getenv("PROFILE_CONNECT_TIMEOUT", 180))
+
+# Prometheus metrikalari (/metrics). 0 — o'chirilgan
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9108))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
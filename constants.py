@@ -1,6 +1,7 @@
 MAIN_MENU_BUTTONS = {
     "ADD_PROFILE": "➕ Profil qo‘shish",
     "LIST_PROFILES": "📋 Profillar ro‘yxati",
+    "STATS": "📊 Statistika",
 }
 
 PROFILE_MENU_BUTTONS = {
@@ -13,6 +14,8 @@ PROFILE_MENU_BUTTONS = {
     "TOGGLE_RESPONSE_REPLY": "🔄 Guruh avto javob yoqish/o‘chirish",
     "MESSAGE_TEXT": "✉ Xabar matni",
     "TOGGLE_AUTO_SEND": "🚀 Avtomatik yuborish yoqish/o‘chirish",
+    "MESSAGES_PER_MINUTE": "⏱ Daqiqadagi xabarlar",
+    "SEND_INTERVAL": "⏰ Yuborish oralig‘i",
     "DELETE_PROFILE": "🚪 Profil o‘chirish",
     "BACK_TO_MAIN": "🔙 Asosiy menyuga",
 }
@@ -42,4 +45,17 @@ MESSAGES = {
     "RESPONSE_REPLY_TOGGLED": "🔄 Guruh avto javob {status}.",
     "TEXT_UPDATED": "✅ {type} o‘zgartirildi: {text}",
     "CONFIRM_DELETE": "🗑 {phone} profilini o‘chirishni xohlaysizmi?",
+    "INVALID_NUMBER": "🔢 Iltimos, musbat butun son yuboring.",
+    "PACING_UPDATED": "✅ {type} o‘zgartirildi: {value}. Keyingi xabardan boshlab qo‘llanadi.",
+    "PACING_CLAMPED": "⚠️ {requested} juda ko‘p: xabarlar orasida kamida {min_delay:.0f}s kutiladi, "
+                      "shuning uchun eng ko‘pi {value} xabar/daqiqa saqlandi.",
+    "STATS_HEADER": "📊 Statistika (oxirgi 1 soat / 24 soat):",
+    "STATS_PROFILE": (
+        "\n📱 {phone}{status}\n"
+        "✉ Yuborildi: {sent_hour} / {sent_day}\n"
+        "✅ Muvaffaqiyat: {success}\n"
+        "⏱ O‘rtacha yuborish: {latency}\n"
+        "⏸️ Backoff: {backoff}\n"
+        "⏰ Keyingi aylanma: {next_cycle}"
+    ),
 }
\ No newline at end of file
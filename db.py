@@ -1,174 +1,761 @@
 import sqlite3
 import logging
 import threading
+import time
+from contextlib import contextmanager
 
-_db_lock = threading.Lock() 
+_db_lock = threading.Lock()   # yozuvchi ulanish uchun qulf
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 DB_NAME = 'userbot_settings.db'
 
+# Ulanishlar havzasi (pool): bitta yozuvchi + har bir oqim uchun bitta o‘quvchi ulanish.
+# WAL rejimida o‘quvchilar yozuvchini to‘smaydi, ulanishlar esa butun dastur
+# davomida ochiq turadi, shuning uchun tayyorlangan so‘rovlar (prepared
+# statements) sqlite3 ning ichki keshi orqali qayta ishlatiladi.
+STATEMENT_CACHE_SIZE = 256
+_local = threading.local()
+_writer = None
+_generation = 0
+_connections = []
+_connections_lock = threading.Lock()
+
+def _open_connection():
+    conn = sqlite3.connect(DB_NAME, timeout=10, check_same_thread=False,
+                           cached_statements=STATEMENT_CACHE_SIZE)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=OFF")
+    with _connections_lock:
+        _connections.append(conn)
+    return conn
+
 def get_connection():
-    # 🔧 Muhim o‘zgarish: timeout va check_same_thread qo‘shildi
-    return sqlite3.connect(DB_NAME, timeout=10, check_same_thread=False)
+    """Joriy oqim uchun o‘qish ulanishini qaytaradi (havzadan)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "generation", None) != _generation:
+        conn = _open_connection()
+        _local.conn = conn
+        _local.generation = _generation
+    return conn
+
+def _get_writer():
+    global _writer
+    if _writer is None:
+        _writer = _open_connection()
+    return _writer
+
+@contextmanager
+def get_cursor(write=False):
+    """Havzadagi ulanishdan kursor beradi.
+
+    write=True bo‘lsa, yagona yozuvchi ulanish qulf ostida olinadi va blok
+    muvaffaqiyatli tugasa commit, xato bo‘lsa rollback qilinadi.
+    """
+    if not write:
+        yield get_connection().cursor()
+        return
+    with _db_lock:
+        conn = _get_writer()
+        try:
+            yield conn.cursor()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def close_connections():
+    """Havzadagi barcha ulanishlarni yopadi (dastur tugaganda yoki DB_NAME o‘zgarganda)."""
+    global _writer, _generation
+    with _connections_lock:
+        for conn in _connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        _connections.clear()
+    _writer = None
+    _generation += 1
+
+# Profil sozlamalari keshi: profile_id -> {ustun: qiymat}.
+# Birinchi murojaatda profiles jadvalidan butun qator o‘qiladi, keyin
+# update_profile_setting orqali joyida yangilanadi (write-through).
+_settings_cache = {}
+_settings_lock = threading.Lock()
+_settings_stats = {"hits": 0, "misses": 0}
+
+def _load_profile_row(profile_id):
+    with get_cursor() as c:
+        c.execute("SELECT * FROM profiles WHERE id = ?", (profile_id,))
+        row = c.fetchone()
+        if row is None:
+            return None
+        return {col[0]: value for col, value in zip(c.description, row)}
+
+def is_profile_cached(profile_id):
+    return profile_id in _settings_cache
+
+def get_profile_settings(profile_id):
+    """Profilning barcha sozlamalarini keshdan (kerak bo‘lsa DB dan) qaytaradi."""
+    settings = _settings_cache.get(profile_id)
+    if settings is not None:
+        with _settings_lock:
+            _settings_stats["hits"] += 1
+        return settings
+    with _settings_lock:
+        _settings_stats["misses"] += 1
+    settings = _load_profile_row(profile_id)
+    if settings is not None:
+        with _settings_lock:
+            settings = _settings_cache.setdefault(profile_id, settings)
+    return settings
+
+def invalidate_profile_settings(profile_id=None):
+    """Profil (yoki barcha profillar) keshini tozalaydi."""
+    with _settings_lock:
+        if profile_id is None:
+            _settings_cache.clear()
+        else:
+            _settings_cache.pop(profile_id, None)
+
+def settings_cache_stats():
+    """Sozlamalar keshining hit/miss hisoblagichlari."""
+    with _settings_lock:
+        return dict(_settings_stats, cached_profiles=len(_settings_cache))
 
 def init_db():
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS profiles (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            api_id INTEGER,
-            api_hash TEXT,
-            phone TEXT,
-            session_name TEXT,
-            auto_reply_enabled INTEGER DEFAULT 0,
-            auto_reply_text TEXT DEFAULT 'Salom! Bu avtomatik javob.',
-            response_reply_enabled INTEGER DEFAULT 0,
-            response_reply_text TEXT DEFAULT 'Avto javob guruhda.',
-            message_text TEXT DEFAULT '📢 Bu avtomatik xabar!',
-            auto_send_enabled INTEGER DEFAULT 0,
-            messages_per_minute INTEGER DEFAULT 30,
-            send_interval INTEGER DEFAULT 60
-        )''')
-        c.execute('''CREATE TABLE IF NOT EXISTS groups (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            link TEXT,
-            profile_id INTEGER,
-            FOREIGN KEY (profile_id) REFERENCES profiles(id)
-        )''')
-        conn.commit()
+        with get_cursor(write=True) as c:
+            c.execute('''CREATE TABLE IF NOT EXISTS profiles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                api_id INTEGER,
+                api_hash TEXT,
+                phone TEXT,
+                session_name TEXT,
+                auto_reply_enabled INTEGER DEFAULT 0,
+                auto_reply_text TEXT DEFAULT 'Salom! Bu avtomatik javob.',
+                response_reply_enabled INTEGER DEFAULT 0,
+                response_reply_text TEXT DEFAULT 'Avto javob guruhda.',
+                message_text TEXT DEFAULT '📢 Bu avtomatik xabar!',
+                auto_send_enabled INTEGER DEFAULT 0,
+                messages_per_minute INTEGER DEFAULT 30,
+                send_interval INTEGER DEFAULT 60
+            )''')
+            c.execute('''CREATE TABLE IF NOT EXISTS groups (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                link TEXT,
+                profile_id INTEGER,
+                FOREIGN KEY (profile_id) REFERENCES profiles(id)
+            )''')
+        migrate_db()
         logger.info("Ma'lumotlar bazasi muvaffaqiyatli yaratildi.")
     except Exception as e:
         logger.error(f"Ma'lumotlar bazasi yaratishda xato: {e}")
-    finally:
-        conn.close()
+
+# Sxema migratsiyalari. Har bir funksiya bitta versiyani bildiradi va
+# PRAGMA user_version orqali faqat bir marta, o‘z tranzaksiyasida bajariladi.
+# Yangi migratsiyani faqat ro‘yxat oxiriga qo‘shing.
+def _migration_unique_groups(c):
+    # Eski bazalardagi dublikatlarni bir marta tozalab, keyin unique indeks qo‘yamiz.
+    # (profile_id, link) indeksi load_groups dagi profile_id bo‘yicha qidiruvni ham qoplaydi.
+    c.execute('''
+        DELETE FROM groups
+        WHERE id NOT IN (
+            SELECT MIN(id)
+            FROM groups
+            GROUP BY link, profile_id
+        )
+    ''')
+    if c.rowcount:
+        logger.info(f"🧹 Migratsiya: {c.rowcount} ta dublikat guruh o‘chirildi.")
+    c.execute("DROP INDEX IF EXISTS idx_groups_profile_link")
+    c.execute("CREATE UNIQUE INDEX idx_groups_profile_link ON groups (profile_id, link)")
+
+def _migration_entity_cache(c):
+    # Resolve qilingan peerlar (get_entity natijasi) restartdan keyin ham saqlanadi
+    c.execute('''CREATE TABLE IF NOT EXISTS entity_cache (
+        profile_id INTEGER NOT NULL,
+        link TEXT NOT NULL,
+        peer_type TEXT NOT NULL,
+        peer_id INTEGER NOT NULL,
+        access_hash INTEGER,
+        resolved_at REAL NOT NULL,
+        PRIMARY KEY (profile_id, link)
+    )''')
+
+def _migration_group_peers(c):
+    # Guruh qatorida peer id/access_hash saqlanadi — yuborishda get_entity kerak bo'lmaydi
+    for column, kind in (("peer_id", "INTEGER"), ("access_hash", "INTEGER"), ("title", "TEXT"),
+                         ("peer_type", "TEXT"), ("resolved_at", "REAL")):
+        c.execute(f"ALTER TABLE groups ADD COLUMN {column} {kind}")
+    # Mavjud qatorlarni entity keshidan to'ldiramiz; qolganlari keyingi
+    # load_existing_groups yoki birinchi yuborishda to'ldiriladi.
+    # groups.peer_type: megagroup / broadcast / chat. Keshdagi "channel" turidan
+    # megagroup yoki broadcast ekanini bilib bo'lmaydi — ikkalasi ham InputPeerChannel,
+    # aniq tur load_existing_groups da yoziladi. "user" qatorlari ko'chirilmaydi.
+    c.execute('''
+        UPDATE groups SET
+            peer_id = (SELECT e.peer_id FROM entity_cache e WHERE e.profile_id = groups.profile_id AND e.link = groups.link),
+            access_hash = (SELECT e.access_hash FROM entity_cache e WHERE e.profile_id = groups.profile_id AND e.link = groups.link),
+            peer_type = (SELECT CASE e.peer_type WHEN 'chat' THEN 'chat' ELSE 'megagroup' END
+                         FROM entity_cache e WHERE e.profile_id = groups.profile_id AND e.link = groups.link),
+            resolved_at = (SELECT e.resolved_at FROM entity_cache e WHERE e.profile_id = groups.profile_id AND e.link = groups.link)
+        WHERE EXISTS (SELECT 1 FROM entity_cache e WHERE e.profile_id = groups.profile_id AND e.link = groups.link
+                      AND e.peer_type IN ('channel', 'chat'))
+    ''')
+
+def _migration_send_log(c):
+    # Faqat qo'shiladigan yuborish jurnali: hamma ustun INTEGER (ts — unix sekund,
+    # group_id — groups.id, status — SEND_* kodi, latency_ms, wait — FloodWait sekundlari)
+    c.execute('''CREATE TABLE IF NOT EXISTS send_log (
+        ts INTEGER NOT NULL,
+        profile_id INTEGER NOT NULL,
+        group_id INTEGER,
+        status INTEGER NOT NULL,
+        latency_ms INTEGER,
+        wait INTEGER
+    )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_send_log_ts ON send_log(ts)")
+
+def _migration_backoff(c):
+    # Flood/backoff tugash vaqtlari restartdan keyin ham saqlanadi.
+    # group_id = 0 — butun profil, aks holda groups.id
+    c.execute('''CREATE TABLE IF NOT EXISTS backoff (
+        profile_id INTEGER NOT NULL,
+        group_id INTEGER NOT NULL DEFAULT 0,
+        until REAL NOT NULL,
+        PRIMARY KEY (profile_id, group_id)
+    ) WITHOUT ROWID''')
+
+def _migration_group_health(c):
+    # Guruh "sog'ligi": ketma-ket xatolar, slow mode sekundlari, oxirgi muvaffaqiyatli yuborish (unix)
+    c.execute("ALTER TABLE groups ADD COLUMN fail_count INTEGER NOT NULL DEFAULT 0")
+    c.execute("ALTER TABLE groups ADD COLUMN slow_mode INTEGER NOT NULL DEFAULT 0")
+    c.execute("ALTER TABLE groups ADD COLUMN last_success INTEGER")
+
+def _migration_unset_pacing(c):
+    # Sxemadagi DEFAULT 30 / 60 hech qachon foydalanuvchi tanlovi bo'lmagan, lekin
+    # get_pacing ularni o'qib barcha profillarni ~20 barobar tezlashtirgan edi.
+    # Tegilmagan standart qiymatlar NULL ("sozlanmagan") ga aylantiriladi —
+    # bunday profil eski sekin tezlikda ishlaydi (telethon_utils.get_pacing).
+    c.execute("UPDATE profiles SET messages_per_minute = NULL WHERE messages_per_minute = 30")
+    c.execute("UPDATE profiles SET send_interval = NULL WHERE send_interval = 60")
+
+def _migration_entity_cache_resolved_index(c):
+    # prune_entity_cache eskirgan yozuvlarni resolved_at bo'yicha topadi
+    c.execute("CREATE INDEX IF NOT EXISTS idx_entity_cache_resolved ON entity_cache(resolved_at)")
+
+def _migration_fix_group_peer_types(c):
+    # 3-migratsiyaning eski varianti entity_cache turlarini (channel/chat/user) groups
+    # ga to'g'ridan-to'g'ri ko'chirgan edi. channel -> megagroup; boshqa turdagi
+    # (masalan user) peer ma'lumoti tozalanadi va keyingi yuborishda qayta resolve qilinadi.
+    c.execute("UPDATE groups SET peer_type = 'megagroup' WHERE peer_type = 'channel'")
+    c.execute("UPDATE groups SET peer_id = NULL, access_hash = NULL, peer_type = NULL, resolved_at = NULL "
+              "WHERE peer_type NOT IN ('megagroup', 'broadcast', 'chat')")
+
+MIGRATIONS = [
+    _migration_unique_groups,
+    _migration_entity_cache,
+    _migration_group_peers,
+    _migration_send_log,
+    _migration_backoff,
+    _migration_group_health,
+    _migration_unset_pacing,
+    _migration_entity_cache_resolved_index,
+    _migration_fix_group_peer_types,
+]
+
+def get_schema_version():
+    with get_cursor() as c:
+        c.execute("PRAGMA user_version")
+        return c.fetchone()[0]
+
+def migrate_db():
+    """Hali qo‘llanmagan migratsiyalarni tartib bilan bajaradi."""
+    version = get_schema_version()
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        with get_cursor(write=True) as c:
+            c.execute("BEGIN")
+            migration(c)
+            c.execute(f"PRAGMA user_version = {number}")
+        logger.info(f"Ma'lumotlar bazasi sxemasi {number}-versiyaga yangilandi ({migration.__name__}).")
 
 def save_profile(api_id, api_hash, phone, session_name):
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute("INSERT INTO profiles (api_id, api_hash, phone, session_name) VALUES (?, ?, ?, ?)",
-                  (api_id, api_hash, phone, session_name))
-        conn.commit()
-        profile_id = c.lastrowid
+        with get_cursor(write=True) as c:
+            # messages_per_minute / send_interval NULL — botdan sozlanmaguncha sekin standart tezlik
+            c.execute("INSERT INTO profiles (api_id, api_hash, phone, session_name, messages_per_minute, send_interval) "
+                      "VALUES (?, ?, ?, ?, NULL, NULL)", (api_id, api_hash, phone, session_name))
+            profile_id = c.lastrowid
         logger.info(f"Profil saqlandi: {phone}, ID: {profile_id}")
         return profile_id
     except Exception as e:
         logger.error(f"Profil saqlashda xato: {e}")
         return None
-    finally:
-        conn.close()
 
 def remove_profile(profile_id):
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute("DELETE FROM profiles WHERE id = ?", (profile_id,))
-        c.execute("DELETE FROM groups WHERE profile_id = ?", (profile_id,))
-        conn.commit()
+        with get_cursor(write=True) as c:
+            c.execute("DELETE FROM profiles WHERE id = ?", (profile_id,))
+            c.execute("DELETE FROM groups WHERE profile_id = ?", (profile_id,))
+            c.execute("DELETE FROM entity_cache WHERE profile_id = ?", (profile_id,))
+            c.execute("DELETE FROM send_log WHERE profile_id = ?", (profile_id,))
+            c.execute("DELETE FROM backoff WHERE profile_id = ?", (profile_id,))
+        invalidate_profile_settings(profile_id)
+        invalidate_groups(profile_id)
         logger.info(f"Profil o‘chirildi: ID {profile_id}")
     except Exception as e:
         logger.error(f"Profil o‘chirishda xato: {e}")
-    finally:
-        conn.close()
 
 def load_profiles():
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute("SELECT id, api_id, api_hash, phone, session_name, auto_reply_enabled, auto_reply_text, response_reply_enabled, response_reply_text, message_text, auto_send_enabled, messages_per_minute, send_interval FROM profiles")
-        profiles = [{'id': row[0], 'api_id': row[1], 'api_hash': row[2], 'phone': row[3], 'session_name': row[4], 
-                     'auto_reply_enabled': row[5], 'auto_reply_text': row[6], 'response_reply_enabled': row[7], 
-                     'response_reply_text': row[8], 'message_text': row[9], 'auto_send_enabled': row[10], 
-                     'messages_per_minute': row[11], 'send_interval': row[12]} for row in c.fetchall()]
+        with get_cursor() as c:
+            c.execute("SELECT id, api_id, api_hash, phone, session_name, auto_reply_enabled, auto_reply_text, response_reply_enabled, response_reply_text, message_text, auto_send_enabled, messages_per_minute, send_interval FROM profiles")
+            profiles = [{'id': row[0], 'api_id': row[1], 'api_hash': row[2], 'phone': row[3], 'session_name': row[4], 
+                         'auto_reply_enabled': row[5], 'auto_reply_text': row[6], 'response_reply_enabled': row[7], 
+                         'response_reply_text': row[8], 'message_text': row[9], 'auto_send_enabled': row[10], 
+                         'messages_per_minute': row[11], 'send_interval': row[12]} for row in c.fetchall()]
+        # Keshni oldindan to‘ldiramiz — handlerlar birinchi xabarda ham DB ga tushmaydi
+        with _settings_lock:
+            for prof in profiles:
+                _settings_cache.setdefault(prof['id'], dict(prof))
         return profiles
     except Exception as e:
         logger.error(f"Profillarni yuklashda xato: {e}")
         return []
-    finally:
-        conn.close()
 
-def save_group(link, profile_id):
+GROUP_PEER_FIELDS = ("peer_id", "access_hash", "title", "peer_type")
+
+# Yangi guruh qo'shiladi; bor bo'lsa, faqat peer ma'lumoti kelgan bo'lsa yangilanadi
+_UPSERT_GROUP_SQL = '''
+    INSERT INTO groups (link, profile_id, peer_id, access_hash, title, peer_type, resolved_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (profile_id, link) DO UPDATE SET
+        peer_id = excluded.peer_id,
+        access_hash = excluded.access_hash,
+        title = excluded.title,
+        peer_type = excluded.peer_type,
+        resolved_at = excluded.resolved_at
+    WHERE excluded.peer_id IS NOT NULL
+'''
+
+def _group_params(group, profile_id, now):
+    if isinstance(group, str):
+        group = {"link": group}
+    peer_id = group.get("peer_id")
+    return (group["link"], profile_id, peer_id, group.get("access_hash"), group.get("title"),
+            group.get("peer_type"), now if peer_id is not None else None)
+
+def save_group(link, profile_id, peer_id=None, access_hash=None, title=None, peer_type=None):
     try:
-        with _db_lock:   # <-- lock ichida bajariladi
-            conn = get_connection()
-            c = conn.cursor()
-            c.execute("INSERT OR IGNORE INTO groups (link, profile_id) VALUES (?, ?)", (link, profile_id))
-            conn.commit()
-            logger.info(f"Guruh saqlandi: {link}, Profil ID: {profile_id}")
-            
+        group = {"link": link, "peer_id": peer_id, "access_hash": access_hash, "title": title, "peer_type": peer_type}
+        row = None
+        with get_cursor(write=True) as c:
+            c.execute(_UPSERT_GROUP_SQL, _group_params(group, profile_id, time.time()))
+            if is_groups_cached(profile_id):
+                c.execute(f"SELECT {_GROUP_COLUMNS} FROM groups WHERE profile_id = ? AND link = ?", (profile_id, link))
+                row = c.fetchone()
+        if row is not None:
+            _cache_group_rows(profile_id, [row])
+        logger.info(f"Guruh saqlandi: {link}, Profil ID: {profile_id}")
     except Exception as e:
         logger.error(f"Guruh saqlashda xato: {e}")
-    finally:
-        conn.close()
+
+def save_groups(groups, profile_id):
+    """Bir nechta guruhni bitta tranzaksiyada saqlaydi. Yangi qo‘shilganlar sonini qaytaradi.
+
+    groups — link satrlari yoki {"link", "peer_id", "access_hash", "title", "peer_type"} lug‘atlari.
+    Mavjud guruhlarning peer ma'lumoti yangilanadi.
+    """
+    now = time.time()
+    params = {}
+    for group in groups:
+        row = _group_params(group, profile_id, now)
+        params[row[0]] = row
+    if not params:
+        return 0
+    try:
+        rows = []
+        with get_cursor(write=True) as c:
+            c.execute("SELECT COUNT(*) FROM groups WHERE profile_id = ?", (profile_id,))
+            before = c.fetchone()[0]
+            c.executemany(_UPSERT_GROUP_SQL, params.values())
+            c.execute("SELECT COUNT(*) FROM groups WHERE profile_id = ?", (profile_id,))
+            added = c.fetchone()[0] - before
+            if is_groups_cached(profile_id):
+                # Reyestrga faqat shu chaqiruvdagi qatorlar qayta o‘qiladi (butun jadval emas)
+                links = list(params)
+                for start in range(0, len(links), GROUP_SELECT_CHUNK):
+                    chunk = links[start:start + GROUP_SELECT_CHUNK]
+                    c.execute(f"SELECT {_GROUP_COLUMNS} FROM groups WHERE profile_id = ? AND link IN "
+                              f"({','.join('?' * len(chunk))})", (profile_id, *chunk))
+                    rows.extend(c.fetchall())
+        _cache_group_rows(profile_id, sorted(rows))
+        logger.info(f"Guruhlar saqlandi: {added} ta yangi ({len(params)} tadan), Profil ID: {profile_id}")
+        return added
+    except Exception as e:
+        logger.error(f"Guruhlarni saqlashda xato: {e}")
+        return 0
+
+def update_group_peer(link, profile_id, peer_id, access_hash=None, title=None, peer_type=None):
+    """Mavjud guruh qatoriga resolve qilingan peer ma'lumotini yozadi."""
+    try:
+        with get_cursor(write=True) as c:
+            c.execute("UPDATE groups SET peer_id = ?, access_hash = ?, title = ?, peer_type = ?, resolved_at = ? "
+                      "WHERE profile_id = ? AND link = ?",
+                      (peer_id, access_hash, title, peer_type, time.time(), profile_id, link))
+        with _groups_lock:
+            row = _group_registry.get(profile_id, {}).get(link)
+            if row is not None:
+                row.update(peer_id=peer_id, access_hash=access_hash, title=title, peer_type=peer_type)
+    except Exception as e:
+        logger.error(f"Guruh peer ma'lumotini yangilashda xato: {e}")
 
 def remove_duplicate_groups():
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute('''
-            DELETE FROM groups
-            WHERE id NOT IN (
-                SELECT MIN(id)
-                FROM groups
-                GROUP BY link, profile_id
-            )
-        ''')
-        deleted = conn.total_changes
-        conn.commit()
+        with get_cursor(write=True) as c:
+            c.execute('''
+                DELETE FROM groups
+                WHERE id NOT IN (
+                    SELECT MIN(id)
+                    FROM groups
+                    GROUP BY link, profile_id
+                )
+            ''')
+            deleted = c.rowcount
+        if deleted:
+            invalidate_groups()
         logger.info(f"🧹 Dublikat guruhlar o‘chirildi: {deleted} ta yozuv.")
     except Exception as e:
         logger.error(f"Dublikatlarni o‘chirishda xato: {e}")
-    finally:
-        conn.close()
 
 def remove_group(link, profile_id):
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute("DELETE FROM groups WHERE link = ? AND profile_id = ?", (link, profile_id))
-        conn.commit()
+        with get_cursor(write=True) as c:
+            c.execute("DELETE FROM backoff WHERE profile_id = ? AND group_id IN "
+                      "(SELECT id FROM groups WHERE link = ? AND profile_id = ?)", (profile_id, link, profile_id))
+            c.execute("DELETE FROM groups WHERE link = ? AND profile_id = ?", (link, profile_id))
+        with _groups_lock:
+            row = _group_registry.get(profile_id, {}).pop(link, None)
+            if row is not None:
+                _group_rows_by_id.pop(row["id"], None)
         logger.info(f"Guruh o‘chirildi: {link}, Profil ID: {profile_id}")
     except Exception as e:
         logger.error(f"Guruh o‘chirishda xato: {e}")
-    finally:
-        conn.close()
+
+# Guruhlar reyestri: profile_id -> {link: qator}. Profil guruhlari birinchi
+# murojaatda bir marta (ORDER BY id) o‘qiladi, keyin save_group / save_groups /
+# update_group_peer / update_group_health / remove_group orqali joyida
+# yangilanadi (write-through). dict kiritish tartibini saqlaydi, yangi guruh esa
+# eng katta id bilan qo‘shiladi — iteratsiya tartibi ORDER BY id bilan bir xil.
+_group_registry = {}
+_group_rows_by_id = {}      # group id -> reyestrdagi o‘sha qator (update_group_health uchun)
+_groups_lock = threading.Lock()
+GROUP_SELECT_CHUNK = 500    # save_groups dan keyin "link IN (...)" bo‘laklari (SQLite parametr chegarasi)
+
+_GROUP_KEYS = ("id", "link", "peer_id", "access_hash", "title", "peer_type", "fail_count", "slow_mode", "last_success")
+_GROUP_COLUMNS = ", ".join(_GROUP_KEYS)
+
+def is_groups_cached(profile_id):
+    return profile_id in _group_registry
+
+def cached_groups(profile_id):
+    """Profil reyestri ({link: qator}) keshda bo‘lsa — uni, aks holda None (DB ga murojaat qilmaydi)."""
+    with _groups_lock:
+        return _group_registry.get(profile_id)
+
+def _cache_group_rows(profile_id, rows):
+    """Yozilgan qatorlarni (jadvaldan qayta o‘qilgan) profil reyestriga qo‘shadi yoki yangilaydi."""
+    with _groups_lock:
+        groups = _group_registry.get(profile_id)
+        if groups is None:
+            return
+        for row in rows:
+            row = dict(zip(_GROUP_KEYS, row))
+            current = groups.get(row["link"])
+            if current is None:
+                groups[row["link"]] = row
+                _group_rows_by_id[row["id"]] = row
+            else:
+                current.update(row)
+
+def _groups_of(profile_id):
+    """Profil reyestri ({link: qator}); keshda bo‘lmasa DB dan bir marta yuklanadi."""
+    groups = _group_registry.get(profile_id)
+    if groups is not None:
+        return groups
+    # Yozuvchi qulfi ostida yuklaymiz: o‘qish va keshga qo‘yish oralig‘ida commit
+    # bo‘lgan yozuv reyestrga tushmay qolmasligi uchun
+    with _db_lock:
+        with get_cursor() as c:
+            c.execute(f"SELECT {_GROUP_COLUMNS} FROM groups WHERE profile_id = ? ORDER BY id", (profile_id,))
+            rows = [dict(zip(_GROUP_KEYS, row)) for row in c.fetchall()]
+        with _groups_lock:
+            groups = _group_registry.get(profile_id)
+            if groups is None:
+                groups = _group_registry[profile_id] = {row["link"]: row for row in rows}
+                for row in rows:
+                    _group_rows_by_id[row["id"]] = row
+    return groups
+
+def invalidate_groups(profile_id=None):
+    """Profil (yoki barcha profillar) guruh reyestrini tozalaydi."""
+    with _groups_lock:
+        if profile_id is None:
+            _group_registry.clear()
+            _group_rows_by_id.clear()
+            return
+        for row in _group_registry.pop(profile_id, {}).values():
+            _group_rows_by_id.pop(row["id"], None)
+
+def group_registry_stats():
+    with _groups_lock:
+        return {"cached_profiles": len(_group_registry), "groups": len(_group_rows_by_id)}
+
+def group_links(groups):
+    with _groups_lock:
+        return list(groups)
+
+def group_rows(groups):
+    with _groups_lock:
+        return list(groups.values())
 
 def load_groups(profile_id):
+    """Profil guruh linklari (qo‘shilish tartibida), reyestrdan."""
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute("SELECT link FROM groups WHERE profile_id = ?", (profile_id,))
-        groups = [row[0] for row in c.fetchall()]
-        return groups
+        return group_links(_groups_of(profile_id))
     except Exception as e:
         logger.error(f"Guruhlarni yuklashda xato: {e}")
         return []
-    finally:
-        conn.close()
+
+def count_groups(profile_id):
+    try:
+        return len(_groups_of(profile_id))
+    except Exception as e:
+        logger.error(f"Guruhlarni sanashda xato: {e}")
+        return 0
+
+def has_group(profile_id, link):
+    try:
+        return link in _groups_of(profile_id)
+    except Exception as e:
+        logger.error(f"Guruhni tekshirishda xato: {e}")
+        return False
+
+ENTITY_CACHE_PRUNE_CHUNK = 5000
+
+def save_entity(profile_id, link, peer_type, peer_id, access_hash):
+    try:
+        with get_cursor(write=True) as c:
+            c.execute("INSERT OR REPLACE INTO entity_cache (profile_id, link, peer_type, peer_id, access_hash, resolved_at) "
+                      "VALUES (?, ?, ?, ?, ?, ?)", (profile_id, link, peer_type, peer_id, access_hash, time.time()))
+    except Exception as e:
+        logger.error(f"Entity keshini saqlashda xato: {e}")
+
+def load_entity(profile_id, link, max_age=None):
+    """(peer_type, peer_id, access_hash) yoki None. max_age sekunddan eski yozuvlar hisobga olinmaydi."""
+    try:
+        with get_cursor() as c:
+            c.execute("SELECT peer_type, peer_id, access_hash, resolved_at FROM entity_cache WHERE profile_id = ? AND link = ?",
+                      (profile_id, link))
+            row = c.fetchone()
+        if row is None or (max_age is not None and row[3] < time.time() - max_age):
+            return None
+        return row[:3]
+    except Exception as e:
+        logger.error(f"Entity keshini olishda xato: {e}")
+        return None
+
+def prune_entity_cache(before_ts):
+    """resolved_at i before_ts dan eski entity keshi yozuvlarini bo'laklab o'chiradi."""
+    removed = 0
+    try:
+        while True:
+            with get_cursor(write=True) as c:
+                c.execute("DELETE FROM entity_cache WHERE rowid IN "
+                          "(SELECT rowid FROM entity_cache WHERE resolved_at < ? LIMIT ?)",
+                          (before_ts, ENTITY_CACHE_PRUNE_CHUNK))
+                deleted = c.rowcount
+            removed += deleted
+            if deleted < ENTITY_CACHE_PRUNE_CHUNK:
+                return removed
+    except Exception as e:
+        logger.error(f"Entity keshini tozalashda xato: {e}")
+        return removed
+
+def remove_entity(profile_id, link):
+    try:
+        with get_cursor(write=True) as c:
+            c.execute("DELETE FROM entity_cache WHERE profile_id = ? AND link = ?", (profile_id, link))
+    except Exception as e:
+        logger.error(f"Entity keshini o‘chirishda xato: {e}")
+
+def load_group_peers(profile_id):
+    """Guruhlar peer va sog'lik ma'lumoti bilan, id tartibida:
+    [{"id", "link", "peer_id", "access_hash", "title", "peer_type", "fail_count", "slow_mode", "last_success"}].
+
+    Qatorlar reyestrdagi jonli lug'atlar (sozlamalar keshi kabi) — faqat o'qish uchun.
+    """
+    try:
+        return group_rows(_groups_of(profile_id))
+    except Exception as e:
+        logger.error(f"Guruhlarni yuklashda xato: {e}")
+        return []
+
+# Yuborish jurnali (send_log) status kodlari
+SEND_OK = 0
+SEND_FLOOD = 1
+SEND_FORBIDDEN = 2
+SEND_BANNED = 3
+SEND_INVALID_PEER = 4
+SEND_ERROR = 5
+SEND_SLOW_MODE = 6
+SEND_LOG_PRUNE_CHUNK = 5000
+
+def save_send_log(rows):
+    """[(ts, profile_id, group_id, status, latency_ms, wait), ...] ni bitta tranzaksiyada yozadi."""
+    if not rows:
+        return 0
+    try:
+        with get_cursor(write=True) as c:
+            c.executemany("INSERT INTO send_log (ts, profile_id, group_id, status, latency_ms, wait) "
+                          "VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+    except Exception as e:
+        logger.error(f"Yuborish jurnalini yozishda xato: {e}")
+        return 0
+
+def prune_send_log(before_ts):
+    """before_ts dan eski yozuvlarni bo'laklab o'chiradi (yozuvchi qulfi uzoq band bo'lmaydi)."""
+    removed = 0
+    try:
+        while True:
+            with get_cursor(write=True) as c:
+                c.execute("DELETE FROM send_log WHERE rowid IN "
+                          "(SELECT rowid FROM send_log WHERE ts < ? ORDER BY ts LIMIT ?)",
+                          (before_ts, SEND_LOG_PRUNE_CHUNK))
+                deleted = c.rowcount
+            removed += deleted
+            if deleted < SEND_LOG_PRUNE_CHUNK:
+                return removed
+    except Exception as e:
+        logger.error(f"Yuborish jurnalini tozalashda xato: {e}")
+        return removed
+
+def load_send_log_minutes(since_ts):
+    """Daqiqalik agregat: [(profile_id, minute, sent, failed, latency_ms_sum), ...]."""
+    try:
+        with get_cursor() as c:
+            c.execute("SELECT profile_id, ts / 60 AS minute, SUM(status = ?), SUM(status != ?), "
+                      "COALESCE(SUM(CASE WHEN status = ? THEN latency_ms END), 0) "
+                      "FROM send_log WHERE ts >= ? GROUP BY profile_id, minute ORDER BY minute",
+                      (SEND_OK, SEND_OK, SEND_OK, since_ts))
+            return c.fetchall()
+    except Exception as e:
+        logger.error(f"Yuborish jurnalini o‘qishda xato: {e}")
+        return []
+
+def load_recent_sends(since_ts):
+    """{profile_id: [ts, ...]} — since_ts dan keyingi yuborish urinishlari (har biri limiter tokenini olgan)."""
+    try:
+        with get_cursor() as c:
+            c.execute("SELECT profile_id, ts FROM send_log WHERE ts >= ? ORDER BY ts", (since_ts,))
+            sends = {}
+            for profile_id, ts in c.fetchall():
+                sends.setdefault(profile_id, []).append(ts)
+            return sends
+    except Exception as e:
+        logger.error(f"Yuborish jurnalini o‘qishda xato: {e}")
+        return {}
+
+def load_flood_deadlines(since_ts):
+    """{profile_id: unix vaqt} — jurnaldagi eng oxirgi FloodWait tugash vaqti."""
+    try:
+        with get_cursor() as c:
+            c.execute("SELECT profile_id, MAX(ts + wait) FROM send_log WHERE ts >= ? AND status = ? "
+                      "GROUP BY profile_id", (since_ts, SEND_FLOOD))
+            return dict(c.fetchall())
+    except Exception as e:
+        logger.error(f"Yuborish jurnalini o‘qishda xato: {e}")
+        return {}
+
+def load_group_send_stats(profile_id, since_ts):
+    """Guruhlar bo'yicha agregat: {group_id: {"sent", "failed", "last_ts", "last_success"}}."""
+    try:
+        with get_cursor() as c:
+            c.execute("SELECT group_id, SUM(status = ?), SUM(status != ?), MAX(ts), MAX(CASE WHEN status = ? THEN ts END) "
+                      "FROM send_log WHERE ts >= ? AND profile_id = ? GROUP BY group_id",
+                      (SEND_OK, SEND_OK, SEND_OK, since_ts, profile_id))
+            return {row[0]: {'sent': row[1], 'failed': row[2], 'last_ts': row[3], 'last_success': row[4]}
+                    for row in c.fetchall()}
+    except Exception as e:
+        logger.error(f"Yuborish jurnalini o‘qishda xato: {e}")
+        return {}
+
+def update_group_health(group_id, fail_count, slow_mode, last_success):
+    try:
+        with get_cursor(write=True) as c:
+            c.execute("UPDATE groups SET fail_count = ?, slow_mode = ?, last_success = ? WHERE id = ?",
+                      (fail_count, slow_mode, last_success, group_id))
+        with _groups_lock:
+            row = _group_rows_by_id.get(group_id)
+            if row is not None:
+                row.update(fail_count=fail_count, slow_mode=slow_mode, last_success=last_success)
+    except Exception as e:
+        logger.error(f"Guruh holatini yangilashda xato: {e}")
+
+def save_backoff(profile_id, until, group_id=0):
+    """Profil (group_id=0) yoki guruh uchun backoff tugash vaqtini (unix) saqlaydi."""
+    try:
+        with get_cursor(write=True) as c:
+            c.execute("INSERT OR REPLACE INTO backoff (profile_id, group_id, until) VALUES (?, ?, ?)",
+                      (profile_id, group_id, until))
+    except Exception as e:
+        logger.error(f"Backoff saqlashda xato: {e}")
+
+def clear_backoff(profile_id, group_id=0):
+    try:
+        with get_cursor(write=True) as c:
+            c.execute("DELETE FROM backoff WHERE profile_id = ? AND group_id = ?", (profile_id, group_id))
+    except Exception as e:
+        logger.error(f"Backoff o‘chirishda xato: {e}")
+
+def load_backoffs():
+    """Hali tugamagan backofflar: [(profile_id, group_id, until), ...]. Tugaganlari o'chiriladi."""
+    try:
+        now = time.time()
+        with get_cursor(write=True) as c:
+            c.execute("DELETE FROM backoff WHERE until <= ?", (now,))
+            c.execute("SELECT profile_id, group_id, until FROM backoff")
+            return c.fetchall()
+    except Exception as e:
+        logger.error(f"Backofflarni yuklashda xato: {e}")
+        return []
 
 def update_profile_setting(profile_id, key, value):
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute(f"UPDATE profiles SET {key} = ? WHERE id = ?", (value, profile_id))
-        conn.commit()
+        with get_cursor(write=True) as c:
+            c.execute(f"UPDATE profiles SET {key} = ? WHERE id = ?", (value, profile_id))
+        with _settings_lock:
+            settings = _settings_cache.get(profile_id)
+            if settings is not None:
+                # SQLite INTEGER ustunlari "1"/"0" ni songa aylantiradi — keshda ham shunday
+                if isinstance(settings.get(key), int) and str(value).lstrip("-").isdigit():
+                    value = int(value)
+                settings[key] = value
         logger.info(f"Profil sozlamasi yangilandi: ID {profile_id}, {key} = {value}")
     except Exception as e:
         logger.error(f"Profil sozlamasini yangilashda xato: {e}")
-    finally:
-        conn.close()
 
 def get_profile_setting(profile_id, key):
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute(f"SELECT {key} FROM profiles WHERE id = ?", (profile_id,))
-        result = c.fetchone()
-        return result[0] if result else None
+        settings = get_profile_settings(profile_id)
+        if settings is None:
+            return None
+        if key not in settings:
+            raise KeyError(f"no such column: {key}")
+        return settings[key]
     except Exception as e:
         logger.error(f"Profil sozlamasini olishda xato: {e}")
         return None
-    finally:
-        conn.close()
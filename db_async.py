@@ -0,0 +1,99 @@
+"""db.py funksiyalarining asinxron variantlari.
+
+Barcha SQLite chaqiruvlari alohida "db-worker" oqimida bajariladi, shuning
+uchun disk sekinligi yoki qulf kutish (timeout=10) Telethon klientlari va
+bot pollingini to‘xtatib qo‘ymaydi. Nomlar db.py dagi bilan bir xil,
+faqat ``await`` bilan chaqiriladi.
+"""
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+import metrics
+
+# Bitta oqim: yozuvlar navbat bilan bajariladi, o‘quvchi ulanish ham bitta bo‘ladi
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-worker")
+
+
+async def run_db(func, *args, **kwargs):
+    """Sinxron DB funksiyasini worker oqimida bajarib, natijasini kutadi."""
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+    finally:
+        metrics.DB_QUERY.observe(time.perf_counter() - started, op=func.__name__)
+
+
+def _async(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_db(func, *args, **kwargs)
+    return wrapper
+
+
+save_profile = _async(db.save_profile)
+remove_profile = _async(db.remove_profile)
+load_profiles = _async(db.load_profiles)
+save_group = _async(db.save_group)
+save_groups = _async(db.save_groups)
+remove_group = _async(db.remove_group)
+remove_duplicate_groups = _async(db.remove_duplicate_groups)
+update_group_peer = _async(db.update_group_peer)
+update_group_health = _async(db.update_group_health)
+update_profile_setting = _async(db.update_profile_setting)
+save_entity = _async(db.save_entity)
+load_entity = _async(db.load_entity)
+remove_entity = _async(db.remove_entity)
+prune_entity_cache = _async(db.prune_entity_cache)
+save_send_log = _async(db.save_send_log)
+prune_send_log = _async(db.prune_send_log)
+load_send_log_minutes = _async(db.load_send_log_minutes)
+load_recent_sends = _async(db.load_recent_sends)
+load_flood_deadlines = _async(db.load_flood_deadlines)
+load_group_send_stats = _async(db.load_group_send_stats)
+save_backoff = _async(db.save_backoff)
+clear_backoff = _async(db.clear_backoff)
+load_backoffs = _async(db.load_backoffs)
+
+
+def _group_registry_read(func, view):
+    """Guruh reyestri keshda bo‘lsa xotiradan o‘qiydi (view), aks holda worker oqimida bir marta yuklaydi.
+
+    Reyestr bir marta qulf ostida olinadi: tekshiruv va o‘qish orasida
+    invalidate_groups chaqirilsa ham loop oqimida SQLite ga murojaat bo‘lmaydi.
+    """
+    @functools.wraps(func)
+    async def wrapper(profile_id, *args):
+        groups = db.cached_groups(profile_id)
+        if groups is not None:
+            return view(groups, *args)
+        return await run_db(func, profile_id, *args)
+    return wrapper
+
+
+load_groups = _group_registry_read(db.load_groups, db.group_links)
+load_group_peers = _group_registry_read(db.load_group_peers, db.group_rows)
+count_groups = _group_registry_read(db.count_groups, len)
+has_group = _group_registry_read(db.has_group, lambda groups, link: link in groups)
+
+
+async def get_profile_settings(profile_id):
+    """Keshda bo‘lsa darhol qaytaradi, aks holda worker oqimida yuklaydi."""
+    if db.is_profile_cached(profile_id):
+        return db.get_profile_settings(profile_id)
+    return await run_db(db.get_profile_settings, profile_id)
+
+
+async def get_profile_setting(profile_id, key):
+    if db.is_profile_cached(profile_id):
+        return db.get_profile_setting(profile_id, key)
+    return await run_db(db.get_profile_setting, profile_id, key)
+
+
+metrics.Gauge("userbot_settings_cache", "Sozlamalar keshi hisoblagichlari (hits, misses, cached_profiles)", ["kind"],
+              collect=lambda: {(kind,): value for kind, value in db.settings_cache_stats().items()})
+metrics.Gauge("userbot_group_registry", "Guruh reyestri (cached_profiles, groups)", ["kind"],
+              collect=lambda: {(kind,): value for kind, value in db.group_registry_stats().items()})
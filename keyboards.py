@@ -5,6 +5,7 @@ def get_main_keyboard() -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
         keyboard=[
             [KeyboardButton(text=MAIN_MENU_BUTTONS["ADD_PROFILE"]), KeyboardButton(text=MAIN_MENU_BUTTONS["LIST_PROFILES"])],
+            [KeyboardButton(text=MAIN_MENU_BUTTONS["STATS"])],
         ],
         resize_keyboard=True,
         one_time_keyboard=True
@@ -29,6 +30,10 @@ def get_profile_keyboard() -> ReplyKeyboardMarkup:
                 KeyboardButton(text=PROFILE_MENU_BUTTONS["MESSAGE_TEXT"]),
                 KeyboardButton(text=PROFILE_MENU_BUTTONS["TOGGLE_AUTO_SEND"])
             ],
+            [
+                KeyboardButton(text=PROFILE_MENU_BUTTONS["MESSAGES_PER_MINUTE"]),
+                KeyboardButton(text=PROFILE_MENU_BUTTONS["SEND_INTERVAL"])
+            ],
             [
                 KeyboardButton(text=PROFILE_MENU_BUTTONS["BACK_TO_MAIN"])
             ]
@@ -1,12 +1,19 @@
 import asyncio
 import logging
+import time
 from aiogram import Bot
-from db import init_db, load_profiles
+from db import init_db
+from db_async import load_profiles
 from aiogram_handlers import dp, clients
-from telethon_utils import send_to_groups_auto, auto_reply_handler, response_reply_handler
-from telethon import TelegramClient, events
-from config import BOT_TOKEN
-from telethon_utils import load_existing_groups
+from scheduler import send_to_groups_auto, notify_clients_changed
+from telethon import TelegramClient
+from config import BOT_TOKEN, PROFILE_CONNECT_CONCURRENCY, PROFILE_CONNECT_TIMEOUT, METRICS_HOST, METRICS_PORT
+from metrics import start_metrics_server
+from telethon_utils import (
+    load_existing_groups, remember_identity, register_handlers, restore_send_state, restore_backoffs,
+    run_entity_cache_prune,
+)
+from send_log import run_send_log
 from aiogram import types
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -20,41 +27,90 @@ async def set_default_commands(bot: Bot):
     """Bot uchun standart buyruqlarni o‘rnatadi."""
     await bot.set_my_commands([
         types.BotCommand(command="start", description="⚪️Botni ishga tushirish | 🟡Botni yangilash"),
+        types.BotCommand(command="stats", description="📊 Profillar statistikasi"),
     ])
 
 
-async def main():
-    """Botni ishga tushirish va profillarni yuklash."""
-    await set_default_commands(bot)
-    from db import remove_duplicate_groups
-
-    remove_duplicate_groups()
-
-    profiles = load_profiles()
-    for prof in profiles:
+async def connect_profile(prof: dict, semaphore: asyncio.Semaphore) -> tuple:
+    """Bitta profilni ulaydi. (holat, sekund) qaytaradi."""
+    async with semaphore:
+        started = time.perf_counter()
         client = TelegramClient(prof['session_name'], prof['api_id'], prof['api_hash'])
         client.profile_id = prof['id']
         try:
-            await client.connect()
-            if await client.is_user_authorized():
-                client.add_event_handler(auto_reply_handler, events.NewMessage(incoming=True))
-                client.add_event_handler(
-                    response_reply_handler,
-                    events.NewMessage(incoming=True, pattern=r'(?i)@[\w\d_]+')
-                )
-                await load_existing_groups(client, prof['id'])
-                clients.append(client)
-                me = await client.get_me()
-                logger.info(f"🔗 Userbot ulandi: {me.first_name} (@{me.username or 'None'})")
-            else:
-                logger.warning(f"Profil avtorizatsiya qilinmadi: {prof['phone']}")
-                await client.disconnect()
+            status = await asyncio.wait_for(_bootstrap_client(client, prof), PROFILE_CONNECT_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error(f"Profil ulanmadi {prof['phone']}: {PROFILE_CONNECT_TIMEOUT}s ichida javob bo‘lmadi")
+            status = "timeout"
         except Exception as e:
             logger.error(f"Profil ulanmadi {prof['phone']}: {e}")
+            status = "xato"
+        if status != "ulandi":
             await client.disconnect()
+        return status, time.perf_counter() - started
+
+
+async def _bootstrap_client(client: TelegramClient, prof: dict) -> str:
+    await client.connect()
+    if not await client.is_user_authorized():
+        logger.warning(f"Profil avtorizatsiya qilinmadi: {prof['phone']}")
+        return "avtorizatsiyasiz"
+    me = await client.get_me()
+    remember_identity(client, me)
+    await register_handlers(client)
+    await load_existing_groups(client, prof['id'])
+    clients.append(client)
+    notify_clients_changed()
+    logger.info(f"🔗 Userbot ulandi: {me.first_name} (@{me.username or 'None'})")
+    return "ulandi"
+
+
+async def bootstrap_profiles(profiles: list):
+    """Profillarni parallel ulaydi (PROFILE_CONNECT_CONCURRENCY tadan)."""
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(PROFILE_CONNECT_CONCURRENCY)
+    results = await asyncio.gather(*(connect_profile(prof, semaphore) for prof in profiles))
+    report = "\n".join(
+        f"  {prof['phone']}: {status} ({elapsed:.1f}s)"
+        for prof, (status, elapsed) in zip(profiles, results)
+    )
+    logger.info(
+        f"⏱ Profillar ulandi: {len(clients)}/{len(profiles)}, jami {time.perf_counter() - started:.1f}s\n{report}"
+    )
+
+
+async def main():
+    """Botni ishga tushirish; profillar fon rejimida ulanadi."""
+    await set_default_commands(bot)
+
+    metrics_runner = None
+    if METRICS_PORT:
+        try:
+            metrics_runner = await start_metrics_server(METRICS_PORT, METRICS_HOST)
+        except OSError as e:
+            logger.error(f"❌ Metrikalar serverini ishga tushirib bo‘lmadi: {e}")
 
-    asyncio.create_task(send_to_groups_auto(clients))
-    await dp.start_polling(bot)
+    profiles = await load_profiles()
+    # Restartdan oldingi yuborishlar: limiter va backoff jurnaldan tiklanadi
+    await restore_send_state([p['id'] for p in profiles])
+    # FloodWait tugash vaqtlari SQLite da: restartdan keyin profil muddatidan oldin yozmaydi
+    await restore_backoffs()
+    send_log_task = asyncio.create_task(run_send_log())
+    entity_prune_task = asyncio.create_task(run_entity_cache_prune())
+    # Har bir profil ulanishi bilan o'z jadvali bo'yicha yuborishni boshlaydi
+    sender_task = asyncio.create_task(send_to_groups_auto(clients))
+    bootstrap_task = asyncio.create_task(bootstrap_profiles(profiles))
+    try:
+        await dp.start_polling(bot)
+    finally:
+        bootstrap_task.cancel()
+        sender_task.cancel()
+        send_log_task.cancel()
+        entity_prune_task.cancel()
+        # jurnal navbatidagi oxirgi yozuvlar DB ga tushishini kutamiz
+        await asyncio.gather(send_log_task, return_exceptions=True)
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,257 @@
+"""Prometheus formatidagi metrikalar (tashqi kutubxonasiz).
+
+Hisoblagichlar xotirada saqlanadi; snapshot() ularni lug‘at sifatida
+qaytaradi, start_metrics_server() esa /metrics manzilida matn formatida
+beradi.
+"""
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1)
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 15, 60)
+
+REGISTRY = []
+_lock = threading.Lock()   # db-worker oqimi ham yozadi
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(labelnames, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _sorted(items):
+    # label qiymatlari turli tipda bo'lishi mumkin (int, str, None)
+    return sorted(items, key=lambda item: tuple(map(str, item[0])))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in _sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+    def snapshot(self) -> dict:
+        return {key: value for key, value in self._values.items()}
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}   # labels -> [bucket_counts, sum, count]
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for key, (counts, total, count) in _sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ['le="%s"' % bound])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key, ['le="+Inf"'])
+            yield f"{self.name}_bucket{labels} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+    def snapshot(self) -> dict:
+        return {key: {"count": count, "sum": total, "avg": total / count if count else 0.0}
+                for key, (counts, total, count) in self._values.items()}
+
+
+class Gauge:
+    """Qiymati har safar `collect()` chaqirilib olinadigan o‘lchov ({labels tuple: qiymat})."""
+
+    def __init__(self, name: str, documentation: str, labelnames=(), collect=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect or (lambda: {})
+        REGISTRY.append(self)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} gauge"
+        for key, value in _sorted(self.collect().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+    def snapshot(self) -> dict:
+        return dict(self.collect())
+
+
+MESSAGES_SENT = Counter("userbot_messages_sent_total", "Guruhlarga yuborilgan xabarlar", ["profile"])
+SEND_FAILURES = Counter("userbot_send_failures_total", "Yuborishdagi xatolar (istisno turi bo‘yicha)", ["profile", "error"])
+FLOOD_WAIT_SECONDS = Counter("userbot_flood_wait_seconds_total", "FloodWaitError bo‘yicha yig‘ilgan kutish sekundlari", ["profile"])
+SEND_LATENCY = Histogram("userbot_send_latency_seconds", "send_message chaqiruvi davomiyligi", ["profile"])
+CYCLE_DURATION = Histogram("userbot_cycle_duration_seconds", "send_profile_messages aylanmasi davomiyligi", ["profile"],
+                           buckets=(60, 300, 900, 1800, 3600, 7200, 14400))
+SCHEDULER_LAG = Histogram("userbot_scheduler_lag_seconds", "Profil aylanmasi rejalashtirilgan vaqtdan qancha kech boshlandi",
+                          ["profile"], buckets=LAG_BUCKETS)
+HANDLER_CALLS = Counter("userbot_handler_calls_total", "Kiruvchi xabar handlerlari chaqiruvlari", ["profile", "handler"])
+HANDLER_LATENCY = Histogram("userbot_handler_latency_seconds", "Kiruvchi xabar handleri davomiyligi", ["handler"])
+DB_QUERY = Histogram("userbot_db_query_seconds", "DB chaqiruvi davomiyligi (navbat kutish bilan)", ["op"], buckets=DB_BUCKETS)
+
+
+class RollingStats:
+    """Profil bo‘yicha oxirgi sutkadagi yuborishlar, daqiqalik savatchalarda.
+
+    Har profil uchun ko‘pi bilan `window // 60` ta savatcha saqlanadi, shuning
+    uchun /stats DB ga murojaat qilmasdan darhol javob beradi.
+    """
+
+    def __init__(self, window: int = 24 * 3600, clock=time.time):
+        self.window = window
+        self._clock = clock
+        self._buckets = {}   # profile_id -> deque([minute, sent, failed, latency_sum])
+
+    def record(self, profile_id: int, ok: bool, latency: float = 0.0, at: float = None):
+        minute = int((self._clock() if at is None else at) // 60)
+        if ok:
+            self.add(profile_id, minute, 1, 0, latency)
+        else:
+            self.add(profile_id, minute, 0, 1, 0.0)
+
+    def add(self, profile_id: int, minute: int, sent: int, failed: int, latency_sum: float):
+        """Daqiqalik savatchaga qo'shadi (jurnaldan tiklashda butun savatcha bir yo'la)."""
+        with _lock:
+            buckets = self._buckets.setdefault(profile_id, deque())
+            if not buckets or buckets[-1][0] < minute:
+                buckets.append([minute, 0, 0, 0.0])
+                bucket = buckets[-1]
+            elif buckets[-1][0] == minute:
+                bucket = buckets[-1]
+            else:
+                # tartibsiz (masalan, jurnaldan tiklangan) yozuv — o'z o'rniga qo'yamiz
+                if minute <= int(self._clock() // 60) - self.window // 60:
+                    return
+                index = len(buckets)
+                while index and buckets[index - 1][0] > minute:
+                    index -= 1
+                if index and buckets[index - 1][0] == minute:
+                    bucket = buckets[index - 1]
+                else:
+                    bucket = [minute, 0, 0, 0.0]
+                    buckets.insert(index, bucket)
+            bucket[1] += sent
+            bucket[2] += failed
+            bucket[3] += latency_sum
+            self._expire(buckets, buckets[-1][0])
+
+    def _expire(self, buckets, minute: int):
+        oldest = minute - self.window // 60
+        while buckets and buckets[0][0] <= oldest:
+            buckets.popleft()
+
+    def summary(self, profile_id: int) -> dict:
+        """{sent_hour, sent_day, failed_day, success_ratio, avg_latency}"""
+        minute = int(self._clock() // 60)
+        sent_hour = sent_day = failed_day = 0
+        latency_sum = 0.0
+        with _lock:
+            buckets = self._buckets.get(profile_id, ())
+            if buckets:
+                self._expire(buckets, minute)
+            for bucket_minute, sent, failed, latency in buckets:
+                sent_day += sent
+                failed_day += failed
+                latency_sum += latency
+                if bucket_minute > minute - 60:
+                    sent_hour += sent
+        attempts = sent_day + failed_day
+        return {
+            "sent_hour": sent_hour,
+            "sent_day": sent_day,
+            "failed_day": failed_day,
+            "success_ratio": sent_day / attempts if attempts else None,
+            "avg_latency": latency_sum / sent_day if sent_day else None,
+        }
+
+    def forget(self, profile_id: int):
+        with _lock:
+            self._buckets.pop(profile_id, None)
+
+
+SEND_STATS = RollingStats()
+
+
+def render() -> str:
+    """Barcha metrikalar Prometheus text formatida."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def snapshot() -> dict:
+    """Barcha metrikalarning xotiradagi nusxasi: {nom: {labels: qiymat}}."""
+    return {metric.name: metric.snapshot() for metric in REGISTRY}
+
+
+async def start_metrics_server(port: int, host: str = "127.0.0.1"):
+    """/metrics ni beruvchi kichik aiohttp server. runner ni qaytaradi."""
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"📈 Metrikalar: http://{host}:{port}/metrics")
+    return runner
+
+
+def track_handler(name: str):
+    """Telethon handleri uchun dekorator: chaqiruvlar soni va davomiyligi."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(event):
+            started = time.perf_counter()
+            try:
+                return await func(event)
+            finally:
+                HANDLER_CALLS.inc(profile=getattr(event.client, "profile_id", None), handler=name)
+                HANDLER_LATENCY.observe(time.perf_counter() - started, handler=name)
+        return wrapper
+    return decorator
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+
+def monotonic() -> float:
+    """Monoton soat: event loop ichida loop.time(), tashqarida time.monotonic().
+
+    Oddiy asyncio loopda ikkalasi bir xil soat; virtual soatli loopda esa
+    limiter ham avtomatik ravishda virtual vaqtdan foydalanadi.
+    """
+    try:
+        return asyncio.get_running_loop().time()
+    except RuntimeError:
+        return time.monotonic()
+
+
+class TokenBucket:
+    """Token-bucket limiter: har `per` sekundda `rate` ta token, ko‘pi bilan `capacity` ta.
+
+    Barcha amallar O(1): tarix ro‘yxati saqlanmaydi, faqat token soni va
+    oxirgi to‘ldirish vaqti. `clock` va `sleep` ni almashtirib, limiterni
+    soxta soat bilan sinash mumkin.
+    """
+
+    def __init__(self, rate: float, per: float = 60.0, capacity: float = None, clock=monotonic, sleep=None):
+        if rate <= 0 or per <= 0:
+            raise ValueError("rate va per musbat bo‘lishi kerak")
+        self.rate = rate
+        self.per = per
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate / self.per)
+        self._updated = now
+
+    def set_rate(self, rate: float, capacity: float = None):
+        """Tezlikni o‘zgartiradi; shu paytgacha yig‘ilgan tokenlar saqlanadi."""
+        if rate <= 0:
+            raise ValueError("rate musbat bo‘lishi kerak")
+        self._refill()
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = min(self.tokens, self.capacity)
+
+    def replay(self, ages):
+        """Avval olingan tokenlarni qayta hisoblaydi (`ages` — necha sekund oldin olingani).
+
+        Restartdan keyin limiter bo'sh chelak bilan boshlanib, darhol burst
+        qilmasligi uchun jurnal asosida tiklashda ishlatiladi.
+        """
+        tokens = self.capacity
+        previous = None
+        for age in sorted(ages, reverse=True):
+            if previous is not None:
+                tokens = min(self.capacity, tokens + (previous - age) * self.rate / self.per)
+            tokens -= 1
+            previous = age
+        if previous is not None:
+            tokens = min(self.capacity, tokens + previous * self.rate / self.per)
+        self.tokens = tokens
+        self._updated = self._clock()
+
+    def delay(self, tokens: float = 1) -> float:
+        """`tokens` ta token paydo bo‘lishigacha qolgan sekundlar (0 — hozir mumkin)."""
+        self._refill()
+        missing = tokens - self.tokens
+        return 0.0 if missing <= 1e-9 else missing * self.per / self.rate
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Token bo‘lsa oladi va True qaytaradi, aks holda kutmasdan False."""
+        if self.delay(tokens) > 0:
+            return False
+        self.tokens -= tokens
+        return True
+
+    async def acquire(self, tokens: float = 1) -> float:
+        """Token paydo bo‘lguncha aynan kerakli vaqt uxlaydi. Kutilgan sekundlarni qaytaradi."""
+        sleep = self._sleep or asyncio.sleep
+        waited = 0.0
+        while True:
+            wait = self.delay(tokens)
+            if wait <= 0:
+                self.tokens -= tokens
+                return waited
+            await sleep(wait)
+            waited += wait
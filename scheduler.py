@@ -0,0 +1,141 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import metrics
+from telethon import TelegramClient
+from db_async import get_profile_settings
+from telethon_utils import send_profile_messages, get_pacing, backoff_remaining, GLOBAL_SLEEP
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+START_STAGGER = (1, 3)           # yangi profil birinchi aylanmasidan oldin kichik kechikish (sekund)
+INTERVAL_JITTER = (0, 30)        # send_interval ga qo'shiladigan tasodifiy sekundlar
+LEGACY_INTERVAL_JITTER = (0, 120)  # messages_per_minute sozlanmagan profil uchun (eski taqsimot)
+
+
+class SendScheduler:
+    """Har bir profilni o‘z jadvali bo‘yicha ishga tushiradigan rejalashtiruvchi.
+
+    Navbat — (keyingi vaqt, tartib raqami, profile_id) dan iborat heap. Har bir
+    profil aylanmasi alohida task bo‘lib ishlaydi va tugagach o‘zining
+    send_interval qiymati (yoki backoff tugash vaqti) bo‘yicha qayta
+    navbatga qo‘yiladi, boshqa profillarni kutmaydi.
+    """
+
+    def __init__(self, clients: list):
+        self.clients = clients
+        self._queue = []                 # heap: (due, seq, profile_id)
+        self._due = {}                   # profile_id -> loop.time() dagi keyingi vaqt
+        self._running = {}               # profile_id -> aylanma task
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def schedule(self, profile_id: int, due: float):
+        """Profilning keyingi aylanmasini belgilaydi (eskisini almashtiradi)."""
+        self._due[profile_id] = due
+        heapq.heappush(self._queue, (due, next(self._seq), profile_id))
+        self._wakeup.set()
+
+    def run_now(self, profile_id: int):
+        """Profilni kutmasdan navbatdagi birinchi o‘ringa qo‘yadi."""
+        if profile_id not in self._running:
+            self.schedule(profile_id, asyncio.get_running_loop().time())
+
+    def next_due(self, profile_id: int):
+        """Profil keyingi aylanmasigacha qolgan sekundlar (aylanma ketayotgan bo‘lsa 0)."""
+        if profile_id in self._running:
+            return 0.0
+        due = self._due.get(profile_id)
+        if due is None:
+            return None
+        return max(0.0, due - asyncio.get_running_loop().time())
+
+    def wake(self):
+        """Ro‘yxatdagi yangi klientlarni tekshirish uchun rejalashtiruvchini uyg‘otadi."""
+        self._wakeup.set()
+
+    def _find_client(self, profile_id: int):
+        return next((c for c in self.clients if c.profile_id == profile_id), None)
+
+    def _sync_clients(self, now: float):
+        for client in self.clients:
+            pid = client.profile_id
+            if pid not in self._due and pid not in self._running:
+                # saqlangan backoff bo'lsa (restartdan keyin) — u tugaguncha kutamiz
+                delay = max(random.uniform(*START_STAGGER), backoff_remaining(pid))
+                self.schedule(pid, now + delay)
+
+    async def _next_due_after_cycle(self, profile_id: int) -> float:
+        now = asyncio.get_running_loop().time()
+        # Backoff bo'lsa — aynan u tugagan paytda uyg'onamiz
+        blocked = backoff_remaining(profile_id)
+        if blocked:
+            return now + blocked
+        pacing = get_pacing(await get_profile_settings(profile_id) or {})
+        jitter = LEGACY_INTERVAL_JITTER if pacing.legacy else INTERVAL_JITTER
+        return now + pacing.send_interval + random.randint(*jitter)
+
+    async def _run_cycle(self, client: TelegramClient):
+        pid = client.profile_id
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            await send_profile_messages(client)
+        except Exception as e:
+            logger.error(f"🔥 {client._self_id} aylanmasida xato: {e}")
+        finally:
+            metrics.CYCLE_DURATION.observe(loop.time() - started, profile=pid)
+        due = None
+        try:
+            due = await self._next_due_after_cycle(pid)
+        except Exception as e:
+            logger.error(f"🔥 {client._self_id} keyingi aylanma vaqtini hisoblashda xato: {e}")
+        finally:
+            # Har holda qayta navbatga qo'yamiz — aks holda profil boshqa uyg'onishgacha to'xtab qoladi
+            self._running.pop(pid, None)
+            if self._find_client(pid) is not None:  # None — profil o'chirilgan
+                if due is None:
+                    due = loop.time() + GLOBAL_SLEEP
+                self.schedule(pid, due)
+                logger.info(f"🌙 {client._self_id} keyingi aylanma {due - loop.time():.0f}s dan keyin.")
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            now = loop.time()
+            self._sync_clients(now)
+            while self._queue and self._queue[0][0] <= now:
+                due, _, pid = heapq.heappop(self._queue)
+                if self._due.get(pid) != due or pid in self._running:
+                    continue  # eskirgan yozuv
+                del self._due[pid]
+                client = self._find_client(pid)
+                if client is None:
+                    continue
+                metrics.SCHEDULER_LAG.observe(max(0.0, now - due), profile=pid)
+                self._running[pid] = asyncio.create_task(self._run_cycle(client))
+            timeout = self._queue[0][0] - now if self._queue else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+scheduler = None
+
+
+def notify_clients_changed():
+    """clients ro‘yxati o‘zgarganda chaqiriladi — yangi profil darhol jadvalga tushadi."""
+    if scheduler is not None:
+        scheduler.wake()
+
+
+async def send_to_groups_auto(clients: list):
+    """Barcha profillar uchun avtomatik yuborishni mustaqil jadval bilan ishga tushiradi."""
+    global scheduler
+    scheduler = SendScheduler(clients)
+    await scheduler.run()
@@ -0,0 +1,67 @@
+"""Yuborish jurnali: har bir urinish xotirada yig'iladi va bo'laklab SQLite ga yoziladi.
+
+send_message_safe har urinishda record() ni chaqiradi (DB ga murojaatsiz);
+run_send_log() esa navbatni har SEND_LOG_FLUSH_INTERVAL sekundda bitta
+executemany bilan yozadi va SEND_LOG_RETENTION dan eski yozuvlarni o'chiradi.
+"""
+import asyncio
+import logging
+import time
+from db import SEND_OK, SEND_FLOOD, SEND_FORBIDDEN, SEND_BANNED, SEND_INVALID_PEER, SEND_ERROR, SEND_SLOW_MODE
+from db_async import save_send_log, prune_send_log
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+SEND_LOG_FLUSH_INTERVAL = 5        # navbat DB ga yoziladigan oraliq (sekund)
+SEND_LOG_FLUSH_SIZE = 500          # navbat shundan oshsa darhol yoziladi
+SEND_LOG_RETENTION = 7 * 24 * 3600 # jurnal saqlanadigan muddat (sekund)
+SEND_LOG_PRUNE_INTERVAL = 3600     # eski yozuvlarni tozalash oralig'i (sekund)
+
+__all__ = [
+    "SEND_OK", "SEND_FLOOD", "SEND_FORBIDDEN", "SEND_BANNED", "SEND_INVALID_PEER", "SEND_ERROR", "SEND_SLOW_MODE",
+    "record", "flush", "run_send_log",
+]
+
+_pending = []                      # [(ts, profile_id, group_id, status, latency_ms, wait)]
+_flush_now = None                  # asyncio.Event — navbat to'lganda flusher ni uyg'otadi
+
+
+def record(profile_id: int, group_id, status: int, latency: float = None, wait: int = None):
+    """Bitta yuborish urinishini navbatga qo'shadi."""
+    latency_ms = int(latency * 1000) if latency is not None else None
+    _pending.append((int(time.time()), profile_id, group_id, status, latency_ms, wait))
+    if len(_pending) >= SEND_LOG_FLUSH_SIZE and _flush_now is not None:
+        _flush_now.set()
+
+
+async def flush() -> int:
+    """Navbatdagi yozuvlarni bitta tranzaksiyada DB ga yozadi."""
+    if not _pending:
+        return 0
+    rows = _pending[:]
+    del _pending[:len(rows)]
+    return await save_send_log(rows)
+
+
+async def run_send_log():
+    """Fon vazifasi: navbatni vaqti-vaqti bilan yozadi va eski yozuvlarni tozalaydi."""
+    global _flush_now
+    _flush_now = asyncio.Event()
+    last_prune = 0.0
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(_flush_now.wait(), SEND_LOG_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            _flush_now.clear()
+            await flush()
+            if time.time() - last_prune >= SEND_LOG_PRUNE_INTERVAL:
+                last_prune = time.time()
+                removed = await prune_send_log(int(last_prune - SEND_LOG_RETENTION))
+                if removed:
+                    logger.info(f"🧹 Yuborish jurnalidan {removed} ta eski yozuv o‘chirildi.")
+    finally:
+        # To'xtatilganda navbatda qolganlarini yo'qotmaymiz
+        await flush()
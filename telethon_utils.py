@@ -1,18 +1,35 @@
 import asyncio
 import random
+import re
 import logging
+import time
 from telethon import TelegramClient, events
 from telethon.errors import (
     ChatWriteForbiddenError,
+    ChannelInvalidError,
     ChannelPrivateError,
+    PeerIdInvalidError,
     FloodWaitError,
+    SlowModeWaitError,
     UserBannedInChannelError,
 )
 from telethon.tl.functions.channels import JoinChannelRequest, LeaveChannelRequest, GetFullChannelRequest
-from telethon.tl.types import Channel
-from db import load_groups, save_group, remove_group, get_profile_setting
+from telethon import utils
+from telethon.tl.types import (
+    Channel, Chat, InputPeerChannel, InputPeerChat, InputPeerUser, UpdateUserName,
+    MessageEntityMentionName,
+)
+from db_async import (
+    has_group, load_group_peers, save_group, save_groups, remove_group, update_group_peer, update_group_health,
+    get_profile_settings, save_entity, load_entity, remove_entity, prune_entity_cache,
+    load_send_log_minutes, load_recent_sends, load_flood_deadlines, save_backoff, clear_backoff, load_backoffs,
+)
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import namedtuple
+from rate_limiter import TokenBucket
+from cache import TTLCache
+import metrics
+import send_log
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
@@ -23,38 +40,172 @@ logger = logging.getLogger(__name__)
 # GLOBAL_SLEEP = 300           
 # FLOOD_BLOCKED = {} 
 
+# Shaxsiy chatlarga avto javob: har bir suhbatga AUTO_REPLY_COOLDOWN ichida bir marta.
+AUTO_REPLY_COOLDOWN = 6 * 3600   # bitta suhbatga qayta javob berilguncha (sekund)
+AUTO_REPLY_COOLDOWN_SIZE = 50000 # xotirada kuzatiladigan suhbatlar soni
+_auto_reply_cooldown = TTLCache(AUTO_REPLY_COOLDOWN_SIZE, AUTO_REPLY_COOLDOWN)  # (profile_id, chat_id) -> True
+_auto_reply_stats = {}           # profile_id -> {"replied", "suppressed"}
+
+def auto_reply_stats(profile_id: int = None) -> dict:
+    """Avto javob hisoblagichlari: yuborilgan va cooldown tufayli o'tkazib yuborilganlar."""
+    if profile_id is not None:
+        return dict(_auto_reply_stats.get(profile_id, {"replied": 0, "suppressed": 0}))
+    return {pid: dict(stats) for pid, stats in _auto_reply_stats.items()}
+
+@metrics.track_handler("auto_reply")
 async def auto_reply_handler(event):
-    """Shaxsiy xabarlarga avtomatik javob berish."""
+    """Shaxsiy xabarlarga avtomatik javob berish (har suhbatga cooldown ichida bir marta)."""
     profile_id = event.client.profile_id
-    auto_reply_enabled = bool(int(get_profile_setting(profile_id, "auto_reply_enabled") or 0))
-    auto_reply_text = get_profile_setting(profile_id, "auto_reply_text") or "Salom! Bu avtomatik javob."
-    if event.is_private and auto_reply_enabled:
-        try:
-            await event.reply(auto_reply_text)
-            logger.info(f"📩 {event.client._self_id} shaxsiy xabarga avto javob yubordi.")
-        except Exception as e:
-            logger.error(f"❌ Avto javob yuborishda xato: {e}")
+    stats = _auto_reply_stats.setdefault(profile_id, {"replied": 0, "suppressed": 0})
+    key = (profile_id, event.chat_id)
+    if _auto_reply_cooldown.get(key, count=False):
+        stats["suppressed"] += 1
+        return
+    # Slot hech qanday await dan oldin band qilinadi: sozlamalar yuklanayotganda yoki
+    # javob ketayotganda kelgan keyingi xabarlar o'tkazib yuboriladi. Xato bo'lsa bo'shatiladi.
+    _auto_reply_cooldown.set(key, True)
+    try:
+        # Faqat shaxsiy chat va avto javob yoqilgan bo'lsa ro'yxatdan o'tadi (register_handlers)
+        settings = await get_profile_settings(profile_id) or {}
+        auto_reply_text = settings.get("auto_reply_text") or "Salom! Bu avtomatik javob."
+        await event.reply(auto_reply_text)
+        stats["replied"] += 1
+        logger.info(f"📩 {event.client._self_id} shaxsiy xabarga avto javob yubordi.")
+    except Exception as e:
+        _auto_reply_cooldown.pop(key)
+        logger.error(f"❌ Avto javob yuborishda xato: {e}")
 
+@metrics.track_handler("response_reply")
 async def response_reply_handler(event):
     """Guruhlarda foydalanuvchi nomiga javob berish."""
-    profile_id = event.client.profile_id
-    response_reply_enabled = bool(int(get_profile_setting(profile_id, "response_reply_enabled") or 0))
-    response_reply_text = get_profile_setting(profile_id, "response_reply_text") or "Avto javob guruhda."
-    if not event.is_private and response_reply_enabled:
-        try:
-            me = await event.client.get_me()
-            if me.username and f"@{me.username}" in event.raw_text:
-                await event.reply(response_reply_text)
-                logger.info(f"📢 {event.client._self_id} guruhda @{me.username} ga javob berdi.")
-        except Exception as e:
-            logger.error(f"❌ Guruh avto javobida xato: {e}")
+    # Guruh va akkaunt eslatilganini mention_event() filtri tekshirgan; handler esa
+    # faqat guruh avto javobi yoqilganda ro'yxatdan o'tadi (register_handlers)
+    settings = await get_profile_settings(event.client.profile_id) or {}
+    response_reply_text = settings.get("response_reply_text") or "Avto javob guruhda."
+    try:
+        await event.reply(response_reply_text)
+        logger.info(f"📢 {event.client._self_id} guruhda @{event.client.identity.username} ga javob berdi.")
+    except Exception as e:
+        logger.error(f"❌ Guruh avto javobida xato: {e}")
+
+def make_mention_filter(client: TelegramClient):
+    """Faqat shu akkaunt eslatilgan guruh xabarlarini o'tkazadigan filtr.
+
+    Telethon event builder darajasida (func=) ishlaydi, shuning uchun boshqa
+    xabarlar uchun handler korutinasi umuman chaqirilmaydi. Regex
+    client.identity dagi username'dan bir marta kompilyatsiya qilinadi va
+    username o'zgarganda qayta quriladi; matnli eslatma (MessageEntityMentionName)
+    esa user id bo'yicha tekshiriladi.
+    """
+    compiled = {}
+
+    def mention_filter(event) -> bool:
+        if event.is_private:
+            return False
+        identity = getattr(client, "identity", None)
+        if identity is None:
+            return False
+        message = event.message
+        text = message.message
+        if identity.username and "@" in text:
+            pattern = compiled.get(identity.username)
+            if pattern is None:
+                compiled.clear()
+                pattern = compiled[identity.username] = re.compile(
+                    rf"@{re.escape(identity.username)}(?!\w)", re.IGNORECASE)
+            if pattern.search(text):
+                return True
+        return any(isinstance(e, MessageEntityMentionName) and e.user_id == identity.id
+                   for e in message.entities or ())
+
+    return mention_filter
+
+def mention_event(client: TelegramClient) -> events.NewMessage:
+    """response_reply_handler uchun event builder (akkaunt eslatilgan kiruvchi guruh xabarlari)."""
+    return events.NewMessage(incoming=True, func=make_mention_filter(client))
+
+def private_event() -> events.NewMessage:
+    """auto_reply_handler uchun event builder (faqat kiruvchi shaxsiy xabarlar)."""
+    return events.NewMessage(incoming=True, func=lambda e: e.is_private)
+
+def _set_handler(client: TelegramClient, callback, builder_factory, enabled: bool):
+    registered = client.__dict__.setdefault("_reply_handlers", set())
+    if enabled and callback not in registered:
+        client.add_event_handler(callback, builder_factory())
+        registered.add(callback)
+    elif not enabled and callback in registered:
+        client.remove_event_handler(callback)
+        registered.discard(callback)
+
+async def register_handlers(client: TelegramClient):
+    """Avto javob handlerlarini profil sozlamalariga moslaydi.
+
+    O'chirilgan funksiya handleri umuman ro'yxatda bo'lmaydi, shuning uchun
+    kiruvchi xabar uchun korutina ham ishga tushmaydi. Botdan yoqish/o'chirishda
+    qayta chaqiriladi.
+    """
+    settings = await get_profile_settings(client.profile_id) or {}
+    _set_handler(client, auto_reply_handler, private_event,
+                 bool(int(settings.get("auto_reply_enabled") or 0)))
+    _set_handler(client, response_reply_handler, lambda: mention_event(client),
+                 bool(int(settings.get("response_reply_enabled") or 0)))
+
+# Klient egasining ma'lumoti (id, username, "@username" kichik harfda).
+# Ulanishda bir marta olinadi va UpdateUserName kelganda yangilanadi —
+# handlerlar har xabarda get_me() chaqirmaydi.
+ClientIdentity = namedtuple("ClientIdentity", "id username handle")
+
+def _make_identity(user_id: int, username: str) -> ClientIdentity:
+    return ClientIdentity(user_id, username, f"@{username}".lower() if username else None)
+
+def remember_identity(client: TelegramClient, me) -> ClientIdentity:
+    """get_me() natijasini client.identity ga saqlaydi va username o'zgarishini kuzatadi."""
+    client.identity = _make_identity(me.id, me.username)
+    if not getattr(client, "_identity_watch", False):
+        client.add_event_handler(username_update_handler, events.Raw(UpdateUserName))
+        client._identity_watch = True
+    return client.identity
+
+async def username_update_handler(update):
+    """Akkaunt username'i o'zgarganda client.identity ni yangilaydi."""
+    client = update._client
+    identity = getattr(client, "identity", None)
+    if identity is None or update.user_id != identity.id:
+        return
+    active = [u.username for u in update.usernames if u.active]
+    client.identity = _make_identity(identity.id, active[0] if active else None)
+    logger.info(f"🔁 {client._self_id} username yangilandi: @{client.identity.username or 'None'}")
+
+def group_peer_fields(entity) -> dict:
+    """Guruh qatorida saqlanadigan peer ma'lumoti (id, access_hash, nom, tur)."""
+    if isinstance(entity, Channel):
+        return {"peer_id": entity.id, "access_hash": entity.access_hash, "title": entity.title,
+                "peer_type": "megagroup" if entity.megagroup else "broadcast"}
+    if isinstance(entity, Chat):
+        return {"peer_id": entity.id, "access_hash": None, "title": entity.title, "peer_type": "chat"}
+    return {}
+
+def peer_from_group(group: dict):
+    """Saqlangan peer ma'lumotidan InputPeer yasaydi.
+
+    Resolve qilinmagan yoki noma'lum turdagi (megagroup / broadcast / chat dan
+    boshqa) qator uchun None — link orqali qayta resolve qilinadi.
+    """
+    peer_type = group.get("peer_type")
+    if group.get("peer_id") is None:
+        return None
+    if peer_type == "chat":
+        return InputPeerChat(group["peer_id"])
+    if peer_type not in ("megagroup", "broadcast") or group.get("access_hash") is None:
+        return None
+    return InputPeerChannel(group["peer_id"], group["access_hash"])
 
 async def join_group(client: TelegramClient, link: str, profile_id: int) -> bool:
     """Guruhga qo‘shilish va uni ma'lumotlar bazasiga saqlash."""
     try:
         entity = await client.get_entity(link)
         await client(JoinChannelRequest(entity))
-        save_group(link, profile_id)
+        await save_group(link, profile_id, **group_peer_fields(entity))
         logger.info(f"✅ {client._self_id} guruhga qo‘shildi: {link}")
         return True
     except FloodWaitError as e:
@@ -69,17 +220,14 @@ async def leave_group(client: TelegramClient, group_id: int, profile_id: int, li
     """Guruhdan chiqish va uni ma'lumotlar bazasidan o‘chirish."""
     try:
         await client(LeaveChannelRequest(group_id))
-        remove_group(link, profile_id)
+        await remove_group(link, profile_id)
         logger.info(f"🚪 {client._self_id} guruhdan chiqildi va DBdan o‘chirildi: {link}")
     except Exception as e:
         logger.error(f"❌ {client._self_id} guruhdan chiqishda xato: {link} - {e}")
-        remove_group(link, profile_id)  # Xato bo‘lsa ham DBdan o‘chirish
+        await remove_group(link, profile_id)  # Xato bo‘lsa ham DBdan o‘chirish
 
 async def try_join_linked_channel(client: TelegramClient, entity, profile_id: int) -> bool:
     """Agar yozish uchun kanalga obuna bo‘lish kerak bo‘lsa, avtomatik kanalga qo‘shiladi."""
-    from db import load_groups  # ichkarida chaqiramiz, aylanish oldini olish uchun
-    existing_groups = load_groups(profile_id)
-
     try:
         if isinstance(entity, Channel):
             full = await client(GetFullChannelRequest(entity))
@@ -87,14 +235,14 @@ async def try_join_linked_channel(client: TelegramClient, entity, profile_id: in
 
             if linked_chat_id:
                 link = f"https://t.me/c/{linked_chat_id}"
-                if link in existing_groups:
+                if await has_group(profile_id, link):
                     logger.warning(f"⚠️ {client._self_id} kanal allaqachon bazada bor: {link}, qayta qo‘shilmaydi.")
                     return False
 
                 try:
                     linked_channel = await client.get_entity(linked_chat_id)
                     await client(JoinChannelRequest(linked_channel))
-                    save_group(link, profile_id)
+                    await save_group(link, profile_id, **group_peer_fields(linked_channel))
                     logger.info(f"📡 {client._self_id} kanalga avtomatik qo‘shildi: {linked_channel.title}")
                     return True
                 except Exception as e:
@@ -104,12 +252,12 @@ async def try_join_linked_channel(client: TelegramClient, entity, profile_id: in
             # Agar linked_chat_id topilmasa, invite link orqali urinish
             invite_link = getattr(full.full_chat, "exported_invite", None)
             if invite_link and hasattr(invite_link, "link"):
-                if invite_link.link in existing_groups:
+                if await has_group(profile_id, invite_link.link):
                     logger.warning(f"⚠️ {client._self_id} kanal allaqachon bazada bor: {invite_link.link}")
                     return False
                 try:
                     await client(JoinChannelRequest(invite_link.link))
-                    save_group(invite_link.link, profile_id)
+                    await save_group(invite_link.link, profile_id)
                     logger.info(f"📡 {client._self_id} havola orqali kanalga qo‘shildi: {invite_link.link}")
                     return True
                 except Exception as e:
@@ -119,43 +267,222 @@ async def try_join_linked_channel(client: TelegramClient, entity, profile_id: in
         logger.error(f"🔍 Bog‘langan kanalni aniqlashda xato: {e}")
     return False
 
-async def load_existing_groups(client: TelegramClient, profile_id: int):
-    """Mavjud guruhlarni yuklash va ma'lumotlar bazasiga saqlash."""
+async def load_existing_groups(client: TelegramClient, profile_id: int) -> int:
+    """Mavjud guruhlarni yuklash va ma'lumotlar bazasiga bitta tranzaksiyada saqlash."""
     try:
         dialogs = await client.get_dialogs()
+        groups = []
         for d in dialogs:
             if isinstance(d.entity, Channel) and (d.entity.broadcast or d.entity.megagroup):
                 try:
                     entity = d.entity
                     link = f"https://t.me/{entity.username}" if entity.username else f"https://t.me/c/{entity.id}"
-                    save_group(link, profile_id)
-                    logger.info(f"✅ {client._self_id} guruh yuklandi: {link}")
+                    groups.append(dict(group_peer_fields(entity), link=link))
                 except Exception as e:
                     logger.error(f"❌ Guruh linkini olishda xato: {e}")
+        added = await save_groups(groups, profile_id)
+        logger.info(f"✅ {client._self_id} guruhlar yuklandi: {len(groups)} ta, yangi: {added} ta")
+        return added
     except Exception as e:
         logger.error(f"❌ {client._self_id} mavjud guruhlarni yuklashda xato: {e}")
+        return 0
 
 
-# Tunable parametrlar (defaultlarni o'zgartiring)
-DELAY_BETWEEN_MSG = (6, 12)      # har xabar orasidagi random sekundlar (biroz kattaroq)
+# Tunable parametrlar (defaultlarni o'zgartiring).
+# Profil tezligi profiles jadvalidagi messages_per_minute va send_interval dan
+# olinadi. Ular sozlanmagan (NULL) profil eski sekin tezlikda ishlaydi:
+# DELAY_BETWEEN_MSG, PAUSE_BETWEEN_BATCH va GLOBAL_SLEEP.
 BATCH_SIZE = 6
-PAUSE_BETWEEN_BATCH = 200        # har batch dan keyin tanaffus (sekund)
-GLOBAL_SLEEP = 900               # barcha profillar aylanmasi (sekund)
-MESSAGES_PER_MINUTE = 6          # xavfsiz minimal limit (profil holatiga qarab kamaytiring)
+DELAY_BETWEEN_MSG = (6, 12)      # sozlanmagan profil: har xabar orasidagi random sekundlar
+PAUSE_BETWEEN_BATCH = 200        # sozlanmagan profil: har batch dan keyin tanaffus (sekund)
+PAUSE_JITTER = 40                # sozlanmagan profil: tanaffusga qo'shiladigan 0..PAUSE_JITTER sekund
+BATCH_REST_SHARE = 0.5           # batch vaqtining qancha qismi batch oxiridagi tanaffusga ketadi
+DELAY_JITTER = 1 / 3             # xabarlar orasidagi kechikish o'rtachadan ±33% farq qiladi ((6, 12) kabi)
+MIN_DELAY_BETWEEN_MSG = 6.0      # eng qisqa kechikish — sozlama qanchalik katta bo'lmasin (sekund)
+GLOBAL_SLEEP = 900               # send_interval bo'lmasa aylanmalar orasidagi kutish (sekund)
+MESSAGES_PER_MINUTE = 6          # messages_per_minute bo'lmasa limiter uchun xavfsiz limit
+ENTITY_CACHE_SIZE = 20000        # xotirada saqlanadigan resolve qilingan peerlar soni
+ENTITY_CACHE_TTL = 7 * 24 * 3600  # peer qayta resolve qilinguncha (sekund)
+ENTITY_CACHE_PRUNE_INTERVAL = 3600  # SQLite dagi eskirgan entity yozuvlarini tozalash oralig'i (sekund)
+GROUP_FAILURE_BACKOFF = 3600     # guruhga yozish birinchi marta xato bo'lsa, shuncha kutiladi (sekund)
+GROUP_FAILURE_BACKOFF_MAX = 7 * 24 * 3600  # ketma-ket xatolarda kutish har safar 2 barobar, lekin bundan oshmaydi
 FLOOD_BLOCKED = {}              # profile_id -> unblock datetime
 # Cache va profiling state
-_entity_cache = {}               # link -> entity obyekti
-_profile_send_history = defaultdict(list)  # profile_id -> list of send timestamps (datetime)
-_profile_backoff = {}            # profile_id -> seconds to wait (adaptive backoff)
+_entity_cache = TTLCache(ENTITY_CACHE_SIZE, ENTITY_CACHE_TTL)  # (profile_id, link) -> InputPeer
+_entity_cache_stats = {}         # profile_id -> {"hits", "db_hits", "misses"}
+_profile_limiters = {}           # profile_id -> TokenBucket (messages_per_minute)
+_profile_backoff = {}            # profile_id -> unblock datetime (adaptive backoff)
+_group_backoff = {}              # (profile_id, group_id) -> unblock datetime
+_group_health = {}               # (profile_id, group_id) -> {"fail_count", "slow_mode", "last_success"}
+
+def backoff_remaining(profile_id: int) -> float:
+    """Profil flood/backoff tufayli yana qancha sekund kutishi kerak (0 — kutmaydi)."""
+    deadlines = [t for t in (_profile_backoff.get(profile_id), FLOOD_BLOCKED.get(profile_id)) if t]
+    if not deadlines:
+        return 0.0
+    return max(0.0, (max(deadlines) - datetime.now()).total_seconds())
+
+def group_backoff_remaining(profile_id: int, group_id: int) -> float:
+    """Guruhga yana qancha sekunddan keyin yozish mumkin (0 — hozir)."""
+    unblock_time = _group_backoff.get((profile_id, group_id))
+    if unblock_time is None:
+        return 0.0
+    remaining = (unblock_time - datetime.now()).total_seconds()
+    if remaining <= 0:
+        del _group_backoff[(profile_id, group_id)]
+        return 0.0
+    return remaining
+
+async def set_backoff(profile_id: int, unblock_time: datetime, group_id: int = None):
+    """Profil (yoki bitta guruh) backoff'ini o'rnatadi va SQLite ga yozadi — restartdan keyin ham amal qiladi."""
+    if group_id is None:
+        _profile_backoff[profile_id] = unblock_time
+    else:
+        _group_backoff[(profile_id, group_id)] = unblock_time
+    await save_backoff(profile_id, unblock_time.timestamp(), group_id or 0)
+
+async def clear_group_backoff(profile_id: int, group_id: int):
+    if _group_backoff.pop((profile_id, group_id), None) is not None:
+        await clear_backoff(profile_id, group_id)
+
+def group_failure_backoff(fail_count: int) -> int:
+    """Ketma-ket fail_count ta xatodan keyin guruh o'tkazib yuboriladigan sekundlar."""
+    return min(GROUP_FAILURE_BACKOFF * 2 ** max(fail_count - 1, 0), GROUP_FAILURE_BACKOFF_MAX)
+
+def _remember_group_health(profile_id: int, group: dict) -> dict:
+    return _group_health.setdefault((profile_id, group["id"]), {
+        "fail_count": group.get("fail_count") or 0,
+        "slow_mode": group.get("slow_mode") or 0,
+        "last_success": group.get("last_success"),
+    })
+
+async def _save_group_health(group_id: int, health: dict):
+    await update_group_health(group_id, health["fail_count"], health["slow_mode"], health["last_success"])
+
+async def _group_sent(profile_id: int, group_id: int):
+    health = _group_health.setdefault((profile_id, group_id), {"fail_count": 0, "slow_mode": 0, "last_success": None})
+    recovered = health["fail_count"] or health["last_success"] is None
+    health["fail_count"] = 0
+    health["last_success"] = int(time.time())
+    # Har muvaffaqiyatli xabarda DB ga yozmaymiz: holat o'zgargandagina (xatolardan
+    # keyin tiklanish, birinchi yuborish). Aniq oxirgi yuborish vaqti send_log da.
+    if recovered:
+        await _save_group_health(group_id, health)
+    if health["slow_mode"]:
+        # slow mode: keyingi xabar shu guruhga slow_mode sekunddan oldin ketmaydi.
+        # Faqat xotirada — har yuborishda DB ga yozilmaydi; restartdan keyin
+        # SlowModeWaitError kelsa _group_slow_mode() yana o'rnatadi.
+        _group_backoff[(profile_id, group_id)] = datetime.now() + timedelta(seconds=health["slow_mode"])
+
+async def _group_failed(profile_id: int, group_id: int) -> int:
+    """Guruh xatosini hisoblaydi va eksponensial backoff qo'yadi. Kutish sekundlarini qaytaradi."""
+    health = _group_health.setdefault((profile_id, group_id), {"fail_count": 0, "slow_mode": 0, "last_success": None})
+    health["fail_count"] += 1
+    await _save_group_health(group_id, health)
+    delay = group_failure_backoff(health["fail_count"])
+    await set_backoff(profile_id, datetime.now() + timedelta(seconds=delay), group_id)
+    return delay
+
+async def _group_slow_mode(profile_id: int, group_id: int, seconds: int):
+    health = _group_health.setdefault((profile_id, group_id), {"fail_count": 0, "slow_mode": 0, "last_success": None})
+    if seconds > health["slow_mode"]:
+        health["slow_mode"] = seconds
+        await _save_group_health(group_id, health)
+    await set_backoff(profile_id, datetime.now() + timedelta(seconds=seconds + 1), group_id)
+
+async def restore_backoffs() -> int:
+    """Saqlangan (hali tugamagan) backofflarni xotiraga yuklaydi. main.py ishga tushishda chaqiradi."""
+    rows = await load_backoffs()
+    for profile_id, group_id, until in rows:
+        unblock_time = datetime.fromtimestamp(until)
+        if group_id:
+            _group_backoff[(profile_id, group_id)] = unblock_time
+        else:
+            _profile_backoff[profile_id] = max(unblock_time, _profile_backoff.get(profile_id, unblock_time))
+    if rows:
+        logger.info(f"⏸️ {len(rows)} ta saqlangan backoff tiklandi.")
+    return len(rows)
+
+# Helper: entity cache olish.
+# Tartib: xotiradagi LRU -> SQLite (entity_cache jadvali) -> client.get_entity.
+# Faqat InputPeer (id + access_hash) saqlanadi, shuning uchun restartdan keyin
+# ham get_entity chaqirilmaydi.
+_INPUT_PEER_TYPES = {"channel": InputPeerChannel, "chat": InputPeerChat, "user": InputPeerUser}
+
+def _input_peer_to_row(peer):
+    if isinstance(peer, InputPeerChannel):
+        return "channel", peer.channel_id, peer.access_hash
+    if isinstance(peer, InputPeerChat):
+        return "chat", peer.chat_id, None
+    if isinstance(peer, InputPeerUser):
+        return "user", peer.user_id, peer.access_hash
+    return None
+
+def _row_to_input_peer(peer_type, peer_id, access_hash):
+    if peer_type == "chat":
+        return InputPeerChat(peer_id)
+    return _INPUT_PEER_TYPES[peer_type](peer_id, access_hash)
+
+def _count_entity_lookup(profile_id: int, kind: str):
+    stats = _entity_cache_stats.setdefault(profile_id, {"hits": 0, "db_hits": 0, "misses": 0})
+    stats[kind] += 1
+
+def entity_cache_stats(profile_id: int = None) -> dict:
+    """Profil (yoki barcha profillar) bo'yicha entity kesh hisoblagichlari va hit-rate."""
+    def with_rate(stats):
+        total = stats["hits"] + stats["db_hits"] + stats["misses"]
+        return dict(stats, hit_rate=(stats["hits"] + stats["db_hits"]) / total if total else 0.0)
+    if profile_id is not None:
+        return with_rate(_entity_cache_stats.get(profile_id, {"hits": 0, "db_hits": 0, "misses": 0}))
+    return {pid: with_rate(stats) for pid, stats in _entity_cache_stats.items()}
+
+metrics.Gauge("userbot_entity_cache_hit_ratio", "Entity kesh hit-rate (xotira + DB)", ["profile"],
+              collect=lambda: {(pid,): stats["hit_rate"] for pid, stats in entity_cache_stats().items()})
+metrics.Gauge("userbot_entity_cache_lookups", "Entity kesh so'rovlari (hit, db_hit, miss)", ["profile", "kind"],
+              collect=lambda: {(pid, kind): stats[kind] for pid, stats in list(_entity_cache_stats.items())
+                               for kind in ("hits", "db_hits", "misses")})
 
-# Helper: entity cache olish
 async def get_entity_cached(client: TelegramClient, link: str):
-    key = f"{client._self_id}:{link}"
-    if key in _entity_cache:
-        return _entity_cache[key]
+    profile_id = client.profile_id
+    key = (profile_id, link)
+    peer = _entity_cache.get(key)
+    if peer is not None:
+        _count_entity_lookup(profile_id, "hits")
+        return peer
+    row = await load_entity(profile_id, link, max_age=ENTITY_CACHE_TTL)
+    if row is not None:
+        peer = _row_to_input_peer(*row)
+        _entity_cache.set(key, peer)
+        _count_entity_lookup(profile_id, "db_hits")
+        return peer
+    _count_entity_lookup(profile_id, "misses")
     entity = await client.get_entity(link)
-    _entity_cache[key] = entity
-    return entity
+    peer = utils.get_input_peer(entity)
+    row = _input_peer_to_row(peer)
+    if row is None:
+        return entity
+    _entity_cache.set(key, peer)
+    await save_entity(profile_id, link, *row)
+    fields = group_peer_fields(entity)
+    if fields:
+        await update_group_peer(link, profile_id, **fields)
+    return peer
+
+async def run_entity_cache_prune():
+    """Fon vazifasi: ENTITY_CACHE_TTL dan eski entity_cache qatorlarini o'chiradi.
+
+    load_entity ularni baribir e'tiborsiz qoldiradi, lekin o'chirilmasa jadval
+    cheksiz o'sadi (o'chirilgan guruhlar, o'zgargan linklar).
+    """
+    while True:
+        removed = await prune_entity_cache(time.time() - ENTITY_CACHE_TTL)
+        if removed:
+            logger.info(f"🧹 Entity keshidan {removed} ta eskirgan yozuv o‘chirildi.")
+        await asyncio.sleep(ENTITY_CACHE_PRUNE_INTERVAL)
+
+async def forget_entity(profile_id: int, link: str):
+    _entity_cache.pop((profile_id, link), None)
+    await remove_entity(profile_id, link)
 
 # Helper: xabarni ozgina variatsiya qilish
 def make_variation(message_text: str) -> str:
@@ -165,20 +492,67 @@ def make_variation(message_text: str) -> str:
     extras = ["", " ✅", " ✨", " 🔔", " 📌"]
     return f"{message_text}{random.choice(extras)}{suffix}"
 
-# Helper: messages_per_minute limitni tekshirish
-def can_send_now(profile_id: int) -> bool:
-    now = datetime.now()
-    window_start = now - timedelta(minutes=1)
-    # filter eski timestamplarni olib tashlash
-    _profile_send_history[profile_id] = [t for t in _profile_send_history[profile_id] if t > window_start]
-    return len(_profile_send_history[profile_id]) < MESSAGES_PER_MINUTE
+# legacy — messages_per_minute sozlanmagan: eski taqsimotlar (kechikishdan send vaqti ayirilmaydi,
+# tanaffus PAUSE_BETWEEN_BATCH + 0..PAUSE_JITTER, aylanma oralig'i + 0..120s)
+Pacing = namedtuple("Pacing", "messages_per_minute send_interval delay batch_size batch_pause legacy")
+
+# Helper: profil sozlamalaridan yuborish tezligini hisoblash
+def max_messages_per_minute() -> int:
+    """MIN_DELAY_BETWEEN_MSG tufayli erishib bo'ladigan eng yuqori messages_per_minute."""
+    return max(1, int(60 * (1 - DELAY_JITTER) / MIN_DELAY_BETWEEN_MSG + 1e-9))
+
+def effective_messages_per_minute(value) -> int:
+    """Sozlangan messages_per_minute amalda qanday tezlik beradi (max_messages_per_minute() bilan cheklangan)."""
+    return min(max(1, int(value)), max_messages_per_minute())
+
+def get_pacing(settings: dict) -> Pacing:
+    """messages_per_minute ni xabarlar orasidagi kechikish va batch tanaffusiga taqsimlaydi.
+
+    Har BATCH_SIZE ta xabarga BATCH_SIZE * 60 / messages_per_minute sekund
+    ajratiladi: BATCH_REST_SHARE qismi batch oxiridagi tanaffusga, qolgani
+    xabarlar orasidagi kechikishlarga. Kechikish — ikki xabar boshlanishi orasidagi
+    vaqt (send_message davomiyligi ichida), shuning uchun o'rtacha tezlik sozlamaga
+    teng bo'ladi. Kechikish MIN_DELAY_BETWEEN_MSG dan qisqa bo'lmagani uchun tezlik
+    ko'pi bilan max_messages_per_minute() (6 xabar/daqiqa) — kattaroq sozlama shunga tushiriladi.
+
+    messages_per_minute sozlanmagan bo'lsa — eski tezlik (DELAY_BETWEEN_MSG,
+    PAUSE_BETWEEN_BATCH), ~1.4 xabar/daqiqa.
+    """
+    send_interval = int(settings.get("send_interval") or GLOBAL_SLEEP)
+    if not settings.get("messages_per_minute"):
+        return Pacing(MESSAGES_PER_MINUTE, send_interval, DELAY_BETWEEN_MSG, BATCH_SIZE, PAUSE_BETWEEN_BATCH, True)
+    messages_per_minute = effective_messages_per_minute(settings["messages_per_minute"])
+    budget = BATCH_SIZE * 60 / messages_per_minute
+    mean_delay = max(MIN_DELAY_BETWEEN_MSG / (1 - DELAY_JITTER), budget * (1 - BATCH_REST_SHARE) / BATCH_SIZE)
+    batch_pause = max(0.0, budget - mean_delay * BATCH_SIZE)
+    delay = (mean_delay * (1 - DELAY_JITTER), mean_delay * (1 + DELAY_JITTER))
+    return Pacing(messages_per_minute, send_interval, delay, BATCH_SIZE, batch_pause, False)
+
+# Helper: profil uchun messages_per_minute limiteri (sozlama o'zgarsa tezligi yangilanadi)
+def get_rate_limiter(profile_id: int, pacing: Pacing) -> TokenBucket:
+    # Sig'im = bitta batch: batch ichida tezroq, tanaffusda tokenlar qayta to'ladi
+    limiter = _profile_limiters.get(profile_id)
+    if limiter is None:
+        limiter = _profile_limiters[profile_id] = TokenBucket(pacing.messages_per_minute, 60, pacing.batch_size)
+    elif limiter.rate != pacing.messages_per_minute or limiter.capacity != pacing.batch_size:
+        limiter.set_rate(pacing.messages_per_minute, pacing.batch_size)
+    return limiter
+
+def _record_send_failure(profile_id: int, group_id, error: Exception, status: int, wait: int = None):
+    metrics.SEND_FAILURES.inc(profile=profile_id, error=type(error).__name__)
+    metrics.SEND_STATS.record(profile_id, False)
+    send_log.record(profile_id, group_id, status, wait=wait)
 
 # Yaxshilangan send_message_safe
 
 
 
-async def send_message_safe(client: TelegramClient, link: str, message_text: str, profile_id: int, idx: int, total: int) -> bool:
-    """Adaptive flood himoya bilan yuborish."""
+async def send_message_safe(client: TelegramClient, link: str, message_text: str, profile_id: int, idx: int, total: int,
+                            peer=None, group_id: int = None) -> bool:
+    """Adaptive flood himoya bilan yuborish. peer berilsa (groups jadvalidan), resolve qilinmaydi.
+
+    Har bir urinish (group_id bilan) send_log jurnaliga yoziladi.
+    """
     try:
         # Agar profilga backoff qo'yilgan bo'lsa — tekshirib o'tamiz
         if profile_id in _profile_backoff:
@@ -190,44 +564,75 @@ async def send_message_safe(client: TelegramClient, link: str, message_text: str
             else:
                 del _profile_backoff[profile_id]
 
-        # messages_per_minute tekshiruvi
-        if not can_send_now(profile_id):
-            # Agar bu limitdan oshib ketgan bo'lsa — profilni qisqa backoffga qo'yamiz
-            backoff = timedelta(seconds=60 + random.randint(20, 60))
-            _profile_backoff[profile_id] = datetime.now() + backoff
-            logger.warning(f"🚫 {client._self_id} uchun rate limit (messages_per_minute) bosildi. {backoff.seconds}s block.")
-            return False
+        # messages_per_minute limiti (profil sozlamasidan, jonli): token bo'lguncha aynan kerakli vaqt kutamiz
+        pacing = get_pacing(await get_profile_settings(profile_id) or {})
+        waited = await get_rate_limiter(profile_id, pacing).acquire()
+        if waited:
+            logger.info(f"⏳ {client._self_id} messages_per_minute limiti: {waited:.1f}s kutildi.")
 
-        # entity ni cache orqali oling
-        entity = await get_entity_cached(client, link)
+        # peer guruh qatorida bo'lmasa, entity ni cache orqali oling
+        entity = peer if peer is not None else await get_entity_cached(client, link)
         # Send with slight variation
         final_text = make_variation(message_text)
+        started = time.perf_counter()
         await client.send_message(entity, final_text)
-        # record timestamp for rate limiting
-        _profile_send_history[profile_id].append(datetime.now())
-
+        latency = time.perf_counter() - started
+        metrics.SEND_LATENCY.observe(latency, profile=profile_id)
+        metrics.MESSAGES_SENT.inc(profile=profile_id)
+        metrics.SEND_STATS.record(profile_id, True, latency)
+        send_log.record(profile_id, group_id, send_log.SEND_OK, latency)
         logger.info(f"✅ [{idx}/{total}] Yuborildi: {link}")
+        if group_id is not None:
+            await _group_sent(profile_id, group_id)
         return True
 
     except FloodWaitError as e:
+        _record_send_failure(profile_id, group_id, e, send_log.SEND_FLOOD, wait=e.seconds)
+        metrics.FLOOD_WAIT_SECONDS.inc(e.seconds, profile=profile_id)
         # Telegram aytgan seconds ga mos holda profilni block qilamiz
         unblock_time = datetime.now() + timedelta(seconds=e.seconds + 5)
-        _profile_backoff[profile_id] = unblock_time
+        await set_backoff(profile_id, unblock_time)
         # logging uchun adaptive profiling
         logger.warning(f"🚨 FLOOD ({client._self_id}) - wait {e.seconds}s => profil blocklandi until {unblock_time}")
         return False
 
-    except ChatWriteForbiddenError:
-        logger.warning(f"🚫 Yozish taqiqlangan: {link}")
+    except SlowModeWaitError as e:
+        # Guruhda slow mode: faqat shu guruh kutadi, profil emas
+        _record_send_failure(profile_id, group_id, e, send_log.SEND_SLOW_MODE, wait=e.seconds)
+        logger.info(f"🐢 Slow mode {e.seconds}s: {link}")
+        if group_id is not None:
+            await _group_slow_mode(profile_id, group_id, e.seconds)
         return False
-    except (UserBannedInChannelError, ChannelPrivateError):
+
+    except ChatWriteForbiddenError as e:
+        _record_send_failure(profile_id, group_id, e, send_log.SEND_FORBIDDEN)
+        if group_id is not None:
+            delay = await _group_failed(profile_id, group_id)
+            logger.warning(f"🚫 Yozish taqiqlangan: {link} — {delay // 60} daqiqa o‘tkazib yuboriladi")
+        else:
+            logger.warning(f"🚫 Yozish taqiqlangan: {link}")
+        return False
+    except (UserBannedInChannelError, ChannelPrivateError) as e:
+        _record_send_failure(profile_id, group_id, e, send_log.SEND_BANNED)
         logger.warning(f"🚫 Guruhdan o‘chirilmoqda yoki private: {link}")
-        remove_group(link, profile_id)
+        await remove_group(link, profile_id)
         # clear cache for this link
-        key = f"{client._self_id}:{link}"
-        _entity_cache.pop(key, None)
+        await forget_entity(profile_id, link)
+        return False
+    except (ChannelInvalidError, PeerIdInvalidError) as e:
+        _record_send_failure(profile_id, group_id, e, send_log.SEND_INVALID_PEER)
+        # Keshdagi peer yaroqsiz bo'lib qolgan — keyingi safar qayta resolve qilinadi
+        logger.warning(f"♻️ Peer yaroqsiz, keshdan o‘chirildi: {link}")
+        await forget_entity(profile_id, link)
+        if peer is not None:
+            await update_group_peer(link, profile_id, None)
+        if group_id is not None:
+            await _group_failed(profile_id, group_id)
         return False
     except Exception as e:
+        # Tarmoq uzilishi, timeout va h.k. — guruh aybi emas, uning holatiga (fail_count,
+        # backoff) tegmaymiz; keyingi aylanmada guruh odatdagidek qayta uriniladi
+        _record_send_failure(profile_id, group_id, e, send_log.SEND_ERROR)
         logger.error(f"❌ [{idx}] {link} - {e}")
         return False
 
@@ -244,12 +649,14 @@ async def send_profile_messages(client: TelegramClient):
         else:
             del FLOOD_BLOCKED[profile_id]
 
-    if not bool(int(get_profile_setting(profile_id, "auto_send_enabled") or 0)):
+    # settings — keshdagi jonli obyekt: botdan o'zgartirilgan tezlik aylanma davomida ham qo'llanadi
+    settings = await get_profile_settings(profile_id) or {}
+    if not bool(int(settings.get("auto_send_enabled") or 0)):
         logger.info(f"⏸️ {client._self_id} uchun avto yuborish o‘chirilgan.")
         return
 
-    message_text = get_profile_setting(profile_id, "message_text") or "📢 Avto xabar!"
-    groups = load_groups(profile_id)
+    message_text = settings.get("message_text") or "📢 Avto xabar!"
+    groups = await load_group_peers(profile_id)
     total_groups = len(groups)
 
     if not groups:
@@ -258,17 +665,33 @@ async def send_profile_messages(client: TelegramClient):
 
     logger.info(f"🚀 {client._self_id} uchun {total_groups} ta guruhga yuborish boshlandi.")
 
-    for i, link in enumerate(groups, start=1):
+    loop = asyncio.get_running_loop()
+    skipped = 0
+    for i, group in enumerate(groups, start=1):
+        link = group["link"]
         # Agar profilda adaptive backoff bo'lsa, chiqarib ketamiz
         if profile_id in _profile_backoff and datetime.now() < _profile_backoff[profile_id]:
             logger.info(f"⏸️ {_profile_backoff[profile_id]}gacha profil blocklandi, to'xtatildi.")
             break
-
-        ok = await send_message_safe(client, link, message_text, profile_id, i, total_groups)
-
-        # agar yuborilgan bo'lsa yoki yo'q bo'lsa ham, small delay lekin adaptiv
-        # agar muvaffaqiyatsiz va profil block bo'lsa, to'xtatamiz
-        await asyncio.sleep(random.uniform(*DELAY_BETWEEN_MSG))
+        # Guruhning o'z backoff'i bo'lsa (slow mode yoki ketma-ket xatolar) —
+        # tarmoq so'rovi va kechikishsiz o'tkazib yuboramiz
+        _remember_group_health(profile_id, group)
+        if group_backoff_remaining(profile_id, group["id"]):
+            skipped += 1
+            continue
+
+        started = loop.time()
+        ok = await send_message_safe(client, link, message_text, profile_id, i, total_groups,
+                                     peer=peer_from_group(group), group_id=group["id"])
+        pacing = get_pacing(settings)
+
+        # agar yuborilgan bo'lsa yoki yo'q bo'lsa ham, small delay lekin adaptiv.
+        # Sozlangan tezlikda kechikish xabar boshidan hisoblanadi: send_message (va limiter)
+        # ga ketgan vaqt ayiriladi. Sozlanmagan profil eskicha — to'liq kechikish.
+        delay = random.uniform(*pacing.delay)
+        if not pacing.legacy:
+            delay = max(0.0, delay - (loop.time() - started))
+        await asyncio.sleep(delay)
 
         if not ok:
             # Agar profil adaptive backoff o'rnatilgan bo'lsa — chiqamiz
@@ -276,53 +699,43 @@ async def send_profile_messages(client: TelegramClient):
                 logger.info(f"⚠️ {client._self_id} flood/limit tufayli to'xtatildi.")
                 break
 
-        # Batch pauza qo'llash
-        if i % BATCH_SIZE == 0 and i != total_groups:
-            pause = PAUSE_BETWEEN_BATCH + random.randint(0, 40)
-            logger.info(f"🛌 Batch tugadi ({i}/{total_groups}). Pauza {pause}s...")
+        # Batch pauza qo'llash (o'tkazib yuborilgan guruhlar batchga kirmaydi)
+        if (i - skipped) % pacing.batch_size == 0 and i != total_groups:
+            if pacing.legacy:
+                pause = pacing.batch_pause + random.randint(0, PAUSE_JITTER)
+            else:
+                pause = pacing.batch_pause * random.uniform(0.8, 1.2)
+            logger.info(f"🛌 Batch tugadi ({i}/{total_groups}). Pauza {pause:.0f}s...")
             await asyncio.sleep(pause)
 
+    if skipped:
+        logger.info(f"⏭ {client._self_id}: {skipped} ta guruh backoff tufayli o‘tkazib yuborildi.")
     logger.info(f"✅ {client._self_id} uchun yuborish yakunlandi.")
 
-# Yaxshilangan send_to_groups_auto: profiling va staggered profiling
-async def send_to_groups_auto(clients: list):
-    """Barcha profillar parallel ravishda guruhlarga xabar yuborish.
-       Qo'shimcha: profilni stagger (boshqa profilga birma-bir) tarzda boshlash."""
-    # boshida har bir profilda kichik staggers qo'yamiz
-    for idx, c in enumerate(clients):
-        await asyncio.sleep(random.uniform(1, 3))  # kichik stagger
 
-    while True:
-        try:
-            # Staggered start: har bir profilni alohida kechiktirish bilan ishga tushurish mumkin
-            tasks = []
-            for client in clients:
-                # agar profil bloklangan bo'lsa, boshqasiga o'tish
-                pid = client.profile_id
-                if pid in _profile_backoff and datetime.now() < _profile_backoff[pid]:
-                    logger.info(f"⏭️ {client._self_id} blocklangan, o'tkazildi.")
-                    continue
-                tasks.append(send_profile_messages(client))
-
-            if tasks:
-                await asyncio.gather(*tasks)
-
-            logger.info(f"🌙 Barcha profillar aylanib chiqdi. {GLOBAL_SLEEP}s kutish...")
-            await asyncio.sleep(GLOBAL_SLEEP + random.randint(0, 120))
-        except Exception as e:
-            logger.error(f"🔥 Asosiy siklda xato: {e}")
-            wait_time = random.randint(20, 60)
-            logger.info(f"♻️ {wait_time}s keyin qayta uriniladi...")
-            await asyncio.sleep(wait_time)
-
-    """Barcha profillar parallel ravishda guruhlarga xabar yuborish."""
-    while True:
-        try:
-            tasks = [send_profile_messages(client) for client in clients]
-            await asyncio.gather(*tasks)
-            logger.info(f"🌙 Barcha profillar aylanib chiqdi. {GLOBAL_SLEEP}s kutish...")
-            await asyncio.sleep(GLOBAL_SLEEP)
-        except Exception as e:
-            logger.error(f"🔥 Asosiy siklda xato: {e}")
-            logger.info("♻️ 10 soniyadan keyin qayta uriniladi...")
-            await asyncio.sleep(10)
\ No newline at end of file
+async def restore_send_state(profile_ids):
+    """Restartdan keyin yuborish holatini send_log jurnalidan tiklaydi.
+
+    - /stats uchun oxirgi sutkalik agregat (metrics.SEND_STATS),
+    - messages_per_minute limiteri (yaqindagi yuborishlar qayta hisoblanadi),
+    - jurnaldagi FloodWait hali tugamagan bo'lsa — profil backoff'i.
+    """
+    now = time.time()
+    for profile_id, minute, sent, failed, latency_ms in await load_send_log_minutes(int(now - metrics.SEND_STATS.window)):
+        metrics.SEND_STATS.add(profile_id, minute, sent, failed, latency_ms / 1000)
+
+    recent = await load_recent_sends(int(now - 3600))
+    for profile_id in profile_ids:
+        if not recent.get(profile_id):
+            continue
+        pacing = get_pacing(await get_profile_settings(profile_id) or {})
+        get_rate_limiter(profile_id, pacing).replay(now - ts for ts in recent[profile_id])
+
+    restored = 0
+    for profile_id, deadline in (await load_flood_deadlines(int(now - 86400))).items():
+        if profile_id in profile_ids and deadline + 5 > now:
+            unblock_time = datetime.fromtimestamp(deadline + 5)
+            _profile_backoff[profile_id] = max(unblock_time, _profile_backoff.get(profile_id, unblock_time))
+            restored += 1
+    logger.info(f"📒 Yuborish jurnalidan tiklandi: {sum(len(v) for v in recent.values())} ta yaqindagi yuborish, "
+                f"{restored} ta faol backoff.")
@@ -0,0 +1,73 @@
+import asyncio
+import inspect
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import send_log  # noqa: E402
+import telethon_utils  # noqa: E402
+from tests.support import FakeTelegramClient, VirtualClockLoop  # noqa: E402
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "virtual_clock: async testni virtual soatli loopda (VirtualClockLoop) ishlatish")
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    """`async def` testlarni alohida event loopda ishga tushiradi (virtual_clock belgisi bilan — virtual soatda)."""
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+    loop = VirtualClockLoop() if pyfuncitem.get_closest_marker("virtual_clock") else asyncio.new_event_loop()
+    kwargs = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(pyfuncitem.obj(**kwargs))
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+    return True
+
+
+@pytest.fixture
+def temp_db(tmp_path):
+    """Har test uchun alohida SQLite bazasi va toza keshlar."""
+    db.close_connections()
+    db.DB_NAME = str(tmp_path / "test.db")
+    db.invalidate_profile_settings()
+    db.invalidate_groups()
+    db.init_db()
+    yield db
+    db.close_connections()
+    db.invalidate_profile_settings()
+    db.invalidate_groups()
+    del send_log._pending[:]
+    for state in (telethon_utils._profile_limiters, telethon_utils._profile_backoff, telethon_utils._group_backoff,
+                  telethon_utils._group_health, telethon_utils._auto_reply_stats):
+        state.clear()
+    telethon_utils._auto_reply_cooldown.clear()
+    telethon_utils._entity_cache.clear()
+
+
+@pytest.fixture
+def profile_id(temp_db):
+    """Bazadagi bitta test profili."""
+    return temp_db.save_profile(1, "hash", "+998900000001", "session_1")
+
+
+@pytest.fixture
+def fake_client(temp_db, profile_id):
+    """profile_id uchun FakeTelegramClient yasaydigan fabrika.
+
+    settings profilga yoziladi; standart holatda guruhlar yo'q, tarmoq kechikishi
+    nol va xatolar o'chirilgan — kerakli parametrlar options bilan beriladi.
+    """
+    def make(settings=None, **options):
+        for key, value in (settings or {}).items():
+            temp_db.update_profile_setting(profile_id, key, value)
+        return FakeTelegramClient(profile_id, **{"groups": 0, "latency": (0.0, 0.0), "seed": 1, **options})
+    return make
@@ -0,0 +1,287 @@
+"""Testlar (va benchmarks/) uchun yordamchi soxta obyektlar.
+
+FakeTelegramClient — haqiqiy akkauntlarsiz yuborish kodini sinash uchun soxta
+TelegramClient. telethon_utils ishlatadigan metodlarni takrorlaydi: get_entity,
+send_message, get_dialogs, get_me va client(JoinChannelRequest / LeaveChannelRequest /
+GetFullChannelRequest), shuningdek event.reply() uchun shaxsiy chatga javob
+va event obyektlari kutadigan _self_id / _mb_entity_cache. Tarmoq kechikishi, FloodWaitError,
+ChatWriteForbiddenError va har bir chat uchun slow mode sozlanadi.
+
+Kiruvchi xabarlar uchun: private_message_update() / group_message_update()
+Telegram yuboradigan ko'rinishdagi update yasaydi, client.dispatch() esa uni
+ro'yxatdan o'tgan handlerlarga TelegramClient._dispatch_update() tartibida beradi.
+
+VirtualClockLoop — virtual soatli event loop: loopda bajariladigan ish qolmaganda
+soat darhol keyingi taymergacha suriladi, shuning uchun asyncio.sleep(900)
+bir zumda "o'tadi". DB chaqiruvlari (db-worker oqimi) tugaguncha soat
+to'xtab turadi. FakeTelegramClient vaqtni loop.time() va asyncio.sleep orqali
+o'lchaydi, shuning uchun unda ham o'zgarishsiz ishlaydi.
+"""
+import asyncio
+import random
+import selectors
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from telethon import utils
+from telethon._updates import EntityCache
+from telethon.client.updates import EventBuilderDict
+from telethon.errors import ChatWriteForbiddenError, FloodWaitError, SlowModeWaitError
+from telethon.tl.functions.channels import GetFullChannelRequest, JoinChannelRequest, LeaveChannelRequest
+from telethon.tl.types import (
+    Channel, ChatPhotoEmpty, InputPeerChannel, InputPeerUser, Message, PeerChannel, PeerUser,
+    UpdateNewChannelMessage, UpdateNewMessage, User,
+)
+
+from rate_limiter import monotonic
+
+CHANNEL_ID_BASE = 1_000_000_000
+
+
+class FakeTelegramClient:
+    """Bitta akkaunt va uning `groups` ta guruhi.
+
+    latency             — har so'rov davomiyligi (min, max) sekund
+    flood_per_minute    — oxirgi 60s da shundan ko'p xabar bo'lsa FloodWaitError (None — cheklovsiz)
+    flood_seconds       — FloodWaitError.seconds
+    flood_probability   — har xabarda tasodifiy FloodWait ehtimoli
+    forbidden_share     — yozish taqiqlangan guruhlar ulushi (ChatWriteForbiddenError)
+    slow_mode_share     — slow mode yoqilgan guruhlar ulushi
+    slow_mode_seconds   — slow mode oralig'i
+    """
+
+    def __init__(self, profile_id: int, groups: int = 1000, latency=(0.05, 0.2), flood_per_minute: int = None,
+                 flood_seconds: int = 300, flood_probability: float = 0.0, forbidden_share: float = 0.0,
+                 slow_mode_share: float = 0.0, slow_mode_seconds: int = 60, seed: int = None):
+        self.profile_id = profile_id
+        self._self_id = 500_000 + profile_id
+        self.username = f"fake_user_{profile_id}"
+        self._mb_entity_cache = EntityCache(self_id=self._self_id, self_bot=False)
+        self.latency = latency
+        self.flood_per_minute = flood_per_minute
+        self.flood_seconds = flood_seconds
+        self.flood_probability = flood_probability
+        self.slow_mode_seconds = slow_mode_seconds
+        self._random = random.Random(profile_id if seed is None else seed)
+        self._recent = deque()                 # oxirgi 60s dagi yuborish vaqtlari
+        self._last_sent = {}                   # channel_id -> oxirgi xabar vaqti (slow mode uchun)
+        self.handlers = []
+        self.stats = Counter()
+        self.sent_per_chat = Counter()
+        self.sent_times = []                   # guruhga yuborilgan har xabarning loop vaqti
+        self.fail_private_replies = 0          # keyingi shuncha shaxsiy javob ChatWriteForbiddenError bilan tugaydi
+        self.handler_errors = Counter()        # dispatch() da handler ko'targan xatolar (tur bo'yicha)
+
+        self.channels = {}
+        self.forbidden = set()
+        self.slow_mode = set()
+        base = CHANNEL_ID_BASE + profile_id * 100_000
+        for i in range(groups):
+            channel_id = base + i
+            self.channels[channel_id] = Channel(
+                id=channel_id, title=f"Guruh {profile_id}-{i}", photo=ChatPhotoEmpty(), date=None,
+                megagroup=True, access_hash=self._random.getrandbits(63), username=f"fake_{profile_id}_{i}",
+            )
+            roll = self._random.random()
+            if roll < forbidden_share:
+                self.forbidden.add(channel_id)
+            elif roll < forbidden_share + slow_mode_share:
+                self.slow_mode.add(channel_id)
+        self._by_username = {c.username: c for c in self.channels.values()}
+
+    # --- TelegramClient bilan bir xil interfeys ---------------------------------
+
+    async def _network(self):
+        self.stats["requests"] += 1
+        await asyncio.sleep(self._random.uniform(*self.latency))
+
+    async def get_entity(self, target):
+        await self._network()
+        self.stats["get_entity"] += 1
+        if isinstance(target, int):
+            channel_id = target
+        elif isinstance(target, str) and "/c/" in target:
+            channel_id = int(target.rstrip("/").rsplit("/", 1)[1])
+        else:
+            channel = self._by_username.get(str(target).rstrip("/").rsplit("/", 1)[-1].lstrip("@"))
+            if channel is None:
+                raise ValueError(f'No user has "{target}" as username')
+            return channel
+        if channel_id not in self.channels:
+            raise ValueError(f"Could not find the input entity for {target}")
+        return self.channels[channel_id]
+
+    async def get_dialogs(self):
+        await self._network()
+        return [SimpleNamespace(entity=channel) for channel in self.channels.values()]
+
+    async def send_message(self, entity, message, reply_to=None):
+        await self._network()
+        now = monotonic()
+        if isinstance(entity, InputPeerUser):
+            # shaxsiy chatga javob (avto javob) — cheklovlarsiz
+            if self.fail_private_replies:
+                self.fail_private_replies -= 1
+                self.stats["private_failed"] += 1
+                raise ChatWriteForbiddenError(request=None)
+            self.stats["private_sent"] += 1
+            return SimpleNamespace(id=self.stats["private_sent"], message=message, reply_to=reply_to)
+        channel_id = entity.channel_id if isinstance(entity, InputPeerChannel) else entity.id
+        if channel_id not in self.channels:
+            self.stats["invalid"] += 1
+            raise ValueError(f"Could not find the input entity for {entity}")
+
+        while self._recent and self._recent[0] <= now - 60:
+            self._recent.popleft()
+        if (self.flood_per_minute is not None and len(self._recent) >= self.flood_per_minute) \
+                or (self.flood_probability and self._random.random() < self.flood_probability):
+            self.stats["flood"] += 1
+            raise FloodWaitError(request=None, capture=self.flood_seconds)
+        if channel_id in self.forbidden:
+            self.stats["forbidden"] += 1
+            raise ChatWriteForbiddenError(request=None)
+        if channel_id in self.slow_mode:
+            last = self._last_sent.get(channel_id)
+            if last is not None and now - last < self.slow_mode_seconds:
+                self.stats["slow_mode"] += 1
+                raise SlowModeWaitError(request=None, capture=int(self.slow_mode_seconds - (now - last)) + 1)
+
+        self._recent.append(now)
+        self._last_sent[channel_id] = now
+        self.sent_per_chat[channel_id] += 1
+        self.sent_times.append(now)
+        self.stats["sent"] += 1
+        return SimpleNamespace(id=self.stats["sent"], message=message)
+
+    async def __call__(self, request):
+        await self._network()
+        if isinstance(request, JoinChannelRequest):
+            self.stats["join"] += 1
+            return None
+        if isinstance(request, LeaveChannelRequest):
+            self.stats["leave"] += 1
+            return None
+        if isinstance(request, GetFullChannelRequest):
+            self.stats["get_full_channel"] += 1
+            return SimpleNamespace(full_chat=SimpleNamespace(linked_chat_id=None, exported_invite=None))
+        raise NotImplementedError(type(request).__name__)
+
+    async def get_me(self, input_peer=False):
+        await self._network()
+        self.stats["get_me"] += 1
+        return SimpleNamespace(id=self._self_id, username=self.username)
+
+    async def dispatch(self, update, timings=None):
+        """update ni handlerlarga TelegramClient._dispatch_update() tartibida beradi.
+
+        build → resolve → filter → callback; handler xatosi keyingi handlerlarni
+        to'xtatmaydi (handler_errors da sanaladi). timings berilsa, har handler
+        davomiyligi timings[handler nomi] ro'yxatiga qo'shiladi.
+        """
+        built = EventBuilderDict(self, update, None)
+        for callback, builder in list(self.handlers):
+            event = built[type(builder)]
+            if not event:
+                continue
+            if not builder.resolved:
+                await builder.resolve(self)
+            if not builder.filter(event):
+                continue
+            started = time.perf_counter()
+            try:
+                await callback(event)
+            except Exception as e:
+                self.handler_errors[type(e).__name__] += 1
+            if timings is not None:
+                timings[callback.__name__].append(time.perf_counter() - started)
+
+    def add_event_handler(self, callback, event=None):
+        self.handlers.append((callback, event))
+
+    def remove_event_handler(self, callback, event=None):
+        self.handlers = [(cb, ev) for cb, ev in self.handlers if cb is not callback]
+
+    def is_connected(self):
+        return True
+
+    async def disconnect(self):
+        pass
+
+
+def _user(user_id):
+    return User(id=user_id, access_hash=user_id * 7, first_name=f"User {user_id}")
+
+
+def private_message_update(sender_id: int, text: str, message_id: int = 1):
+    """sender_id dan kelgan kiruvchi shaxsiy xabar (UpdateNewMessage, entity'lari bilan)."""
+    sender = _user(sender_id)
+    message = Message(id=message_id, peer_id=PeerUser(sender.id), date=datetime.now(timezone.utc),
+                      message=text, out=False)
+    update = UpdateNewMessage(message=message, pts=message_id, pts_count=1)
+    update._entities = {sender.id: sender}
+    return update
+
+
+def group_message_update(channel: Channel, sender_id: int, text: str, message_id: int = 1, entities=None,
+                         mentioned: bool = False):
+    """Guruhdagi kiruvchi xabar (UpdateNewChannelMessage, entity'lari bilan)."""
+    sender = _user(sender_id)
+    message = Message(id=message_id, peer_id=PeerChannel(channel.id), date=datetime.now(timezone.utc),
+                      message=text, out=False, mentioned=mentioned, from_id=PeerUser(sender.id), entities=entities)
+    update = UpdateNewChannelMessage(message=message, pts=message_id, pts_count=1)
+    update._entities = {sender.id: sender, utils.get_peer_id(PeerChannel(channel.id)): channel}
+    return update
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+    """select(timeout) bloklanmaydi — o‘rniga loopning virtual soatini suradi."""
+
+    def __init__(self):
+        super().__init__()
+        self.loop = None
+
+    def select(self, timeout=None):
+        if timeout == 0:
+            return super().select(0)
+        if self.loop._inflight:
+            # executor (DB) ishi tugashini haqiqiy vaqtda kutamiz, soat joyida turadi
+            return super().select(None)
+        events = super().select(0)
+        if not events and timeout:
+            self.loop.advance(timeout)
+        return events
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    def __init__(self, start: float = 0.0):
+        selector = _VirtualSelector()
+        super().__init__(selector)
+        selector.loop = self
+        self._virtual_now = start
+        self._inflight = 0
+
+    def time(self):
+        return self._virtual_now
+
+    def advance(self, seconds: float):
+        self._virtual_now += seconds
+
+    def run_in_executor(self, executor, func, *args):
+        future = super().run_in_executor(executor, func, *args)
+        self._inflight += 1
+
+        def done(_):
+            self._inflight -= 1
+        future.add_done_callback(done)
+        return future
+
+
+class VirtualDatetime(datetime):
+    """datetime.now() — simulyatsiya boshlangan vaqt + virtual soat."""
+    epoch = datetime.now()
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.epoch + timedelta(seconds=asyncio.get_running_loop().time())
@@ -0,0 +1,78 @@
+"""auto_reply_handler: har suhbatga cooldown ichida bitta javob.
+
+Kiruvchi shaxsiy xabarlar soxta klient (tests.support) orqali
+Telethon event builderlaridan o'tib handlerga yetadi.
+"""
+import asyncio
+
+import pytest
+
+import telethon_utils
+from tests.support import private_message_update
+
+SENDER_ID = 700_000_001
+
+
+@pytest.fixture
+def reply_client(fake_client):
+    async def make(**options):
+        client = fake_client({"auto_reply_enabled": 1, "auto_reply_text": "Hozir bandman."}, **options)
+        await telethon_utils.register_handlers(client)
+        return client
+    return make
+
+
+async def test_repeated_messages_get_one_reply_per_chat(reply_client):
+    client = await reply_client()
+    seq = 0
+    for sender_id in (SENDER_ID, SENDER_ID + 1):
+        for _ in range(3):
+            seq += 1
+            await client.dispatch(private_message_update(sender_id, f"Salom {seq}", seq))
+
+    assert client.stats["private_sent"] == 2
+    assert telethon_utils.auto_reply_stats(client.profile_id) == {"replied": 2, "suppressed": 4}
+    assert not client.handler_errors
+
+
+async def test_concurrent_burst_from_one_chat_replies_once(reply_client):
+    client = await reply_client(latency=(0.05, 0.05))
+    await asyncio.gather(*(client.dispatch(private_message_update(SENDER_ID, f"Salom {i}", i)) for i in range(1, 6)))
+
+    assert client.stats["private_sent"] == 1
+    assert telethon_utils.auto_reply_stats(client.profile_id) == {"replied": 1, "suppressed": 4}
+
+
+async def test_concurrent_burst_with_cold_settings_replies_once(temp_db, reply_client):
+    client = await reply_client()
+    temp_db.invalidate_profile_settings(client.profile_id)
+    await asyncio.gather(*(client.dispatch(private_message_update(SENDER_ID, f"Salom {i}", i)) for i in range(1, 6)))
+
+    assert client.stats["private_sent"] == 1
+    assert telethon_utils.auto_reply_stats(client.profile_id) == {"replied": 1, "suppressed": 4}
+
+
+async def test_failed_reply_releases_cooldown_slot(reply_client):
+    client = await reply_client()
+    client.fail_private_replies = 1
+    await client.dispatch(private_message_update(SENDER_ID, "Salom", 1))
+    assert telethon_utils.auto_reply_stats(client.profile_id) == {"replied": 0, "suppressed": 0}
+    await client.dispatch(private_message_update(SENDER_ID, "Salom?", 2))
+
+    assert client.stats["private_failed"] == 1
+    assert client.stats["private_sent"] == 1
+    assert telethon_utils.auto_reply_stats(client.profile_id) == {"replied": 1, "suppressed": 0}
+
+
+async def test_failed_settings_lookup_releases_cooldown_slot(reply_client, monkeypatch):
+    client = await reply_client()
+
+    async def broken_settings(profile_id):
+        raise RuntimeError("sozlamalar o'qilmadi")
+    with monkeypatch.context() as patch:
+        patch.setattr(telethon_utils, "get_profile_settings", broken_settings)
+        await client.dispatch(private_message_update(SENDER_ID, "Salom", 1))
+    await client.dispatch(private_message_update(SENDER_ID, "Salom?", 2))
+
+    assert client.stats["private_sent"] == 1
+    assert telethon_utils.auto_reply_stats(client.profile_id) == {"replied": 1, "suppressed": 0}
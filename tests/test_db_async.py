@@ -0,0 +1,78 @@
+"""db_async: SQLite yozuvi qulf kutayotganda ham event loop ishlashda davom etadi."""
+import asyncio
+import threading
+import time
+
+import db_async
+
+BLOCK_FOR = 0.5    # yozuvchi qulfi boshqa oqimda ushlab turiladigan vaqt (s)
+TICK = 0.01
+
+
+async def test_loop_stays_responsive_while_write_is_blocked(temp_db, profile_id):
+    locked = threading.Event()
+    release = threading.Event()
+
+    def hold_writer_lock():
+        with temp_db._db_lock:
+            locked.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold_writer_lock)
+    holder.start()
+    locked.wait(5)
+    try:
+        loop = asyncio.get_running_loop()
+        save = asyncio.ensure_future(db_async.save_group("https://t.me/blocked_group", profile_id))
+        lags = []
+        deadline = loop.time() + BLOCK_FOR
+        while loop.time() < deadline:
+            started = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append(time.perf_counter() - started - TICK)
+        done_while_locked = save.done()
+        release.set()
+        await asyncio.wait_for(save, 5)
+    finally:
+        release.set()
+        holder.join()
+
+    assert not done_while_locked
+    assert len(lags) >= BLOCK_FOR / TICK / 2
+    assert max(lags) < 0.1
+    assert temp_db.has_group(profile_id, "https://t.me/blocked_group")
+
+
+
+async def test_group_registry_read_survives_invalidation_after_cache_check(temp_db, profile_id, monkeypatch):
+    temp_db.save_group("https://t.me/registry_group", profile_id)
+    loop_thread = threading.current_thread()
+    loop_queries = []
+    get_cursor = temp_db.get_cursor
+
+    def recording_get_cursor(*args, **kwargs):
+        if threading.current_thread() is loop_thread:
+            loop_queries.append(args)
+        return get_cursor(*args, **kwargs)
+
+    def invalidated_after(check):
+        # Boshqa oqim reyestrni aynan keshni tekshirgandan keyin tozalagan holat
+        def wrapper(pid):
+            result = check(pid)
+            temp_db.invalidate_groups(pid)
+            return result
+        return wrapper
+
+    monkeypatch.setattr(temp_db, "get_cursor", recording_get_cursor)
+    monkeypatch.setattr(temp_db, "is_groups_cached", invalidated_after(temp_db.is_groups_cached))
+    monkeypatch.setattr(temp_db, "cached_groups", invalidated_after(temp_db.cached_groups))
+    results = []
+    for read, args in ((db_async.load_groups, ()), (db_async.count_groups, ()),
+                       (db_async.load_group_peers, ()), (db_async.has_group, ("https://t.me/registry_group",))):
+        await db_async.run_db(temp_db.load_groups, profile_id)
+        results.append(await read(profile_id, *args))
+
+    assert loop_queries == []
+    assert results[:2] == [["https://t.me/registry_group"], 1]
+    assert results[2][0]["link"] == "https://t.me/registry_group"
+    assert results[3] is True
@@ -0,0 +1,16 @@
+import time
+
+
+def test_prune_entity_cache_removes_only_expired_rows(temp_db, monkeypatch):
+    monkeypatch.setattr(temp_db, "ENTITY_CACHE_PRUNE_CHUNK", 3)
+    now = time.time()
+    for i in range(10):
+        temp_db.save_entity(1, f"https://t.me/old_{i}", "channel", i, i)
+    temp_db.save_entity(1, "https://t.me/fresh", "channel", 99, 99)
+    with temp_db.get_cursor(write=True) as c:
+        c.execute("UPDATE entity_cache SET resolved_at = ? WHERE link LIKE '%old_%'", (now - 8 * 86400,))
+
+    assert temp_db.prune_entity_cache(now - 7 * 86400) == 10
+    assert temp_db.load_entity(1, "https://t.me/old_0") is None
+    assert temp_db.load_entity(1, "https://t.me/fresh") == ("channel", 99, 99)
+    assert temp_db.prune_entity_cache(now - 7 * 86400) == 0
@@ -0,0 +1,47 @@
+"""send_message_safe: guruh holati (fail_count, backoff) faqat guruhga oid xatolarda o'zgaradi."""
+from telethon.tl.types import InputPeerChannel
+
+import telethon_utils
+
+
+async def send_once(db, client, send_error=None):
+    profile_id = client.profile_id
+    channel = next(iter(client.channels.values()))
+    link = f"https://t.me/{channel.username}"
+    db.save_group(link, profile_id, channel.id, channel.access_hash, channel.title, "megagroup")
+    group = db.load_group_peers(profile_id)[0]
+    if send_error is not None:
+        async def failing_send(entity, message, reply_to=None):
+            raise send_error
+        client.send_message = failing_send
+    peer = InputPeerChannel(channel.id, channel.access_hash)
+    ok = await telethon_utils.send_message_safe(client, link, "Salom", profile_id, 1, 1, peer=peer, group_id=group["id"])
+    return ok, group["id"]
+
+
+async def test_transient_error_leaves_group_health_untouched(temp_db, fake_client):
+    client = fake_client(groups=1)
+    ok, group_id = await send_once(temp_db, client, ConnectionError("tarmoq uzildi"))
+
+    assert not ok
+    assert telethon_utils._group_health.get((client.profile_id, group_id), {}).get("fail_count", 0) == 0
+    assert telethon_utils.group_backoff_remaining(client.profile_id, group_id) == 0
+    assert temp_db.load_backoffs() == []
+    assert temp_db.load_group_peers(client.profile_id)[0]["fail_count"] == 0
+
+
+async def test_slow_mode_spacing_stays_in_memory(temp_db, fake_client, monkeypatch):
+    client = fake_client(groups=1)
+    saved = []
+
+    async def record_save_backoff(*args):
+        saved.append(args)
+    monkeypatch.setattr(telethon_utils, "save_backoff", record_save_backoff)
+
+    ok, group_id = await send_once(temp_db, client)
+    telethon_utils._group_health[(client.profile_id, group_id)]["slow_mode"] = 30
+    results = [ok] + [(await send_once(temp_db, client))[0] for _ in range(3)]
+
+    assert all(results)
+    assert 29 < telethon_utils.group_backoff_remaining(client.profile_id, group_id) <= 30
+    assert saved == []
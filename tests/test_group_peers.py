@@ -0,0 +1,23 @@
+from telethon.tl.types import InputPeerChannel, InputPeerChat
+
+from telethon_utils import peer_from_group
+
+
+def test_peer_from_group_builds_peer_only_for_group_types():
+    assert peer_from_group({"peer_id": 5, "access_hash": 7, "peer_type": "megagroup"}) == InputPeerChannel(5, 7)
+    assert peer_from_group({"peer_id": 5, "access_hash": 7, "peer_type": "broadcast"}) == InputPeerChannel(5, 7)
+    assert peer_from_group({"peer_id": 5, "access_hash": None, "peer_type": "chat"}) == InputPeerChat(5)
+    assert peer_from_group({"peer_id": 5, "access_hash": 7, "peer_type": "user"}) is None
+    assert peer_from_group({"peer_id": 5, "access_hash": 7, "peer_type": None}) is None
+    assert peer_from_group({"peer_id": None, "access_hash": None, "peer_type": None}) is None
+
+
+def test_migration_repairs_backfilled_entity_cache_types(temp_db):
+    with temp_db.get_cursor(write=True) as c:
+        for link, peer_type in (("a", "channel"), ("b", "user"), ("c", "chat"), ("d", "broadcast")):
+            c.execute("INSERT INTO groups (link, profile_id, peer_id, access_hash, peer_type, resolved_at) "
+                      "VALUES (?, 1, 10, 20, ?, 1.0)", (link, peer_type))
+        c.execute("PRAGMA user_version = 8")
+    temp_db.migrate_db()
+    rows = {g["link"]: (g["peer_id"], g["peer_type"]) for g in temp_db.load_group_peers(1)}
+    assert rows == {"a": (10, "megagroup"), "b": (None, None), "c": (10, "chat"), "d": (10, "broadcast")}
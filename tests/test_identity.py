@@ -0,0 +1,53 @@
+"""Guruhdagi eslatmaga javob: akkaunt ma'lumoti client.identity dan olinadi, get_me() chaqirilmaydi."""
+import pytest
+from telethon.tl.types import MessageEntityMentionName, UpdateUserName, Username
+
+import telethon_utils
+from tests.support import group_message_update
+
+SENDER_ID = 700_000_001
+
+
+@pytest.fixture
+def mention_client(fake_client):
+    async def make():
+        client = fake_client({"response_reply_enabled": 1}, groups=3)
+        telethon_utils.remember_identity(client, await client.get_me())
+        await telethon_utils.register_handlers(client)
+        return client
+    return make
+
+
+async def test_mentions_do_not_call_get_me(mention_client):
+    client = await mention_client()
+    get_me_at_start = client.stats["get_me"]
+    channel = next(iter(client.channels.values()))
+    updates = [
+        group_message_update(channel, SENDER_ID, f"@{client.username} savol bor", 1, mentioned=True),
+        group_message_update(channel, SENDER_ID, f"@{client.username.upper()}, yordam bering", 2, mentioned=True),
+        group_message_update(channel, SENDER_ID, "Aka, savol", 3, mentioned=True,
+                             entities=[MessageEntityMentionName(offset=0, length=3, user_id=client._self_id)]),
+        group_message_update(channel, SENDER_ID, f"@{client.username}_bot boshqa akkaunt", 4),
+        group_message_update(channel, SENDER_ID, "Oddiy xabar", 5),
+    ]
+    for update in updates:
+        await client.dispatch(update)
+
+    assert client.stats["get_me"] == get_me_at_start
+    assert client.stats["sent"] == 3
+    assert not client.handler_errors
+
+
+async def test_username_update_refreshes_identity(mention_client):
+    client = await mention_client()
+    get_me_at_start = client.stats["get_me"]
+    await client.dispatch(UpdateUserName(user_id=client._self_id, first_name="Fake", last_name="",
+                                         usernames=[Username(username="renamed_user", active=True)]))
+    channel = next(iter(client.channels.values()))
+    await client.dispatch(group_message_update(channel, SENDER_ID, f"@{client.username} eski nom", 1))
+    await client.dispatch(group_message_update(channel, SENDER_ID, "@renamed_user yangi nom", 2))
+
+    assert client.identity.username == "renamed_user"
+    assert client.identity.handle == "@renamed_user"
+    assert client.stats["get_me"] == get_me_at_start
+    assert client.stats["sent"] == 1
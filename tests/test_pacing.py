@@ -0,0 +1,81 @@
+"""messages_per_minute sozlamasi haqiqiy yuborish tezligiga mos kelishini tekshiradi.
+
+send_profile_messages soxta klient (tests.support) ustida virtual soatli loopda
+(virtual_clock belgisi) ishlaydi — bir necha soatlik yuborish bir soniyada o'tadi
+va natija takrorlanadi.
+"""
+import random
+
+import pytest
+
+import telethon_utils
+
+
+async def run_cycle(fake_client, groups, latency, messages_per_minute=None):
+    random.seed(7)
+    settings = {"auto_send_enabled": 1}
+    if messages_per_minute is not None:
+        settings["messages_per_minute"] = messages_per_minute
+    client = fake_client(settings, groups=groups, latency=latency)
+    await telethon_utils.load_existing_groups(client, client.profile_id)
+    await telethon_utils.send_profile_messages(client)
+    return client
+
+
+def achieved_rate(client):
+    times = client.sent_times
+    return (len(times) - 1) / (times[-1] - times[0]) * 60
+
+
+@pytest.mark.virtual_clock
+@pytest.mark.parametrize("messages_per_minute", [2, 4, 6])
+async def test_rate_matches_setting_despite_send_latency(fake_client, messages_per_minute):
+    # 0.5–1.5s kechikish xabarlar orasidagi vaqtning ~10% i: ayirilmasa tezlik shuncha past chiqadi
+    client = await run_cycle(fake_client, groups=120, latency=(0.5, 1.5), messages_per_minute=messages_per_minute)
+    assert client.stats["sent"] == 120
+    assert achieved_rate(client) == pytest.approx(messages_per_minute, rel=0.05)
+
+
+@pytest.mark.virtual_clock
+@pytest.mark.parametrize("messages_per_minute", [7, 30, 120])
+async def test_rate_above_cap_is_clamped(fake_client, messages_per_minute):
+    cap = telethon_utils.max_messages_per_minute()
+    assert cap == 6
+    assert telethon_utils.get_pacing({"messages_per_minute": messages_per_minute}).messages_per_minute == cap
+    client = await run_cycle(fake_client, groups=120, latency=(0.05, 0.2), messages_per_minute=messages_per_minute)
+    gaps = [b - a for a, b in zip(client.sent_times, client.sent_times[1:])]
+    assert min(gaps) >= telethon_utils.MIN_DELAY_BETWEEN_MSG - 1e-6
+    assert achieved_rate(client) == pytest.approx(cap, rel=0.05)
+
+
+@pytest.mark.virtual_clock
+async def test_unset_profile_keeps_legacy_pacing(temp_db, profile_id, fake_client):
+    settings = temp_db.get_profile_settings(profile_id)
+    assert settings["messages_per_minute"] is None and settings["send_interval"] is None
+    pacing = telethon_utils.get_pacing(settings)
+    assert pacing.delay == telethon_utils.DELAY_BETWEEN_MSG
+    assert pacing.batch_pause == telethon_utils.PAUSE_BETWEEN_BATCH
+    assert pacing.send_interval == telethon_utils.GLOBAL_SLEEP
+    assert pacing.legacy
+
+    # Eski taqsimotlar: kechikishdan send vaqti ayirilmaydi, tanaffus 200 + 0..40s
+    client = await run_cycle(fake_client, groups=60, latency=(0.5, 1.5))
+    gaps = [b - a for a, b in zip(client.sent_times, client.sent_times[1:])]
+    batch_gaps = gaps[telethon_utils.BATCH_SIZE - 1::telethon_utils.BATCH_SIZE]
+    message_gaps = [g for k, g in enumerate(gaps) if (k + 1) % telethon_utils.BATCH_SIZE]
+    low, high = telethon_utils.DELAY_BETWEEN_MSG
+    assert all(low + 0.5 <= g <= high + 1.5 for g in message_gaps)
+    pause = telethon_utils.PAUSE_BETWEEN_BATCH
+    assert all(pause + low + 0.5 <= g <= pause + telethon_utils.PAUSE_JITTER + high + 1.5 for g in batch_gaps)
+    assert achieved_rate(client) == pytest.approx(6 * 60 / (6 * (9 + 1) + pause + 20), rel=0.1)
+
+
+def test_migration_treats_schema_defaults_as_unset(temp_db):
+    with temp_db.get_cursor(write=True) as c:
+        c.execute("INSERT INTO profiles (api_id, phone) VALUES (1, 'a')")
+        c.execute("INSERT INTO profiles (api_id, phone, messages_per_minute, send_interval) VALUES (2, 'b', 4, 600)")
+        c.execute("PRAGMA user_version = 6")
+    temp_db.migrate_db()
+    with temp_db.get_cursor() as c:
+        c.execute("SELECT messages_per_minute, send_interval FROM profiles ORDER BY id")
+        assert c.fetchall() == [(None, None), (4, 600)]
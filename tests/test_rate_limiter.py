@@ -0,0 +1,90 @@
+import pytest
+
+from rate_limiter import TokenBucket
+
+
+class FakeClock:
+    """Soxta soat: sleep() vaqtni darhol suradi va chaqiruvlarni yozib boradi."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_bucket(rate, per=60.0, capacity=None):
+    clock = FakeClock()
+    return TokenBucket(rate, per, capacity, clock=clock, sleep=clock.sleep), clock
+
+
+async def test_burst_up_to_capacity_then_waits_exact_interval():
+    bucket, clock = make_bucket(6, 60, capacity=3)
+    waits = [await bucket.acquire() for _ in range(5)]
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3:] == [pytest.approx(10.0), pytest.approx(10.0)]
+    assert clock.now == pytest.approx(1020.0)
+
+
+async def test_sustained_rate_matches_setting():
+    bucket, clock = make_bucket(30, 60, capacity=1)
+    start = clock.now
+    for _ in range(301):
+        await bucket.acquire()
+    assert (clock.now - start) / 60 == pytest.approx(10.0)
+
+
+def test_tokens_refill_while_idle_but_not_above_capacity():
+    bucket, clock = make_bucket(6, 60, capacity=2)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert bucket.delay() == pytest.approx(10.0)
+    clock.now += 3600
+    assert bucket.delay(2) == 0.0
+    assert bucket.delay(3) == pytest.approx(10.0)
+
+
+def test_set_rate_keeps_accumulated_tokens_and_applies_new_rate():
+    bucket, clock = make_bucket(6, 60, capacity=6)
+    for _ in range(6):
+        assert bucket.try_acquire()
+    clock.now += 20            # 2 token to'plandi
+    bucket.set_rate(60, 6)
+    assert bucket.tokens == pytest.approx(2.0)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert bucket.delay() == pytest.approx(1.0)
+
+
+def test_set_rate_clamps_tokens_to_new_capacity():
+    bucket, _ = make_bucket(10, 60, capacity=10)
+    bucket.set_rate(2, 2)
+    assert bucket.tokens == 2
+    with pytest.raises(ValueError):
+        bucket.set_rate(0)
+
+
+def test_replay_rebuilds_bucket_from_past_acquisitions():
+    bucket, _ = make_bucket(6, 60, capacity=6)
+    # 6 ta xabar oxirgi 5 sekundda — chelak deyarli bo'sh
+    bucket.replay([5, 4, 3, 2, 1, 0])
+    assert bucket.tokens == pytest.approx(0.5)
+    assert not bucket.try_acquire()
+    assert bucket.delay() == pytest.approx(5.0)
+
+
+def test_replay_of_old_acquisitions_leaves_full_bucket():
+    bucket, _ = make_bucket(6, 60, capacity=6)
+    bucket.replay([3600, 3590, 3580])
+    assert bucket.tokens == 6
+    bucket.replay([])
+    assert bucket.tokens == 6
+
+
+def test_invalid_rate_rejected():
+    with pytest.raises(ValueError):
+        TokenBucket(0)
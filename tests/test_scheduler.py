@@ -0,0 +1,55 @@
+"""SendScheduler._run_cycle: aylanma yoki keyingi vaqt hisobi xato bersa ham profil qayta navbatga tushadi."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import metrics
+import scheduler
+
+
+def cycle_count(profile_id):
+    return metrics.CYCLE_DURATION.snapshot().get((profile_id,), {}).get("count", 0)
+
+
+@pytest.mark.parametrize("failing", ["send", "next_due"])
+async def test_failed_cycle_is_measured_and_rescheduled(monkeypatch, failing):
+    profile_id = 9001 if failing == "send" else 9002
+    client = SimpleNamespace(profile_id=profile_id, _self_id=profile_id)
+
+    async def send_profile_messages(_client):
+        if failing == "send":
+            raise RuntimeError("aylanma xatosi")
+
+    async def next_due_after_cycle(_profile_id):
+        if failing == "next_due":
+            raise RuntimeError("sozlamalar o'qilmadi")
+        return asyncio.get_running_loop().time() + 60
+
+    monkeypatch.setattr(scheduler, "send_profile_messages", send_profile_messages)
+    before = cycle_count(profile_id)
+    sched = scheduler.SendScheduler([client])
+    monkeypatch.setattr(sched, "_next_due_after_cycle", next_due_after_cycle)
+    sched._running[profile_id] = None
+    await sched._run_cycle(client)
+
+    assert cycle_count(profile_id) == before + 1
+    assert profile_id not in sched._running
+    assert profile_id in sched._due
+    assert len(sched._queue) == 1
+
+
+@pytest.mark.parametrize("messages_per_minute, jitter", [
+    (None, scheduler.LEGACY_INTERVAL_JITTER),
+    (4, scheduler.INTERVAL_JITTER),
+])
+async def test_interval_jitter_depends_on_configured_pacing(temp_db, profile_id, messages_per_minute, jitter):
+    temp_db.update_profile_setting(profile_id, "send_interval", 600)
+    if messages_per_minute is not None:
+        temp_db.update_profile_setting(profile_id, "messages_per_minute", messages_per_minute)
+    sched = scheduler.SendScheduler([])
+    now = asyncio.get_running_loop().time()
+    waits = [await sched._next_due_after_cycle(profile_id) - now for _ in range(200)]
+
+    assert all(600 + jitter[0] <= w <= 600 + jitter[1] + 0.5 for w in waits)
+    assert max(waits) > 600 + jitter[1] * 0.8